@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易周期端到端基准：本地替身代替币安REST和DeepSeek，测量一轮 trading_bot() 的开销
+
+交易所和AI替身（benchmarks/stand_ins.py）在子进程中运行，带可配置的延迟和抖动；
+机器人照常用 python-binance / openai 客户端经HTTP访问它们。每轮前K线回放前进一根。
+分别对1、10、50个交易对报告：整轮耗时p50/p99、每轮CPU时间，以及各阶段的
+每轮调用次数、单次耗时p50/p99、每轮CPU时间和单次调用的峰值内存分配（tracemalloc单独测量）。
+
+不需要API密钥和网络，可在CI中运行：--output 保存结果，--baseline 与保存的结果比较，
+每轮CPU时间、整轮耗时p50或任一REST接口的每轮调用次数超过基线的(1+tolerance)倍时退出码为1。
+未启用账户推送时，futures_account 和 futures_position_information 每轮各只请求一次（共享快照），
+下单时沿用快照中的余额，不随交易对数量增加。
+
+用法:
+  python benchmarks/bench_cycle.py
+  python benchmarks/bench_cycle.py --symbols 1,10 --cycles 10 --rest-latency 0.05 --llm-ttft 0.8
+  python benchmarks/bench_cycle.py --klines data/BNBUSDT_15m.csv
+  python benchmarks/bench_cycle.py --store data/klines --symbol BNBUSDT
+  python benchmarks/bench_cycle.py --output bench_cycle.json
+  python benchmarks/bench_cycle.py --baseline bench_cycle.json --tolerance 0.25
+"""
+import argparse
+import functools
+import gc
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+import deepseekBNB as bot  # noqa: E402
+from app_context import AppContext  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from stand_ins import synthetic_columns, serve_in_subprocess, binance_client, openai_client, advance  # noqa: E402
+
+# 细粒度的几何桶（0.05毫秒 ~ 60秒，相邻桶比1.25），分位数估算误差约±12%
+FINE_BUCKETS = tuple(round(0.00005 * 1.25 ** i, 8) for i in range(64) if 0.00005 * 1.25 ** i <= 60)
+KNOWN_SYMBOLS = list(bot.SYMBOL_CONFIGS)
+
+
+def make_symbols(count):
+    """前几个用已配置的交易对，其余用虚构的交易对名"""
+    symbols = KNOWN_SYMBOLS[:count]
+    symbols += [f"BENCH{i:02d}USDT" for i in range(count - len(symbols))]
+    return symbols
+
+
+def load_columns(args):
+    """回放数据：--klines文件、--store K线库，或随机游走生成"""
+    if args.klines:
+        from backtest import load_klines
+        return load_klines(args.klines)
+    if args.store:
+        from kline_store import KlineStore
+        return KlineStore(args.store).columns(args.symbol, '15m')
+    return synthetic_columns(args.warmup + args.cycles + 400)
+
+
+class CallRecorder:
+    """记录每类调用的第一次参数，之后在tracemalloc下单独重放以测量内存分配"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.calls.setdefault(name, (func, args, kwargs))
+            return func(*args, **kwargs)
+        return wrapper
+
+    def proxy(self, target, prefix):
+        recorder = self
+
+        class Proxy:
+            def __getattr__(self, name):
+                attr = getattr(target, name)
+                if name.startswith('_') or not callable(attr):
+                    return attr
+                return recorder.wrap(f"{prefix}.{name}", attr)
+
+        return Proxy()
+
+    def measure_allocations(self):
+        """逐个重放记录的调用，返回 {阶段名: 峰值分配KiB}"""
+        allocations = {}
+        tracemalloc.start()
+        try:
+            for name, (func, args, kwargs) in sorted(self.calls.items()):
+                if name == 'llm.total':
+                    kwargs = dict(kwargs, on_early_decision=None, log=lambda *a, **k: None)
+                gc.collect()
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                func(*args, **kwargs)
+                allocations[name] = (tracemalloc.get_traced_memory()[1] - baseline) / 1024
+        finally:
+            tracemalloc.stop()
+        return allocations
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_case(symbol_count, columns, args):
+    """运行一组交易对数量，返回结果字典"""
+    symbols = make_symbols(symbol_count)
+    exchange_url, llm_url, stop = serve_in_subprocess(
+        columns, args.rest_latency, args.rest_jitter, args.llm_ttft, args.llm_jitter,
+        args.llm_token_interval, args.actions.split(','), symbols=symbols
+    )
+    workdir = tempfile.mkdtemp(prefix='bench_cycle_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        bot.TRADE_CONFIG.update(
+            symbols=symbols,
+            use_market_stream=False,
+            llm_stream=not args.no_stream,
+            decision_cache_ttl=bot.TRADE_CONFIG['decision_cache_ttl'] if args.decision_cache else 0,
+            test_mode=False,
+        )
+        # 不读取项目.env，避免连到真实的Supabase等外部服务
+        bot.app = app = AppContext(bot.TRADE_CONFIG, env_file=os.devnull)
+        recorder = CallRecorder()
+        app.provide('metrics', Metrics(buckets=FINE_BUCKETS))
+        app.provide('binance_client', app.metrics.instrument(
+            recorder.proxy(binance_client(exchange_url), 'binance'), 'binance'))
+        app.provide('deepseek_client', openai_client(llm_url))
+        for name in ('compute_indicator_frame', 'build_prompt', 'stream_decision'):
+            original = getattr(bot, name)
+            stage = {'compute_indicator_frame': 'indicators', 'build_prompt': 'prompt_build'}.get(name, 'llm.total')
+            setattr(bot, name, recorder.wrap(stage, original))
+
+        walls, cpus, records = [], [], []
+        try:
+            for cycle in range(args.warmup + args.cycles):
+                advance(exchange_url)
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                bot.trading_bot()
+                wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+                if cycle >= args.warmup:
+                    walls.append(wall)
+                    cpus.append(cpu)
+                    records.append(app.metrics.last_cycle)
+            allocations = recorder.measure_allocations()
+        finally:
+            for name in ('compute_indicator_frame', 'build_prompt', 'stream_decision'):
+                setattr(bot, name, getattr(bot, name).__wrapped__)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        stop()
+
+    stages = {}
+    for name in sorted({name for record in records for name in record['spans']}):
+        spans = [record['spans'].get(name, {}) for record in records]
+        histogram = app.metrics.histogram(name)
+        cpu_values = [span['cpu'] for span in spans if 'cpu' in span]
+        stages[name] = {
+            'calls_per_cycle': sum(span.get('count', 0) for span in spans) / len(records),
+            'p50_ms': histogram.quantile(0.5) * 1000,
+            'p99_ms': histogram.quantile(0.99) * 1000,
+            'cpu_ms_per_cycle': sum(cpu_values) / len(records) * 1000 if cpu_values else None,
+            'alloc_peak_kib': allocations.get(name),
+        }
+    return {
+        'symbols': symbol_count,
+        'cycles': len(walls),
+        'cycle_p50_s': percentile(walls, 50),
+        'cycle_p99_s': percentile(walls, 99),
+        'cpu_ms_per_cycle': sum(cpus) / len(cpus) * 1000,
+        'stages': stages,
+    }
+
+
+def _pad(text, width, left=False):
+    """按终端显示宽度（中文占两列）补齐"""
+    padding = ' ' * max(width - sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text), 0)
+    return text + padding if left else padding + text
+
+
+def format_case(result):
+    widths = (40, 9, 10, 10, 12, 15)
+    header = ('阶段', '次数/轮', 'p50(ms)', 'p99(ms)', 'CPU(ms/轮)', '峰值分配(KiB)')
+    lines = [
+        f"\n== {result['symbols']}个交易对 | {result['cycles']}轮 ==",
+        f"整轮耗时 p50 {result['cycle_p50_s'] * 1000:.1f}ms  p99 {result['cycle_p99_s'] * 1000:.1f}ms"
+        f" | CPU {result['cpu_ms_per_cycle']:.1f}ms/轮",
+        ''.join(_pad(text, width, left=i == 0) for i, (text, width) in enumerate(zip(header, widths))),
+    ]
+    for name, stage in result['stages'].items():
+        row = (
+            name,
+            f"{stage['calls_per_cycle']:.1f}",
+            f"{stage['p50_ms']:.2f}",
+            f"{stage['p99_ms']:.2f}",
+            f"{stage['cpu_ms_per_cycle']:.2f}" if stage['cpu_ms_per_cycle'] is not None else '-',
+            f"{stage['alloc_peak_kib']:.1f}" if stage['alloc_peak_kib'] is not None else '-',
+        )
+        lines.append(''.join(_pad(text, width, left=i == 0) for i, (text, width) in enumerate(zip(row, widths))))
+    return '\n'.join(lines)
+
+
+def check_regressions(results, baseline, tolerance):
+    """与基线比较每轮CPU时间、整轮耗时p50和各REST接口每轮调用次数，返回超出容忍度的描述列表"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get('cases', {}).get(key)
+        if not base:
+            continue
+        for metric in ('cpu_ms_per_cycle', 'cycle_p50_s'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{key}个交易对 {metric}: {base[metric]:.4g} → {result[metric]:.4g}")
+        # 调用次数是请求预算：新增的接口或次数变多都算退化
+        for stage, stats in result['stages'].items():
+            if not stage.startswith('binance.'):
+                continue
+            base_calls = base.get('stages', {}).get(stage, {}).get('calls_per_cycle', 0)
+            if stats['calls_per_cycle'] > base_calls * (1 + tolerance):
+                regressions.append(f"{key}个交易对 {stage} 调用次数/轮: {base_calls:.4g} → {stats['calls_per_cycle']:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='交易周期端到端基准（本地交易所/AI替身）')
+    parser.add_argument('--symbols', default='1,10,50', help='交易对数量列表，逗号分隔')
+    parser.add_argument('--cycles', type=int, default=20, help='每组计时的轮数')
+    parser.add_argument('--warmup', type=int, default=2, help='不计时的预热轮数')
+    parser.add_argument('--rest-latency', type=float, default=0.03, help='REST请求平均延迟（秒）')
+    parser.add_argument('--rest-jitter', type=float, default=0.01, help='REST延迟抖动（标准差，秒）')
+    parser.add_argument('--llm-ttft', type=float, default=0.5, help='AI首token平均延迟（秒）')
+    parser.add_argument('--llm-jitter', type=float, default=0.1, help='AI首token延迟抖动（标准差，秒）')
+    parser.add_argument('--llm-token-interval', type=float, default=0.02, help='AI流式分片间隔（秒）')
+    parser.add_argument('--actions', default='HOLD,BUY_OPEN,HOLD,CLOSE', help='AI替身轮换回复的操作')
+    parser.add_argument('--no-stream', action='store_true', help='关闭AI流式接收')
+    parser.add_argument('--decision-cache', action='store_true', help='启用决策缓存（默认关闭，每轮都请求AI）')
+    parser.add_argument('--klines', help='回放的15分钟K线文件（csv/json）')
+    parser.add_argument('--store', help='回放K线库目录（配合 --symbol）')
+    parser.add_argument('--symbol', default='BNBUSDT', help='K线库中回放的交易对')
+    parser.add_argument('--output', help='结果保存为JSON')
+    parser.add_argument('--baseline', help='与之前保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的回退比例')
+    args = parser.parse_args()
+
+    # python-binance的连接池（10）小于数据请求线程数，多余连接被丢弃时urllib3会逐条告警
+    logging.getLogger('urllib3.connectionpool').setLevel(logging.ERROR)
+
+    columns = load_columns(args)
+    print(f"回放K线: {len(columns['close'])}根 | REST延迟 {args.rest_latency * 1000:.0f}±{args.rest_jitter * 1000:.0f}ms"
+          f" | AI首token {args.llm_ttft * 1000:.0f}±{args.llm_jitter * 1000:.0f}ms")
+
+    results = {}
+    for count in (int(n) for n in args.symbols.split(',')):
+        results[str(count)] = run_case(count, columns, args)
+        print(format_case(results[str(count)]))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'cases': results}, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = check_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ 性能回退:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ 未超出基线 {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标计算微基准：pandas整表计算 vs NumPy向量化内核
+
+对比每次调用（含K线解析）的耗时，K线数量覆盖实盘使用的17/30/50根。
+
+用法: python benchmarks/bench_indicators.py [--repeat 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from indicators import (  # noqa: E402
+    calculate_technical_indicators, klines_to_dataframe,
+    parse_klines, compute_indicators, get_buffers,
+)
+
+
+def make_klines(count, seed=0):
+    """生成futures_klines格式的随机K线（价格为字符串，与REST响应一致）"""
+    rnd = random.Random(seed)
+    klines = []
+    price = 600.0
+    for i in range(count):
+        open_price = price
+        close_price = open_price * (1 + rnd.uniform(-0.01, 0.01))
+        high = max(open_price, close_price) * (1 + rnd.uniform(0, 0.005))
+        low = min(open_price, close_price) * (1 - rnd.uniform(0, 0.005))
+        open_time = 1700000000000 + i * 900000
+        klines.append([
+            open_time, f"{open_price:.4f}", f"{high:.4f}", f"{low:.4f}", f"{close_price:.4f}",
+            f"{rnd.uniform(100, 1000):.3f}", open_time + 899999, "0", 100, "0", "0", "0"
+        ])
+        price = close_price
+    return klines
+
+
+def run_pandas(klines):
+    return calculate_technical_indicators(klines_to_dataframe(klines))
+
+
+def run_numpy(klines):
+    columns = parse_klines(klines)
+    return compute_indicators(columns['high'], columns['low'], columns['close'], get_buffers(len(klines)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='指标计算微基准')
+    parser.add_argument('--repeat', type=int, default=2000, help='每组调用次数')
+    parser.add_argument('--sizes', default='17,30,50,500', help='K线数量，逗号分隔')
+    args = parser.parse_args()
+
+    print(f"{'K线数':>6} {'pandas(µs)':>12} {'numpy(µs)':>12} {'加速比':>8}")
+    for size in [int(x) for x in args.sizes.split(',')]:
+        klines = make_klines(size, seed=size)
+        pandas_us = min(timeit.repeat(lambda: run_pandas(klines), number=args.repeat // 10, repeat=5)) / (args.repeat // 10) * 1e6
+        numpy_us = min(timeit.repeat(lambda: run_numpy(klines), number=args.repeat, repeat=5)) / args.repeat * 1e6
+        print(f"{size:>6} {pandas_us:>12.1f} {numpy_us:>12.1f} {pandas_us / numpy_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词体积对比：verbose 与 compact 两种格式在同一批行情上的输入token
+
+用随机K线按回测的实盘同款字段构造多根K线收盘时的提示词（带持仓、绩效摘要和3条历史决策），
+统计字符数与 estimate_tokens 估算值。加 --api 时把两种提示词各发给DeepSeek一次（max_tokens=1），
+以接口返回的 usage.prompt_tokens 为准，与机器人日志中"实际token用量"的口径相同。
+
+用法: python benchmarks/bench_prompt.py [--samples 20] [--api]
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_indicators import make_klines  # noqa: E402
+from backtest import bar_higher_data, bar_market_data, build_features, _to_datetime  # noqa: E402
+from indicators import parse_klines  # noqa: E402
+from prompt_builder import PROMPT_FORMATS, SYSTEM_PROMPT, build_prompt, estimate_tokens  # noqa: E402
+
+STATS_TEXT = """
+【交易绩效】
+- 已平仓42笔 | 胜率 54.8% | 累计盈亏 +61.35 USDT（手续费 8.12）
+- 最大回撤 23.40 USDT（2.3%）| 当前回撤 4.10 USDT
+- 夏普 1.21 | 索提诺 1.86 | 盈亏比 1.34 | 平均持仓 95分钟"""
+
+REASON = "RSI回落至中性区间，MACD柱由正转负，价格跌破20周期均线且成交量放大，短期动能转弱，1小时趋势仍向上，暂不追空，等待回踩确认。"
+
+
+def sample_contexts(samples):
+    """从随机K线中等间隔取若干根K线，构造与实盘相同字段的提示词上下文"""
+    features = build_features(parse_klines(make_klines(2000, seed=7)))
+    start_time = _to_datetime(features['open_time'][0])
+    contexts = []
+    for n in range(samples):
+        i = 200 + n * (len(features['close']) - 201) // max(1, samples - 1)
+        price = float(features['close'][i])
+        position = None if n % 2 else {
+            'side': 'LONG', 'amount': 0.5, 'entry_price': price * 0.99, 'unrealized_pnl': price * 0.005,
+            'leverage': 10,
+        }
+        bar_time = _to_datetime(features['open_time'][i])
+        contexts.append({
+            'coin': 'BNB',
+            'leverage': 10,
+            'market_data': bar_market_data(features, i, position),
+            'data_1h': bar_higher_data(features, i),
+            'btc_data': None,
+            'balance': {'total': 1000.0, 'available': 820.0, 'unrealized_pnl': 2.5},
+            'stats_text': STATS_TEXT,
+            'recent_decisions': [
+                {'time': (bar_time - timedelta(minutes=15 * k)).isoformat(), 'coin': 'BNB',
+                 'action': 'HOLD', 'reason': REASON, 'confidence': 'MEDIUM'}
+                for k in (3, 2, 1)
+            ],
+            'start_time': start_time,
+            'runtime_minutes': (bar_time - start_time).total_seconds() / 60,
+            'invocation_count': n + 1,
+        })
+    return contexts
+
+
+def api_prompt_tokens(client, messages):
+    response = client.chat.completions.create(model="deepseek-chat", messages=messages, max_tokens=1, temperature=0)
+    return response.usage.prompt_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提示词体积对比')
+    parser.add_argument('--samples', type=int, default=20, help='采样K线数量')
+    parser.add_argument('--api', action='store_true', help='调用DeepSeek接口取实际prompt_tokens（需要DEEPSEEK_API_KEY）')
+    args = parser.parse_args()
+
+    client = None
+    if args.api:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv('DEEPSEEK_API_KEY'),
+                        base_url=os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com"))
+
+    contexts = sample_contexts(args.samples)
+    totals = {}
+    for prompt_format in PROMPT_FORMATS:
+        chars = estimated = actual = 0
+        for ctx in contexts:
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": build_prompt(prompt_format, ctx)},
+            ]
+            chars += sum(len(m['content']) for m in messages)
+            estimated += sum(estimate_tokens(m['content']) for m in messages)
+            if client is not None:
+                actual += api_prompt_tokens(client, messages)
+        totals[prompt_format] = (chars, estimated, actual)
+        actual_text = f" | 实际 {actual / len(contexts):7.1f} tokens" if client is not None else ''
+        print(f"{prompt_format:<8} 平均 {chars / len(contexts):7.1f} 字符 | 估算 {estimated / len(contexts):7.1f} tokens{actual_text}")
+
+    verbose, compact = totals['verbose'], totals['compact']
+    print(f"compact/verbose: 字符 {compact[0] / verbose[0]:.0%} | 估算token {compact[1] / verbose[1]:.0%}"
+          + (f" | 实际token {compact[2] / verbose[2]:.0%}" if client is not None else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标口径一致性检查：NumPy内核与pandas原始实现逐值对比
+
+- compute_indicators 与 calculate_technical_indicators 在同一批K线上的全部输出
+- compute_indicator_frame：K线来自WebSocket缓存（缓存中有更长的历史）与来自REST时结果相同
+
+任一项超出容差即以退出码1结束，可直接用于CI。
+
+用法: python benchmarks/check_indicator_parity.py [--sizes 1,2,17,30,50,99,500] [--tolerance 1e-9]
+"""
+import argparse
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_indicators import make_klines  # noqa: E402
+from indicators import (  # noqa: E402
+    INDICATOR_FIELDS, calculate_technical_indicators, klines_to_dataframe, parse_klines, compute_indicators,
+    get_buffers,
+)
+
+
+def compare(expected, actual, tolerance):
+    """返回第一个不一致的 (位置, 期望值, 实际值)，全部一致时返回None"""
+    if len(expected) != len(actual):
+        return ('len', len(expected), len(actual))
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if math.isnan(a) and math.isnan(b):
+            continue
+        if math.isnan(a) or math.isnan(b) or abs(a - b) > tolerance * max(1.0, abs(a)):
+            return (i, a, b)
+    return None
+
+
+def pandas_frame(klines):
+    df = calculate_technical_indicators(klines_to_dataframe(klines))
+    return {field: [float(v) for v in df[field]] for field in INDICATOR_FIELDS}
+
+
+def numpy_frame(klines):
+    columns = parse_klines(klines)
+    outputs = compute_indicators(columns['high'], columns['low'], columns['close'], get_buffers(len(klines)))
+    return {field: outputs[field].tolist() for field in INDICATOR_FIELDS}
+
+
+def stream_vs_rest(size, history):
+    """缓存持有history根K线时，取最近size根计算的指标与REST只拉size根的结果对比"""
+    from deepseekBNB import app, compute_indicator_frame
+
+    klines = make_klines(history, seed=history)
+    app.candle_store.seed('PARITYUSDT', '15m', klines)
+    app.candle_store.connected = True
+    cached = app.candle_store.get_klines('PARITYUSDT', '15m', size)
+    return compute_indicator_frame(klines[-size:]), compute_indicator_frame(cached)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='指标口径一致性检查')
+    parser.add_argument('--sizes', default='1,2,3,13,14,15,17,19,20,26,30,49,50,51,99,500', help='K线数量，逗号分隔')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='相对容差')
+    args = parser.parse_args()
+
+    failures = []
+    checks = 0
+    for size in [int(x) for x in args.sizes.split(',')]:
+        klines = make_klines(size, seed=size)
+        expected = pandas_frame(klines)
+        frame = numpy_frame(klines)
+        for field in INDICATOR_FIELDS:
+            checks += 1
+            mismatch = compare(expected[field], frame[field], args.tolerance)
+            if mismatch:
+                failures.append(f"numpy {size}根 {field}: 位置{mismatch[0]} 期望{mismatch[1]} 实际{mismatch[2]}")
+
+    for size in (17, 30, 50):
+        rest, stream = stream_vs_rest(size, history=99)
+        for field in INDICATOR_FIELDS:
+            checks += 1
+            mismatch = compare(rest[field], stream[field], 0.0)
+            if mismatch:
+                failures.append(f"stream/rest {size}根 {field}: 位置{mismatch[0]} REST{mismatch[1]} 缓存{mismatch[2]}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'❌' if failures else '✅'} {checks - len(failures)}/{checks} 项一致（容差 {args.tolerance:g}）")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
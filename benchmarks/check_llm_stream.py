@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式决策检查：stream_decision 对着本地OpenAI兼容替身（FakeLLMServer）逐项核对
+
+- action和confidence一完整就回调一次，此时reason还在生成；HOLD也回调（由调用方决定不下单）
+- 非法action不回调
+- 流式解析出的字段与非流式回复整体 json.loads 的结果相同，usage与非流式响应一致
+- 分片大小从1个字符到整段回复，以及回复前后带多余文本、reason中有转义字符时解析结果不变
+
+任一项不符即以退出码1结束，可直接用于CI。
+
+用法: python benchmarks/check_llm_stream.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_ins import FakeLLMServer, Latency, openai_client  # noqa: E402
+from llm_stream import StreamingDecisionParser, stream_decision  # noqa: E402
+
+REASON = '15分钟K线收于布林中轨上方，MACD柱由负转正，RSI中性 "52"，1小时趋势向上\\n维持当前判断。'
+MESSAGES = [{"role": "system", "content": "你是一位专业的日内交易员。"}, {"role": "user", "content": "给出决策"}]
+
+
+def check_stream(failures, action, chunk_chars, token_interval):
+    """对一种回复做流式与非流式两次请求并比较"""
+    reply = {'action': action, 'confidence': 'HIGH', 'reason': REASON * 3}
+    server = FakeLLMServer(Latency(0.0), token_interval, lambda messages: reply, chunk_chars=chunk_chars).start()
+    label = f"{action} 分片{chunk_chars}"
+    try:
+        client = openai_client(server.url)
+        calls = []
+        result = stream_decision(client, 'deepseek-chat', MESSAGES,
+                                 on_early_decision=lambda decision: calls.append((time.time(), decision)),
+                                 log=lambda *args, **kwargs: None)
+        finished = time.time()
+        response = client.chat.completions.create(model='deepseek-chat', messages=MESSAGES, stream=False)
+    finally:
+        server.stop()
+
+    expected = json.loads(response.choices[0].message.content)
+    valid = action in ('BUY_OPEN', 'SELL_OPEN', 'CLOSE', 'HOLD')
+    if len(calls) != (1 if valid else 0):
+        failures.append(f"{label}: 提前回调 {len(calls)} 次")
+    elif valid and calls[0][1] != {'action': action, 'confidence': 'HIGH'}:
+        failures.append(f"{label}: 提前回调内容 {calls[0][1]}")
+    elif valid and token_interval and finished - calls[0][0] < token_interval * 5:
+        failures.append(f"{label}: 回调距回复结束只有 {finished - calls[0][0]:.3f}秒，未在reason生成前触发")
+    if result['early_fired'] != valid:
+        failures.append(f"{label}: early_fired={result['early_fired']}")
+    if result['fields'] != expected or json.loads(result['content']) != expected:
+        failures.append(f"{label}: 流式解析结果与非流式不同")
+    usage, expected_usage = result['usage'], response.usage
+    if usage is None or (usage.prompt_tokens, usage.completion_tokens) != \
+            (expected_usage.prompt_tokens, expected_usage.completion_tokens):
+        failures.append(f"{label}: usage {usage} 与非流式 {expected_usage} 不同")
+
+
+def check_parser(failures):
+    """回复前后带多余文本、字段含嵌套值时，逐字符输入与一次性输入的解析结果相同"""
+    body = {'action': 'SELL_OPEN', 'confidence': 'LOW', 'levels': {'stop': [1.5, 2]}, 'size': 0.25, 'reason': REASON}
+    text = '分析如下：\n```json\n' + json.dumps(body, ensure_ascii=False, indent=2) + '\n```\n以上。{"action": "BUY_OPEN"}'
+    for step in (1, 2, 7, len(text)):
+        parser = StreamingDecisionParser()
+        for start in range(0, len(text), step):
+            parser.feed(text[start:start + step])
+        if parser.fields != body or not parser.done:
+            failures.append(f"解析器 分片{step}: {parser.fields}")
+
+    parser = StreamingDecisionParser()
+    parser.feed('{"action": "HOLD", "reason": "RSI \\"偏高')
+    if parser.partial('reason') != 'RSI "偏高' or parser.partial('action') != 'HOLD':
+        failures.append(f"解析器 partial: {parser.partial('reason')!r}")
+
+
+def main():
+    failures = []
+    checks = 0
+    for action in ('BUY_OPEN', 'SELL_OPEN', 'CLOSE', 'HOLD', 'WAIT'):
+        for chunk_chars in (1, 5, 12, 4096):
+            # 逐字符分片时回复有几百个分片，不加间隔
+            token_interval = 0.002 if chunk_chars == 12 else 0.0
+            check_stream(failures, action, chunk_chars, token_interval)
+            checks += 1
+    check_parser(failures)
+    checks += 1
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'❌' if failures else '✅'} 流式决策检查 {checks} 组，{len(failures)} 项不符")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
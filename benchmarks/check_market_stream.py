@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情推送检查：MarketStreamSubscriber 对着本地WebSocket推送替身（FakeStreamServer）逐项核对
+
+- REST补齐很慢时推送照常处理（标记价格可读），K线序列补齐前读不到，补齐后包含等待期间的推送
+- 从检查点恢复后只拉取缺失的K线；推送K线与缓存之间有缺口时该序列重新补齐，窗口始终连续
+- 某个序列补齐失败时只有它读不到，其他序列照常；REST恢复后下一条推送触发补齐
+- 断线后全部读不到，重连补齐后恢复
+
+REST行情用内存中的1分钟K线代替，published 之后的K线"尚未出现在REST中"。
+任一项不符即以退出码1结束，可直接用于CI。
+
+用法: python benchmarks/check_market_stream.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_ins import FakeStreamServer  # noqa: E402
+from market_stream import CandleStore, MarketStreamSubscriber  # noqa: E402
+
+MINUTE_MS = 60000
+PUSHED_CLOSE = '999.5'
+
+
+def make_kline(open_time, close=None):
+    close = close or f"{100 + open_time // MINUTE_MS % 1000:.1f}"
+    return [open_time, close, close, close, close, '10', open_time + MINUTE_MS - 1, '1000', 5, '5', '500', '0']
+
+
+class FakeMarket:
+    """REST K线替身：按开盘时间生成1分钟K线，只返回 published 及之前的部分"""
+
+    def __init__(self):
+        self.now_open = int(time.time() * 1000) // MINUTE_MS * MINUTE_MS
+        self.published = self.now_open
+        self.gate = threading.Event()
+        self.gate.set()
+        self.failing = set()
+        self.calls = []
+
+    def seeder(self, symbol, interval, limit, start_time=None):
+        self.calls.append((symbol, start_time))
+        self.gate.wait()
+        if symbol in self.failing:
+            raise ConnectionError('REST不可用')
+        if start_time is None:
+            start_time = self.published - (limit - 1) * MINUTE_MS
+        open_times = range(start_time, self.published + 1, MINUTE_MS)
+        return [make_kline(open_time) for open_time in list(open_times)[:limit]]
+
+
+def kline_event(symbol, kline):
+    return {'stream': f"{symbol.lower()}@kline_1m", 'data': {
+        'e': 'kline', 's': symbol, 'k': {
+            't': kline[0], 'T': kline[6], 's': symbol, 'i': '1m', 'o': kline[1], 'h': kline[2], 'l': kline[3],
+            'c': kline[4], 'v': kline[5], 'n': kline[8], 'x': False, 'q': kline[7], 'V': kline[9], 'Q': kline[10],
+            'B': '0',
+        }}}
+
+
+def mark_price_event(symbol):
+    return {'stream': f"{symbol.lower()}@markPrice@1s", 'data': {
+        'e': 'markPriceUpdate', 's': symbol, 'p': '600.25', 'r': '0.0001', 'T': 0}}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def check(failures, label, ok, detail=''):
+    if not ok:
+        failures.append(f"{label} {detail}".strip())
+
+
+def contiguous(klines):
+    return all(b[0] - a[0] == MINUTE_MS for a, b in zip(klines, klines[1:]))
+
+
+def run_subscriber(server, store, market, symbols):
+    subscriber = MarketStreamSubscriber(store, [(symbol, '1m') for symbol in symbols], market.seeder,
+                                        base_url=server.url, reconnect_delay=0.2)
+    subscriber.start()
+    return subscriber
+
+
+def check_slow_catch_up(failures):
+    """补齐阻塞期间推送照常处理，补齐后重放暂存的推送"""
+    market = FakeMarket()
+    market.gate.clear()
+    server = FakeStreamServer().start()
+    store = CandleStore()
+    subscriber = run_subscriber(server, store, market, ['BNBUSDT'])
+    try:
+        wait_for(lambda: server.connections)
+        server.broadcast(mark_price_event('BNBUSDT'))
+        server.broadcast(kline_event('BNBUSDT', make_kline(market.now_open, PUSHED_CLOSE)))
+        check(failures, '慢补齐:', wait_for(lambda: store.get_mark_price('BNBUSDT') == 600.25, timeout=2),
+              '补齐阻塞时标记价格推送未处理')
+        check(failures, '慢补齐:', store.get_klines('BNBUSDT', '1m', 50) is None, '补齐完成前K线已可读取')
+
+        market.gate.set()
+        check(failures, '慢补齐:', subscriber.wait_ready(5), '补齐放行后仍未就绪')
+        klines = store.get_klines('BNBUSDT', '1m', 50)
+        check(failures, '慢补齐:', klines is not None and klines[-1][4] == PUSHED_CLOSE and contiguous(klines),
+              f"等待期间的推送未重放: {klines[-1] if klines else None}")
+    finally:
+        market.gate.set()
+        subscriber.stop()
+        server.stop()
+
+
+def check_gap_reseed(failures):
+    """检查点恢复后增量补齐，推送缺口触发重新补齐"""
+    market = FakeMarket()
+    market.published = market.now_open - 5 * MINUTE_MS
+    restored_last = market.now_open - 10 * MINUTE_MS
+    store = CandleStore()
+    store.load_state({'series': [{'symbol': 'BNBUSDT', 'interval': '1m', 'candles': [
+        make_kline(restored_last - n * MINUTE_MS) for n in range(119, -1, -1)
+    ]}]})
+    server = FakeStreamServer().start()
+    subscriber = run_subscriber(server, store, market, ['BNBUSDT'])
+    try:
+        check(failures, '检查点恢复:', subscriber.wait_ready(5), '未就绪')
+        check(failures, '检查点恢复:', market.calls[:1] == [('BNBUSDT', restored_last)],
+              f"未从检查点最后一根K线增量补齐: {market.calls[:1]}")
+        klines = store.get_klines('BNBUSDT', '1m', 99)
+        check(failures, '检查点恢复:', klines is not None and klines[-1][0] == market.published and contiguous(klines),
+              '窗口不连续或未补到最新')
+
+        # REST已有最新K线，推送直接跳到最新一根：中间缺的4根需重新补齐
+        market.published = market.now_open
+        server.broadcast(kline_event('BNBUSDT', make_kline(market.now_open, PUSHED_CLOSE)))
+        ok = wait_for(lambda: (store.get_klines('BNBUSDT', '1m', 99) or [[0]])[-1][0] == market.now_open)
+        klines = store.get_klines('BNBUSDT', '1m', 99)
+        check(failures, '推送缺口:', ok and contiguous(klines) and klines[-1][4] == PUSHED_CLOSE,
+              f"缺口后窗口不连续或不是推送值: {klines[-3:] if klines else None}")
+    finally:
+        subscriber.stop()
+        server.stop()
+
+
+def check_partial_failure(failures):
+    """单个序列补齐失败不影响其他序列，REST恢复后下一条推送触发补齐"""
+    market = FakeMarket()
+    market.failing.add('ETHUSDT')
+    store = CandleStore()
+    server = FakeStreamServer().start()
+    subscriber = run_subscriber(server, store, market, ['BNBUSDT', 'ETHUSDT'])
+    try:
+        check(failures, '补齐失败:', subscriber.wait_ready(5), '未就绪')
+        check(failures, '补齐失败:', store.get_klines('BNBUSDT', '1m', 50) is not None, '其他序列不可读')
+        check(failures, '补齐失败:', store.get_klines('ETHUSDT', '1m', 50) is None, '失败的序列仍可读')
+
+        market.failing.clear()
+        server.broadcast(kline_event('ETHUSDT', make_kline(market.now_open, PUSHED_CLOSE)))
+        ok = wait_for(lambda: store.get_klines('ETHUSDT', '1m', 50) is not None)
+        klines = store.get_klines('ETHUSDT', '1m', 50)
+        check(failures, '补齐失败:', ok and klines[-1][4] == PUSHED_CLOSE and contiguous(klines),
+              'REST恢复后推送未触发补齐')
+    finally:
+        subscriber.stop()
+        server.stop()
+
+
+def check_reconnect(failures):
+    """断线后读不到，重连补齐后恢复"""
+    market = FakeMarket()
+    store = CandleStore()
+    server = FakeStreamServer().start()
+    subscriber = run_subscriber(server, store, market, ['BNBUSDT'])
+    try:
+        check(failures, '重连:', subscriber.wait_ready(5), '未就绪')
+        calls_before = len(market.calls)
+        # 重连后的补齐先挡住，断线到补齐完成之间K线都应读不到
+        market.gate.clear()
+        server.drop_connections()
+        check(failures, '重连:', wait_for(lambda: len(market.calls) > calls_before),
+              '重连后未补齐')
+        check(failures, '重连:', store.get_klines('BNBUSDT', '1m', 50) is None, '断线重连后补齐前K线仍可读取')
+        market.gate.set()
+        check(failures, '重连:', wait_for(lambda: store.get_klines('BNBUSDT', '1m', 50) is not None),
+              '重连后K线不可读')
+        check(failures, '重连:', server.connect_count == 2 and len(market.calls) > calls_before,
+              f"连接 {server.connect_count} 次，重连后补齐 {len(market.calls) - calls_before} 次")
+    finally:
+        market.gate.set()
+        subscriber.stop()
+        server.stop()
+
+
+def main():
+    failures = []
+    checks = (check_slow_catch_up, check_gap_reseed, check_partial_failure, check_reconnect)
+    for run_check in checks:
+        run_check(failures)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'❌' if failures else '✅'} 行情推送检查 {len(checks)} 组，{len(failures)} 项不符")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supabase后台写入检查：SupabaseWriter 和 TradingStatistics 对着本地PostgREST替身（FakePostgRESTServer）逐项核对
+
+- 统计数据多次提交只写最后一份（一次写入），决策按batch_size分批insert且保持顺序
+- Supabase不可用时统计和决策落盘，重试等待期内不再访问网络；恢复后按顺序重放并删除落盘文件
+- 后台线程 stop() 时写完剩余数据
+- 机器人保存决策（TradingStatistics.save_decision）同时写入本地存储和Supabase
+
+任一项不符即以退出码1结束，可直接用于CI。
+
+用法: python benchmarks/check_supabase_writer.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_ins import FakePostgRESTServer  # noqa: E402
+from supabase_writer import SupabaseWriter  # noqa: E402
+
+
+def decision(n):
+    return {'action': 'HOLD', 'coin': 'BNB', 'confidence': 'LOW', 'reason': f"决策{n}",
+            'decision_time': f"2024-01-01T00:{n // 60:02d}:{n % 60:02d}"}
+
+
+def check(failures, label, ok, detail=''):
+    if not ok:
+        failures.append(f"{label} {detail}".strip())
+
+
+def check_writer(failures, client, server, workdir):
+    spill_file = os.path.join(workdir, 'spill.jsonl')
+    writer = SupabaseWriter(client, spill_file=spill_file, batch_size=50, retry_interval=0.3)
+
+    # 合并与分批
+    for n in range(5):
+        writer.submit_stats({'total_trades': n, 'win_trades': 0, 'total_pnl': 0.0, 'last_update': f"t{n}"})
+    for n in range(120):
+        writer.submit_decision(decision(n))
+    writer.flush()
+    stats_rows = server.tables.get('trading_stats', [])
+    check(failures, '合并:', len(stats_rows) == 1 and stats_rows[0]['total_trades'] == 4, f"统计表 {stats_rows}")
+    check(failures, '合并:', server.count('POST', 'trading_stats') == 1,
+          f"统计写入 {server.count('POST', 'trading_stats')} 次")
+    reasons = [row['reason'] for row in server.tables.get('ai_decisions', [])]
+    check(failures, '分批:', reasons == [f"决策{n}" for n in range(120)], f"决策 {len(reasons)} 条或顺序不对")
+    check(failures, '分批:', server.count('POST', 'ai_decisions') == 3,
+          f"决策insert {server.count('POST', 'ai_decisions')} 次")
+
+    # 已知id后按id upsert，统计表仍只有一行
+    writer.submit_stats({'total_trades': 9, 'win_trades': 1, 'total_pnl': 1.5, 'last_update': 't9'})
+    writer.flush()
+    stats_rows = server.tables['trading_stats']
+    check(failures, 'upsert:', len(stats_rows) == 1 and stats_rows[0]['total_trades'] == 9, f"统计表 {stats_rows}")
+
+    # 不可用时落盘，重试等待期内不访问网络
+    server.failing = True
+    writer.submit_stats({'total_trades': 10, 'win_trades': 1, 'total_pnl': 2.0, 'last_update': 't10'})
+    for n in range(120, 130):
+        writer.submit_decision(decision(n))
+    writer.flush()
+    requests_after_failure = len(server.requests)
+    writer.submit_stats({'total_trades': 11, 'win_trades': 2, 'total_pnl': 3.0, 'last_update': 't11'})
+    for n in range(130, 135):
+        writer.submit_decision(decision(n))
+    writer.flush()
+    check(failures, '落盘:', os.path.exists(spill_file), '落盘文件不存在')
+    check(failures, '落盘:', len(server.requests) == requests_after_failure,
+          f"重试等待期内仍发出 {len(server.requests) - requests_after_failure} 个请求")
+
+    # 恢复后重放：决策按原顺序补齐，统计为最后一份，落盘文件删除
+    server.failing = False
+    time.sleep(0.35)
+    writer.flush()
+    reasons = [row['reason'] for row in server.tables['ai_decisions']]
+    check(failures, '重放:', reasons == [f"决策{n}" for n in range(135)], f"决策 {len(reasons)} 条或顺序不对")
+    stats_rows = server.tables['trading_stats']
+    check(failures, '重放:', len(stats_rows) == 1 and stats_rows[0]['total_trades'] == 11, f"统计表 {stats_rows}")
+    check(failures, '重放:', not os.path.exists(spill_file) and not os.path.exists(spill_file + '.replay'),
+          '落盘文件未删除')
+
+    # 后台线程：stop() 时写完剩余数据
+    writer.flush_interval = 60
+    writer.start()
+    for n in range(135, 140):
+        writer.submit_decision(decision(n))
+    writer.stop()
+    check(failures, '停止:', len(server.tables['ai_decisions']) == 140 and writer.pending == 0,
+          f"停止后Supabase中 {len(server.tables['ai_decisions'])} 条，队列剩余 {writer.pending} 条")
+
+
+def check_trading_statistics(failures, server, workdir):
+    """机器人保存决策的路径：本地存储和Supabase都有这条决策"""
+    from storage import JsonStorage
+    from trading_statistics import TradingStatistics
+
+    os.environ['SUPABASE_URL'] = server.url
+    os.environ['SUPABASE_KEY'] = 'stub-key'
+    storage = JsonStorage(stats_file=os.path.join(workdir, 'stats.json'),
+                          decisions_file=os.path.join(workdir, 'decisions.jsonl'),
+                          trades_file=os.path.join(workdir, 'trades.jsonl'), writable=True)
+    stats = TradingStatistics(storage=storage)
+    check(failures, '决策路径:', stats.writer is not None, '未启用后台写入')
+    if stats.writer is None:
+        return
+    before = len(server.tables.get('ai_decisions', []))
+    stats.save_decision(action='BUY_OPEN', coin='ETH', confidence='HIGH', reason='突破前高')
+    local = storage.query_decisions(limit=1, coin='ETH')
+    check(failures, '决策路径:', len(local) == 1 and local[0]['action'] == 'BUY_OPEN', f"本地 {local}")
+    stats.writer.stop()
+    rows = server.tables.get('ai_decisions', [])[before:]
+    check(failures, '决策路径:', len(rows) == 1 and rows[0]['coin'] == 'ETH' and rows[0]['decision_time'] == local[0]['time'],
+          f"Supabase {rows}")
+
+
+def main():
+    from supabase import create_client
+
+    failures = []
+    server = FakePostgRESTServer().start()
+    workdir = tempfile.mkdtemp(prefix='check_supabase_')
+    try:
+        check_writer(failures, create_client(server.url, 'stub-key'), server, workdir)
+        check_trading_statistics(failures, server, workdir)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'❌' if failures else '✅'} Supabase后台写入检查：{len(failures)} 项不符")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
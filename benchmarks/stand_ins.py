@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试用的本地替身：币安U本位合约REST与WebSocket推送服务、OpenAI兼容的AI服务和Supabase（PostgREST）服务
+
+都是真实的本地HTTP服务（127.0.0.1随机端口），机器人用原本的 python-binance Client、
+openai 和 supabase 客户端访问，请求签名、HTTP往返、JSON解析、SSE流式解析都照常发生；
+每个请求按配置的延迟和抖动（正态分布标准差）等待后返回。
+serve_in_subprocess() 在独立进程中运行交易所和AI两个服务，替身自身的CPU开销不计入被测进程。
+
+K线来自回放数据：每个交易对共用同一条15分钟K线序列（按交易对名称缩放价格），
+advance() 前进一根K线，模拟一个交易周期过去。
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+INTERVAL_MS = {'15m': 900000, '1h': 3600000}
+
+
+class Latency:
+    """请求延迟：均值latency秒，抖动jitter为正态分布标准差，不小于0"""
+
+    def __init__(self, latency: float, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            return max(self.latency + self._rng.gauss(0.0, self.jitter), 0.0) if self.jitter else self.latency
+
+    def sleep(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def synthetic_columns(count: int, seed: int = 0, start_ms: int = 1704067200000) -> Dict[str, np.ndarray]:
+    """随机游走生成15分钟K线列数组（没有录制数据时使用，结果可复现）"""
+    rng = np.random.default_rng(seed)
+    close = 600.0 * np.exp(np.cumsum(rng.normal(0, 0.004, count)))
+    open_price = np.concatenate(([600.0], close[:-1]))
+    return {
+        'open_time': start_ms + np.arange(count, dtype=np.int64) * INTERVAL_MS['15m'],
+        'open': open_price,
+        'high': np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.002, count))),
+        'low': np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.002, count))),
+        'close': close,
+        'volume': rng.uniform(100, 1000, count),
+    }
+
+
+class KlineReplay:
+    """
+    按游标回放15分钟K线：游标处为当前（未收盘）K线，之前的都已收盘
+
+    1小时K线由15分钟K线按开盘时间对齐聚合
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], start: int = 200):
+        self.columns = {name: np.asarray(columns[name]) for name in ('open_time', 'open', 'high', 'low', 'close', 'volume')}
+        self.cursor = min(max(start, 1), len(self.columns['close']) - 1)
+        self._lock = threading.Lock()
+
+    def advance(self):
+        with self._lock:
+            if self.cursor < len(self.columns['close']) - 1:
+                self.cursor += 1
+            else:
+                # 数据用完后从头循环
+                self.cursor = 200 if len(self.columns['close']) > 400 else 1
+
+    @staticmethod
+    def _scale(symbol: str) -> float:
+        return 0.5 + (zlib.crc32(symbol.encode()) % 1000) / 500.0
+
+    def _rows(self, symbol: str, end: int, count: int) -> List[List[Any]]:
+        start = max(end - count + 1, 0)
+        scale = self._scale(symbol)
+        c = self.columns
+        rows = []
+        for i in range(start, end + 1):
+            open_time = int(c['open_time'][i])
+            rows.append([
+                open_time, f"{c['open'][i] * scale:.4f}", f"{c['high'][i] * scale:.4f}",
+                f"{c['low'][i] * scale:.4f}", f"{c['close'][i] * scale:.4f}", f"{c['volume'][i]:.3f}",
+                open_time + INTERVAL_MS['15m'] - 1, f"{c['volume'][i] * c['close'][i] * scale:.2f}",
+                100, f"{c['volume'][i] / 2:.3f}", f"{c['volume'][i] * c['close'][i] * scale / 2:.2f}", '0',
+            ])
+        return rows
+
+    def klines(self, symbol: str, interval: str, limit: int) -> List[List[Any]]:
+        with self._lock:
+            cursor = self.cursor
+        if interval == '15m':
+            return self._rows(symbol, cursor, limit)
+        step = INTERVAL_MS[interval] // INTERVAL_MS['15m']
+        rows = self._rows(symbol, cursor, limit * step + step)
+        grouped: Dict[int, List[List[Any]]] = {}
+        for row in rows:
+            grouped.setdefault(row[0] // INTERVAL_MS[interval] * INTERVAL_MS[interval], []).append(row)
+        result = []
+        for open_time, group in sorted(grouped.items())[-limit:]:
+            result.append([
+                open_time, group[0][1], f"{max(float(r[2]) for r in group):.4f}",
+                f"{min(float(r[3]) for r in group):.4f}", group[-1][4],
+                f"{sum(float(r[5]) for r in group):.3f}", open_time + INTERVAL_MS[interval] - 1,
+                f"{sum(float(r[7]) for r in group):.2f}", 100 * len(group), '0', '0', '0',
+            ])
+        return result
+
+    def last_price(self, symbol: str) -> float:
+        with self._lock:
+            return float(self.columns['close'][self.cursor]) * self._scale(symbol)
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self) -> Dict[str, str]:
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode('utf-8')
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params.update(json.loads(body))
+            else:
+                params.update({k: v[-1] for k, v in parse_qs(body).items()})
+        return params
+
+    def send_json(self, payload: Any, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _LocalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler):
+        super().__init__(('127.0.0.1', 0), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeFuturesServer(_LocalServer):
+    """
+    币安U本位合约REST替身：行情接口从KlineReplay回放，账户/持仓/下单在内存中维护
+
+    市价单按当前K线收盘价立即成交，持仓按单向持仓模式累加；
+    exchangeInfo 返回symbols中各交易对的统一下单规则，杠杆初始为交易所默认的20倍
+    """
+
+    def __init__(self, replay: KlineReplay, latency: Latency, balance: float = 10000.0,
+                 symbols: Optional[List[str]] = None):
+        super().__init__(self._make_handler())
+        self.replay = replay
+        self.latency = latency
+        self.balance = balance
+        self.symbols = list(symbols or [])
+        self.leverage: Dict[str, int] = {}
+        self.positions: Dict[str, Dict[str, float]] = {}
+        self.request_counts: Dict[str, int] = {}
+        self.orders = 0
+        self._lock = threading.Lock()
+
+    def _make_handler(server_self):
+        class Handler(_JsonHandler):
+            def do_GET(self):
+                server_self._dispatch(self, 'GET')
+
+            def do_POST(self):
+                server_self._dispatch(self, 'POST')
+
+            def do_DELETE(self):
+                server_self._dispatch(self, 'DELETE')
+
+        return Handler
+
+    def _dispatch(self, handler: _JsonHandler, method: str):
+        path = urlsplit(handler.path).path
+        params = handler._params()
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+        self.latency.sleep()
+        route = self.routes().get((method, path))
+        if route is None:
+            handler.send_json({'code': -5000, 'msg': f'unsupported {method} {path}'}, status=404)
+            return
+        handler.send_json(route(params))
+
+    def routes(self) -> Dict[Any, Callable[[Dict[str, str]], Any]]:
+        return {
+            ('POST', '/bench/advance'): self._advance,
+            ('GET', '/fapi/v1/ping'): lambda p: {},
+            ('GET', '/fapi/v1/time'): lambda p: {'serverTime': int(time.time() * 1000)},
+            ('GET', '/fapi/v1/exchangeInfo'): self._exchange_info,
+            ('GET', '/fapi/v1/klines'): lambda p: self.replay.klines(p['symbol'], p['interval'], int(p.get('limit', 500))),
+            ('GET', '/fapi/v1/ticker/24hr'): self._ticker,
+            ('GET', '/fapi/v1/fundingRate'): lambda p: [{
+                'symbol': p['symbol'], 'fundingRate': '0.00010000', 'fundingTime': int(time.time() * 1000),
+            }],
+            ('GET', '/fapi/v1/openInterest'): lambda p: {
+                'symbol': p['symbol'], 'openInterest': '123456.789', 'time': int(time.time() * 1000),
+            },
+            ('GET', '/fapi/v3/positionRisk'): self._position_risk,
+            ('GET', '/fapi/v2/account'): self._account,
+            ('POST', '/fapi/v1/leverage'): self._change_leverage,
+            ('POST', '/fapi/v1/order'): self._order,
+        }
+
+    def _advance(self, params):
+        """基准控制接口：前进一根K线"""
+        self.replay.advance()
+        return {'cursor': self.replay.cursor}
+
+    def _ticker(self, params):
+        klines = self.replay.klines(params['symbol'], '15m', 96)
+        first, last = float(klines[0][1]), float(klines[-1][4])
+        return {
+            'symbol': params['symbol'],
+            'lastPrice': f"{last:.4f}",
+            'priceChangePercent': f"{(last / first - 1) * 100:.3f}",
+            'volume': f"{sum(float(k[5]) for k in klines):.3f}",
+            'quoteVolume': f"{sum(float(k[7]) for k in klines):.2f}",
+        }
+
+    def _exchange_info(self, params):
+        filters = [
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.0100', 'maxPrice': '1000000', 'tickSize': '0.0100'},
+            {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '10000'},
+            {'filterType': 'MARKET_LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '2000'},
+            {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+        ]
+        return {'symbols': [{
+            'symbol': symbol, 'status': 'TRADING', 'pricePrecision': 2, 'quantityPrecision': 3, 'filters': filters,
+        } for symbol in self.symbols]}
+
+    def _change_leverage(self, params):
+        with self._lock:
+            self.leverage[params['symbol']] = int(params['leverage'])
+        return {'symbol': params['symbol'], 'leverage': int(params['leverage']), 'maxNotionalValue': '1000000'}
+
+    def _position_risk(self, params):
+        symbols = [params['symbol']] if 'symbol' in params else list(self.positions)
+        result = []
+        with self._lock:
+            for symbol in symbols:
+                position = self.positions.get(symbol, {'amount': 0.0, 'entry': 0.0})
+                result.append({
+                    'symbol': symbol,
+                    'positionAmt': f"{position['amount']:.6f}",
+                    'entryPrice': f"{position['entry']:.4f}",
+                    'unRealizedProfit': '0.0',
+                })
+        return result
+
+    def _account(self, params):
+        with self._lock:
+            positions = []
+            for symbol in self.symbols:
+                position = self.positions.get(symbol, {'amount': 0.0, 'entry': 0.0})
+                positions.append({
+                    'symbol': symbol,
+                    'positionSide': 'BOTH',
+                    'positionAmt': f"{position['amount']:.6f}",
+                    'entryPrice': f"{position['entry']:.4f}",
+                    'unrealizedProfit': '0.0',
+                    'leverage': str(self.leverage.get(symbol, 20)),
+                    'isolated': False,
+                })
+        return {
+            'assets': [{
+                'asset': 'USDT',
+                'walletBalance': f"{self.balance:.4f}",
+                'crossWalletBalance': f"{self.balance:.4f}",
+                'availableBalance': f"{self.balance:.4f}",
+                'unrealizedProfit': '0.0',
+            }],
+            'positions': positions,
+        }
+
+    def _order(self, params):
+        symbol = params['symbol']
+        qty = float(params['quantity'])
+        price = self.replay.last_price(symbol)
+        with self._lock:
+            self.orders += 1
+            position = self.positions.setdefault(symbol, {'amount': 0.0, 'entry': 0.0})
+            position['amount'] += qty if params['side'] == 'BUY' else -qty
+            position['entry'] = price if abs(position['amount']) > 1e-12 else 0.0
+            order_id = self.orders
+        return {
+            'orderId': order_id, 'symbol': symbol, 'status': 'FILLED', 'side': params['side'],
+            'type': params.get('type', 'MARKET'), 'origQty': params['quantity'], 'executedQty': params['quantity'],
+            'avgPrice': f"{price:.4f}", 'updateTime': int(time.time() * 1000),
+        }
+
+
+class FakeLLMServer(_LocalServer):
+    """
+    OpenAI兼容的 /v1/chat/completions 替身
+
+    首token前等待ttft，之后每个分片间隔token_interval秒；decide(messages)返回回复的决策字典
+    """
+
+    def __init__(self, ttft: Latency, token_interval: float, decide: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+                 chunk_chars: int = 12):
+        super().__init__(self._make_handler())
+        self.ttft = ttft
+        self.token_interval = token_interval
+        self.decide = decide
+        self.chunk_chars = chunk_chars
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _make_handler(server_self):
+        class Handler(_JsonHandler):
+            def do_POST(self):
+                server_self._complete(self)
+
+        return Handler
+
+    def _complete(self, handler: _JsonHandler):
+        request = handler._params()
+        with self._lock:
+            self.requests += 1
+        content = json.dumps(self.decide(request['messages']), ensure_ascii=False)
+        usage = {
+            'prompt_tokens': sum(len(m['content']) for m in request['messages']) // 3,
+            'completion_tokens': len(content) // 3,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        created = int(time.time())
+        self.ttft.sleep()
+
+        if not request.get('stream'):
+            time.sleep(self.token_interval * (len(content) // self.chunk_chars))
+            handler.send_json({
+                'id': 'bench', 'object': 'chat.completion', 'created': created, 'model': request['model'],
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            handler.wfile.flush()
+
+        for start in range(0, len(content), self.chunk_chars):
+            if start:
+                time.sleep(self.token_interval)
+            send_event(json.dumps({
+                'id': 'bench', 'object': 'chat.completion.chunk', 'created': created, 'model': request['model'],
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + self.chunk_chars]}, 'finish_reason': None}],
+            }, ensure_ascii=False))
+        send_event(json.dumps({
+            'id': 'bench', 'object': 'chat.completion.chunk', 'created': created, 'model': request['model'],
+            'choices': [], 'usage': usage,
+        }))
+        send_event('[DONE]')
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+
+
+class FakePostgRESTServer(_LocalServer):
+    """
+    Supabase（PostgREST）REST替身：表数据保存在内存中，supabase客户端按原样访问 /rest/v1/<表名>
+
+    支持 select（order=列.desc、limit）、insert（单行或多行）和按id的upsert；
+    failing为True时所有请求返回503，用于模拟Supabase不可用
+    """
+
+    def __init__(self):
+        super().__init__(self._make_handler())
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests: List[Tuple[str, str, int]] = []
+        self.failing = False
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _make_handler(server_self):
+        class Handler(_JsonHandler):
+            def do_GET(self):
+                server_self._dispatch(self, 'GET')
+
+            def do_POST(self):
+                server_self._dispatch(self, 'POST')
+
+        return Handler
+
+    def _dispatch(self, handler: _JsonHandler, method: str):
+        parts = urlsplit(handler.path)
+        table = parts.path.rsplit('/', 1)[-1]
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length).decode('utf-8')) if length else None
+        rows = body if isinstance(body, list) else [body] if body else []
+        with self._lock:
+            self.requests.append((method, table, len(rows)))
+            if self.failing:
+                handler.send_json({'message': 'service unavailable', 'code': '503'}, status=503)
+                return
+            stored = self.tables.setdefault(table, [])
+            if method == 'GET':
+                result = list(stored)
+                if 'order' in params:
+                    column, _, direction = params['order'].partition('.')
+                    result.sort(key=lambda row: row.get(column) or '', reverse=direction == 'desc')
+                if 'limit' in params:
+                    result = result[:int(params['limit'])]
+                handler.send_json(result)
+                return
+            upsert = 'merge-duplicates' in handler.headers.get('Prefer', '')
+            result = []
+            for row in rows:
+                row = dict(row)
+                existing = next((r for r in stored if upsert and r['id'] == row.get('id')), None)
+                if existing is not None:
+                    existing.update(row)
+                    result.append(existing)
+                    continue
+                if 'id' not in row:
+                    row['id'] = self._next_id
+                    self._next_id += 1
+                stored.append(row)
+                result.append(row)
+            handler.send_json(result, status=201)
+
+    def count(self, method: str, table: str) -> int:
+        """对某张表的请求次数"""
+        with self._lock:
+            return sum(1 for m, t, _ in self.requests if m == method and t == table)
+
+
+class FakeStreamServer:
+    """
+    币安WebSocket推送替身（websockets同步服务，127.0.0.1随机端口），任何路径都接受
+
+    on_connect(connection) 在每个连接建立后调用，可立即推送初始事件；
+    broadcast() 向当前所有连接推送，drop_connections() 模拟服务端断线
+    """
+
+    def __init__(self, on_connect: Optional[Callable[[Any], None]] = None):
+        from websockets.sync.server import serve
+
+        self.on_connect = on_connect
+        self.connections: List[Any] = []
+        self.connect_count = 0
+        self._lock = threading.Lock()
+        self._server = serve(self._handle, '127.0.0.1', 0)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self._server.socket.getsockname()[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='FakeStreamServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.drop_connections()
+        self._server.shutdown()
+
+    def _handle(self, connection):
+        with self._lock:
+            self.connections.append(connection)
+            self.connect_count += 1
+        try:
+            if self.on_connect:
+                self.on_connect(connection)
+            for _ in connection:
+                pass
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                if connection in self.connections:
+                    self.connections.remove(connection)
+
+    def broadcast(self, payload: Dict[str, Any]):
+        message = json.dumps(payload)
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.send(message)
+            except Exception:
+                pass
+
+    def drop_connections(self):
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+
+def binance_client(url: str):
+    """指向替身服务的 python-binance Client（不ping）"""
+    from binance.client import Client
+
+    client = Client('bench-key', 'bench-secret', ping=False)
+    client.FUTURES_URL = f"{url}/fapi"
+    return client
+
+
+def openai_client(url: str):
+    """指向替身服务的 openai 客户端（不重试）"""
+    from openai import OpenAI
+
+    return OpenAI(api_key='bench-key', base_url=f"{url}/v1", max_retries=0)
+
+
+def advance(url: str):
+    """让替身的K线回放前进一根"""
+    from urllib.request import urlopen, Request
+
+    with urlopen(Request(f"{url}/bench/advance", data=b'', method='POST')) as response:
+        response.read()
+
+
+def rotating_decisions(actions: List[str]) -> Callable[[List[Dict[str, Any]]], Dict[str, Any]]:
+    """按请求顺序轮换回复的操作（不包含反向开仓时不会触发平仓再开仓）"""
+    counter = {'n': 0}
+    lock = threading.Lock()
+
+    def decide(messages):
+        with lock:
+            action = actions[counter['n'] % len(actions)]
+            counter['n'] += 1
+        return {
+            'action': action,
+            'confidence': 'MEDIUM',
+            'reason': '15分钟K线收于布林中轨上方，MACD柱由负转正，RSI中性，1小时趋势向上，BTC同步走强，维持当前判断。',
+        }
+
+    return decide
+
+
+def _serve(conn, columns, config):
+    exchange = FakeFuturesServer(
+        KlineReplay(columns, start=config['start']),
+        Latency(config['rest_latency'], config['rest_jitter'], seed=1),
+        symbols=config['symbols']
+    ).start()
+    llm = FakeLLMServer(
+        Latency(config['llm_ttft'], config['llm_jitter'], seed=2),
+        config['llm_token_interval'],
+        rotating_decisions(config['actions'])
+    ).start()
+    conn.send((exchange.url, llm.url))
+    # 父进程关闭连接（或退出）时结束
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    exchange.stop()
+    llm.stop()
+
+
+def serve_in_subprocess(columns: Dict[str, np.ndarray], rest_latency: float, rest_jitter: float,
+                        llm_ttft: float, llm_jitter: float, llm_token_interval: float,
+                        actions: List[str], symbols: Optional[List[str]] = None, start: int = 200):
+    """
+    在子进程中启动交易所和AI替身，返回 (exchange_url, llm_url, stop)
+
+    stop() 关闭两个服务并等待子进程退出
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_serve, daemon=True, args=(child_conn, columns, {
+        'rest_latency': rest_latency, 'rest_jitter': rest_jitter,
+        'llm_ttft': llm_ttft, 'llm_jitter': llm_jitter, 'llm_token_interval': llm_token_interval,
+        'actions': actions, 'symbols': symbols, 'start': start,
+    }))
+    process.start()
+    exchange_url, llm_url = parent_conn.recv()
+
+    def stop():
+        parent_conn.send('stop')
+        process.join(timeout=5)
+
+    return exchange_url, llm_url, stop
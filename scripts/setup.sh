@@ -175,10 +175,10 @@ except ImportError as e:
     sys.exit(1)
 
 try:
-    import schedule
-    print('✅ schedule模块导入成功')
+    import numpy
+    print('✅ numpy模块导入成功')
 except ImportError as e:
-    print(f'❌ schedule模块导入失败: {e}')
+    print(f'❌ numpy模块导入失败: {e}')
     sys.exit(1)
 
 print('✅ 所有依赖模块验证通过')
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Account Stream Module - Binance futures user data stream mirror
+账户推送模块 - 通过listenKey用户数据流维护账户余额、持仓和订单成交的内存镜像
+
+连接（及每次重连）时先用一次 futures_account 建立快照，之后由 ACCOUNT_UPDATE /
+ACCOUNT_CONFIG_UPDATE / ORDER_TRADE_UPDATE 推送增量更新；读取方拿到与
+futures_account / futures_position_information 相同格式的数据，无需每轮请求REST。
+listenKey每30分钟续期一次，同时用REST校准一次快照；续期失败、收到listenKeyExpired
+或断线时重新申请listenKey并重连，断开期间读取返回None，调用方回退REST。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+import websocket
+
+from market_stream import FUTURES_STREAM_URL
+
+logger = logging.getLogger(__name__)
+
+# 订单的最终状态，等待成交时遇到即返回
+FINAL_ORDER_STATUSES = ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED', 'EXPIRED_IN_MATCH')
+
+
+class AccountMirror:
+    """
+    账户状态镜像（线程安全）
+
+    推送只包含钱包余额，不包含可用余额：可用余额按
+    全仓钱包余额 + 全仓未实现盈亏 - 全仓持仓初始保证金 估算，并以最近一次REST快照的
+    availableBalance校准（挂单占用等公式未覆盖的部分保持快照时的差值）。
+    mark_price(symbol) 提供实时标记价格时按标记价格计算未实现盈亏，否则使用最近一次推送的值。
+    """
+
+    def __init__(self, asset: str = 'USDT', mark_price: Optional[Callable[[str], Optional[float]]] = None,
+                 max_orders: int = 200):
+        self.asset = asset
+        self.mark_price = mark_price
+        self.max_orders = max_orders
+        self.connected = False
+        self.synced_at: Optional[float] = None
+        self._balances: Dict[str, Dict[str, float]] = {}
+        self._positions: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._leverage: Dict[str, int] = {}
+        self._orders: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        # 各条目最近一次推送的成交时间（毫秒），校准时不用更旧的快照覆盖
+        self._event_times: Dict[Any, int] = {}
+        self._available_offset = 0.0
+        self._lock = threading.Condition()
+
+    def apply_snapshot(self, account: Dict[str, Any], requested_at: int):
+        """
+        写入futures_account（v2）快照
+
+        requested_at: 发出REST请求时的毫秒时间戳，之后已有推送更新的条目保留推送的值
+        """
+        with self._lock:
+            for asset in account.get('assets', []):
+                if self._event_times.get(('balance', asset['asset']), 0) >= requested_at:
+                    continue
+                self._balances[asset['asset']] = {
+                    'wallet': float(asset['walletBalance']),
+                    'cross_wallet': float(asset.get('crossWalletBalance', asset['walletBalance'])),
+                    'unrealized': float(asset['unrealizedProfit']),
+                }
+            for position in account.get('positions', []):
+                symbol = position['symbol']
+                if position.get('leverage') and self._event_times.get(('leverage', symbol), 0) < requested_at:
+                    self._leverage[symbol] = int(position['leverage'])
+                key = (symbol, position.get('positionSide', 'BOTH'))
+                if self._event_times.get(('position', key), 0) >= requested_at:
+                    continue
+                amount = float(position['positionAmt'])
+                if amount:
+                    self._positions[key] = {
+                        'amount': amount,
+                        'entry_price': float(position['entryPrice']),
+                        'unrealized': float(position['unrealizedProfit']),
+                        'isolated': bool(position.get('isolated', False)),
+                    }
+                else:
+                    self._positions.pop(key, None)
+
+            self._available_offset = 0.0
+            for asset in account.get('assets', []):
+                if asset['asset'] == self.asset:
+                    self._available_offset = float(asset['availableBalance']) - self._estimate_available()
+            self.synced_at = time.time()
+
+    def handle_event(self, event: Dict[str, Any]):
+        """分发单条用户数据流事件"""
+        event_type = event.get('e')
+        if event_type == 'ACCOUNT_UPDATE':
+            self._apply_account_update(event)
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            self._apply_order_update(event)
+        elif event_type == 'ACCOUNT_CONFIG_UPDATE' and 'ac' in event:
+            self.set_leverage(event['ac']['s'], event['ac']['l'], event.get('T', event.get('E', 0)))
+        elif event_type == 'MARGIN_CALL':
+            logger.warning(f"🚨 保证金预警: {event.get('p')}")
+
+    def set_leverage(self, symbol: str, leverage: int, event_time: Optional[int] = None):
+        """更新交易对杠杆（推送事件，或调整杠杆请求的响应）"""
+        with self._lock:
+            self._leverage[symbol] = int(leverage)
+            self._event_times[('leverage', symbol)] = event_time or int(time.time() * 1000)
+
+    def _apply_account_update(self, event: Dict[str, Any]):
+        update = event['a']
+        event_time = event.get('T', event.get('E', 0))
+        with self._lock:
+            for balance in update.get('B', []):
+                entry = self._balances.setdefault(balance['a'], {'unrealized': 0.0})
+                entry['wallet'] = float(balance['wb'])
+                entry['cross_wallet'] = float(balance['cw'])
+                self._event_times[('balance', balance['a'])] = event_time
+            for position in update.get('P', []):
+                key = (position['s'], position.get('ps', 'BOTH'))
+                amount = float(position['pa'])
+                if amount:
+                    self._positions[key] = {
+                        'amount': amount,
+                        'entry_price': float(position['ep']),
+                        'unrealized': float(position['up']),
+                        'isolated': position.get('mt') == 'isolated',
+                    }
+                else:
+                    self._positions.pop(key, None)
+                self._event_times[('position', key)] = event_time
+
+    def _apply_order_update(self, event: Dict[str, Any]):
+        order = event['o']
+        avg_price = float(order.get('ap') or 0)
+        with self._lock:
+            self._orders[order['i']] = {
+                'symbol': order['s'],
+                'side': order['S'],
+                'status': order['X'],
+                'qty': float(order.get('z') or 0),
+                'price': avg_price if avg_price > 0 else None,
+                'update_time': order.get('T'),
+            }
+            self._orders.move_to_end(order['i'])
+            while len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+            self._lock.notify_all()
+
+    def _is_fresh(self) -> bool:
+        return self.connected and self.synced_at is not None
+
+    def _position_pnl(self, symbol: str, position: Dict[str, Any]) -> Tuple[float, float]:
+        """返回 (未实现盈亏, 估值价格)，有实时标记价格时按标记价格计算"""
+        mark = self.mark_price(symbol) if self.mark_price else None
+        if mark:
+            return position['amount'] * (mark - position['entry_price']), mark
+        return position['unrealized'], position['entry_price'] + position['unrealized'] / position['amount']
+
+    def _estimate_available(self) -> float:
+        balance = self._balances.get(self.asset)
+        if balance is None:
+            return 0.0
+        available = balance['cross_wallet']
+        for (symbol, _), position in self._positions.items():
+            if position['isolated'] or not symbol.endswith(self.asset):
+                continue
+            pnl, price = self._position_pnl(symbol, position)
+            available += pnl
+            # 杠杆未知时无法估算占用保证金，这部分由快照校准差值覆盖
+            if symbol in self._leverage:
+                available -= abs(position['amount']) * price / self._leverage[symbol]
+        return available
+
+    def get_account(self) -> Optional[Dict[str, Any]]:
+        """futures_account格式（assets + 有持仓或已知杠杆的positions），未同步或断开时返回None"""
+        with self._lock:
+            if not self._is_fresh():
+                return None
+            assets = []
+            for asset, balance in self._balances.items():
+                unrealized = balance['unrealized']
+                if asset == self.asset:
+                    unrealized = sum(self._position_pnl(symbol, position)[0]
+                                     for (symbol, _), position in self._positions.items()
+                                     if symbol.endswith(self.asset))
+                assets.append({
+                    'asset': asset,
+                    'walletBalance': str(balance['wallet']),
+                    'crossWalletBalance': str(balance['cross_wallet']),
+                    'availableBalance': str(self._estimate_available() + self._available_offset
+                                            if asset == self.asset else balance['cross_wallet']),
+                    'unrealizedProfit': str(unrealized),
+                })
+            return {'assets': assets, 'positions': self._position_rows(None)}
+
+    def get_positions(self, symbol: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """futures_position_information格式，未同步或断开时返回None"""
+        with self._lock:
+            if not self._is_fresh():
+                return None
+            return self._position_rows(symbol)
+
+    def _position_rows(self, symbol: Optional[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for (position_symbol, side), position in self._positions.items():
+            if symbol is not None and position_symbol != symbol:
+                continue
+            pnl, price = self._position_pnl(position_symbol, position)
+            row = {
+                'symbol': position_symbol,
+                'positionSide': side,
+                'positionAmt': str(position['amount']),
+                'entryPrice': str(position['entry_price']),
+                'markPrice': str(price),
+                'unRealizedProfit': str(pnl),
+                'unrealizedProfit': str(pnl),
+                'isolated': position['isolated'],
+            }
+            # 杠杆未知时不带该字段，避免读取方把猜测值当成交易所的当前杠杆
+            if position_symbol in self._leverage:
+                row['leverage'] = str(self._leverage[position_symbol])
+            rows.append(row)
+        # 没有持仓的交易对只带杠杆（与futures_account的positions一致）
+        for leverage_symbol, leverage in self._leverage.items():
+            if (symbol is None or leverage_symbol == symbol) and not any(
+                    row['symbol'] == leverage_symbol for row in rows):
+                rows.append({'symbol': leverage_symbol, 'positionSide': 'BOTH', 'positionAmt': '0',
+                             'entryPrice': '0', 'unRealizedProfit': '0', 'unrealizedProfit': '0',
+                             'leverage': str(leverage)})
+        return rows
+
+    def get_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """最近推送的订单状态 {'symbol', 'side', 'status', 'qty', 'price', 'update_time'}"""
+        with self._lock:
+            order = self._orders.get(order_id)
+            return dict(order) if order else None
+
+    def wait_order(self, order_id: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """等待订单推送到最终状态，超时返回最近一次的状态（可能为None）"""
+        deadline = time.time() + timeout
+        with self._lock:
+            while self.connected:
+                order = self._orders.get(order_id)
+                remaining = deadline - time.time()
+                if (order and order['status'] in FINAL_ORDER_STATUSES) or remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            order = self._orders.get(order_id)
+            return dict(order) if order else None
+
+    def lookup_rest(self, method: str, kwargs: Dict[str, Any]) -> Optional[Any]:
+        """按REST方法名从镜像构造同格式响应，无法提供时返回None"""
+        if method == 'futures_account':
+            return self.get_account()
+        if method == 'futures_position_information':
+            return self.get_positions(kwargs.get('symbol'))
+        return None
+
+
+class AccountStreamSubscriber:
+    """后台订阅用户数据流：listenKey续期、断线重连并用REST重新建立快照"""
+
+    def __init__(self, mirror: AccountMirror, client: Any, base_url: str = FUTURES_STREAM_URL,
+                 keepalive_interval: float = 1800, reconnect_delay: float = 3.0):
+        """client 需提供 futures_stream_get_listen_key / futures_stream_keepalive / futures_stream_close / futures_account"""
+        self.mirror = mirror
+        self.client = client
+        self.base_url = base_url.rstrip('/')
+        self.keepalive_interval = keepalive_interval
+        self.reconnect_delay = reconnect_delay
+        self.listen_key: Optional[str] = None
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动后台订阅线程和续期线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='account-stream', daemon=True)
+        self._thread.start()
+        self._keepalive_thread = threading.Thread(target=self._keepalive, name='account-keepalive', daemon=True)
+        self._keepalive_thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """等待首次连接完成（快照已建立），超时返回False"""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        """停止订阅并关闭listenKey"""
+        self._stop.set()
+        self.mirror.connected = False
+        if self._ws:
+            self._ws.close()
+        for thread in (self._thread, self._keepalive_thread):
+            if thread:
+                thread.join(timeout=5)
+        if self.listen_key:
+            try:
+                self.client.futures_stream_close(self.listen_key)
+            except Exception:
+                pass
+
+    def resync(self):
+        """用REST快照校准镜像（推送在快照请求之后更新过的条目保持不变）"""
+        requested_at = int(time.time() * 1000)
+        self.mirror.apply_snapshot(self.client.futures_account(), requested_at)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.listen_key = self.client.futures_stream_get_listen_key()
+            except Exception as e:
+                logger.warning(f"⚠️ 获取listenKey失败: {str(e)[:100]}，{self.reconnect_delay:.0f}秒后重试")
+                self._stop.wait(self.reconnect_delay)
+                continue
+            self._ws = websocket.WebSocketApp(
+                f"{self.base_url}/ws/{self.listen_key}",
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            self._ws.run_forever(ping_interval=60, ping_timeout=10)
+            self.mirror.connected = False
+            if not self._stop.is_set():
+                logger.warning(f"⚠️ 账户推送断开，{self.reconnect_delay:.0f}秒后重连")
+                self._stop.wait(self.reconnect_delay)
+
+    def _keepalive(self):
+        # listenKey 60分钟未续期即失效；续期失败时断开，由_run重新申请
+        while not self._stop.wait(self.keepalive_interval):
+            if not self.mirror.connected:
+                continue
+            try:
+                self.client.futures_stream_keepalive(self.listen_key)
+                self.resync()
+            except Exception as e:
+                logger.warning(f"⚠️ 账户推送续期/校准失败: {str(e)[:100]}，重新连接")
+                if self._ws:
+                    self._ws.close()
+
+    def _on_open(self, ws):
+        # 回调与推送在同一线程处理，快照建立前收到的推送排队等待，之后按顺序应用
+        try:
+            self.resync()
+        except Exception as e:
+            logger.warning(f"⚠️ 账户快照获取失败: {str(e)[:100]}")
+            ws.close()
+            return
+        self.mirror.connected = True
+        self._ready.set()
+        logger.info("✅ 账户推送已连接")
+
+    def _on_message(self, ws, message):
+        try:
+            event = json.loads(message)
+            if event.get('e') == 'listenKeyExpired':
+                logger.warning("⚠️ listenKey已过期，重新连接")
+                ws.close()
+                return
+            self.mirror.handle_event(event)
+        except Exception as e:
+            logger.warning(f"⚠️ 解析账户推送失败: {e}")
+
+    def _on_error(self, ws, error):
+        logger.warning(f"⚠️ 账户推送错误: {error}")
+
+    def _on_close(self, ws, status_code, message):
+        self.mirror.connected = False
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+App Context Module - Lazily created clients and components for the trading bot
+运行上下文模块 - 按需创建交易机器人的外部客户端和各组件
+
+构造 AppContext 没有任何副作用：不读取.env、不配置日志、不联网、不写文件。
+环境变量、日志、Binance/DeepSeek客户端、存储、交易统计、K线缓存、账户镜像、决策缓存、
+交易所规则缓存、检查点、阶段耗时指标都在首次访问时创建（线程安全，只创建一次），较重的依赖（openai、python-binance、
+websocket、numpy）也在那时才导入。测试、回测、网页进程可以直接导入复用，
+只取需要的组件，不必连接交易所。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AppContext:
+    """交易机器人的运行上下文，config为交易配置（TRADE_CONFIG），只在创建组件时读取"""
+
+    def __init__(self, config: Dict[str, Any], env_file: Optional[str] = None,
+                 log_file: str = 'bnb_trader.log', connect_retries: int = 5, retry_delay: float = 3.0):
+        self.config = config
+        self.env_file = env_file or os.path.join(PROJECT_ROOT, '.env')
+        self.log_file = log_file
+        self.connect_retries = connect_retries
+        self.retry_delay = retry_delay
+        # 行情/账户推送订阅由调用方启动后挂到上下文上
+        self.market_stream = None
+        self.account_stream = None
+        self._components: Dict[str, Any] = {}
+        # 可重入：组件的创建函数可能依赖其他组件（如交易统计依赖存储）
+        self._lock = threading.RLock()
+        self._env_loaded = False
+        self._logging_ready = False
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = factory()
+                    self._components[name] = component
+        return component
+
+    def provide(self, name: str, component: Any):
+        """注入现成的组件（测试替身，或在其他进程中复用已有的客户端/存储）"""
+        with self._lock:
+            self._components[name] = component
+
+    def load_env(self):
+        """加载项目根目录的.env（只加载一次，已存在的环境变量不覆盖）"""
+        with self._lock:
+            if self._env_loaded:
+                return
+            from dotenv import load_dotenv
+            load_dotenv(self.env_file)
+            self._env_loaded = True
+
+    def setup_logging(self):
+        """日志同时写入滚动文件和控制台（只配置一次）"""
+        with self._lock:
+            if self._logging_ready:
+                return
+            log_handler = RotatingFileHandler(
+                self.log_file,
+                maxBytes=10*1024*1024,
+                backupCount=3,
+                encoding='utf-8'
+            )
+            log_handler.setFormatter(logging.Formatter('%(message)s'))
+
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('%(message)s'))
+
+            logging.basicConfig(
+                level=logging.INFO,
+                handlers=[log_handler, console_handler]
+            )
+            self._logging_ready = True
+
+    @property
+    def metrics(self):
+        def create():
+            from metrics import Metrics
+
+            return Metrics()
+        return self._get('metrics', create)
+
+    @property
+    def binance_client(self):
+        # 每个REST方法的调用耗时记录为 binance.<方法名>
+        return self._get('binance_client', lambda: self.metrics.instrument(self._connect_binance(), 'binance'))
+
+    def _connect_binance(self):
+        """创建Binance客户端（创建时会请求交易所），失败重试，全部失败抛出ConnectionError"""
+        from binance.client import Client
+
+        self.load_env()
+        logger.info("🔗 正在连接Binance API...")
+        for attempt in range(self.connect_retries):
+            try:
+                client = Client(
+                    api_key=os.getenv('BINANCE_API_KEY'),
+                    api_secret=os.getenv('BINANCE_SECRET'),
+                    requests_params={'timeout': 30}
+                )
+                logger.info("✅ Binance客户端初始化成功")
+                return client
+            except Exception as e:
+                logger.warning(f"⚠️ Binance连接失败 (尝试 {attempt + 1}/{self.connect_retries}): {str(e)[:100]}")
+                if attempt < self.connect_retries - 1:
+                    logger.info(f"   等待 {self.retry_delay} 秒后重试...")
+                    time.sleep(self.retry_delay)
+        raise ConnectionError("无法连接到Binance API，请检查网络连接")
+
+    @property
+    def deepseek_client(self):
+        def create():
+            from openai import OpenAI
+
+            self.load_env()
+            return OpenAI(
+                api_key=os.getenv('DEEPSEEK_API_KEY'),
+                base_url=os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com")
+            )
+        return self._get('deepseek_client', create)
+
+    @property
+    def storage(self):
+        def create():
+            from storage import open_storage
+
+            # STORAGE_BACKEND=sqlite/json，SQLite为空时自动导入已有的JSON数据
+            self.load_env()
+            return open_storage(writable=True)
+        return self._get('storage', create)
+
+    @property
+    def trading_stats(self):
+        def create():
+            from trading_statistics import TradingStatistics
+
+            # 与机器人共用同一个存储
+            return TradingStatistics(storage=self.storage, fee_rate=self.config['taker_fee_rate'])
+        return self._get('trading_stats', create)
+
+    @property
+    def candle_store(self):
+        def create():
+            from market_stream import CandleStore
+
+            return CandleStore()
+        return self._get('candle_store', create)
+
+    @property
+    def account_mirror(self):
+        def create():
+            from account_stream import AccountMirror
+
+            # 未实现盈亏按行情推送的实时标记价格计算
+            return AccountMirror(mark_price=self.candle_store.get_mark_price)
+        return self._get('account_mirror', create)
+
+    @property
+    def decision_cache(self):
+        def create():
+            from decision_cache import DecisionCache
+
+            return DecisionCache(
+                ttl_seconds=self.config['decision_cache_ttl'],
+                price_bucket_pct=self.config['decision_cache_price_pct'],
+                rsi_bucket=self.config['decision_cache_rsi_step']
+            )
+        return self._get('decision_cache', create)
+
+    @property
+    def exchange_info(self):
+        def create():
+            from exchange_info import ExchangeInfoCache
+
+            def set_leverage(symbol, leverage):
+                response = self.binance_client.futures_change_leverage(symbol=symbol, leverage=leverage)
+                # 账户镜像同步新杠杆，不依赖ACCOUNT_CONFIG_UPDATE推送先于下一轮到达
+                self.account_mirror.set_leverage(symbol, response.get('leverage', leverage))
+                return response
+
+            return ExchangeInfoCache(
+                loader=lambda: self.binance_client.futures_exchange_info(),
+                leverage_setter=set_leverage,
+                ttl=self.config['exchange_info_ttl']
+            )
+        return self._get('exchange_info', create)
+
+    @property
+    def checkpoint(self):
+        def create():
+            from checkpoint import Checkpoint
+
+            checkpoint = Checkpoint(self.config['checkpoint_file'])
+            checkpoint.register('candles', self.candle_store.to_state, self.candle_store.load_state)
+            checkpoint.register('decision_cache', self.decision_cache.to_state, self.decision_cache.load_state)
+            checkpoint.register('exchange_info', self.exchange_info.to_state, self.exchange_info.load_state)
+            return checkpoint
+        return self._get('checkpoint', create)
@@ -0,0 +1,657 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backtest Module - Vectorized backtesting over historical klines
+回测模块 - 基于历史K线的向量化回测
+
+流程：
+1. 指标：全部15分钟K线用NumPy内核一次性计算；1小时指标由15分钟K线聚合后计算，
+   每根15分钟K线只对齐到已收盘的1小时K线（不使用未来数据）
+2. 决策：可插拔的策略。向量化策略一次返回全部动作；逐根策略（规则函数、带缓存/桩的LLM）
+   每根K线收盘时调用，可以看到当前模拟持仓
+3. 账户：模拟U本位合约账户（杠杆、按比例开仓、吃单手续费、滑点、每8小时资金费、强平），
+   在K线收盘时决策、下一根K线开盘价成交，与实盘“收盘后几秒下单”一致
+
+注意：实盘每轮只取最近17/30根K线计算指标，EMA/SMA50等长周期指标与全历史计算的结果存在差异，
+回测使用的是全历史（已收敛）的指标值。
+
+用法:
+  python src/backtest.py --symbol BNBUSDT --start 2022-01-01   （读取 kline_store 下载的数据）
+  python src/backtest.py --file BNBUSDT-15m.csv [--leverage 3 --fee 0.0004 --funding 0.0001]
+
+Author: AI Trading Bot
+License: MIT
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Callable, Optional, Union
+
+import numpy as np
+
+from indicators import INDICATOR_FIELDS, parse_klines, compute_indicators
+from kline_store import DEFAULT_STORE_DIR, INTERVAL_MS, KlineStore, parse_time
+from prompt_builder import SYSTEM_PROMPT, build_prompt
+from trade_ledger import PerformanceMetrics, build_trade
+
+ACTIONS = ('HOLD', 'BUY_OPEN', 'SELL_OPEN', 'CLOSE')
+HOLD, BUY_OPEN, SELL_OPEN, CLOSE = range(4)
+
+FUNDING_INTERVAL_MS = 8 * 3600 * 1000  # 币安资金费每8小时结算（UTC 00/08/16点）
+YEAR_MS = 365 * 86400 * 1000
+
+# 动作 → 目标持仓方向（HOLD不改变持仓）
+_TARGETS = {BUY_OPEN: 1, SELL_OPEN: -1, CLOSE: 0}
+_SIDES = {1: 'LONG', -1: 'SHORT'}
+
+
+def load_klines(path: str) -> Dict[str, np.ndarray]:
+    """
+    读取K线文件为列数组（与 parse_klines 返回格式相同）
+
+    支持 .json（futures_klines原始列表）和 .csv（data.binance.vision 的K线格式，表头可有可无）
+    """
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_klines(json.load(f))
+
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+    skip = 0 if first[:1].isdigit() else 1
+    raw = np.loadtxt(path, delimiter=',', usecols=range(6), skiprows=skip, dtype=np.float64, ndmin=2)
+    return {
+        'open_time': raw[:, 0].astype(np.int64),
+        'open': np.ascontiguousarray(raw[:, 1]),
+        'high': np.ascontiguousarray(raw[:, 2]),
+        'low': np.ascontiguousarray(raw[:, 3]),
+        'close': np.ascontiguousarray(raw[:, 4]),
+        'volume': np.ascontiguousarray(raw[:, 5]),
+    }
+
+
+def resample(columns: Dict[str, np.ndarray], interval_ms: int) -> Dict[str, np.ndarray]:
+    """把K线聚合为更大周期（按UTC整点对齐），最后一根可能未收盘"""
+    key = columns['open_time'] // interval_ms
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+    ends = np.concatenate((starts[1:], [len(key)])) - 1
+    return {
+        'open_time': key[starts] * interval_ms,
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+
+
+def build_features(columns: Dict[str, np.ndarray], interval: str = '15m',
+                   higher_interval: Optional[str] = '1h') -> Dict[str, Any]:
+    """
+    一次性计算全部K线的指标
+
+    返回 {K线列..., 指标名: 数组, 'h1_'+指标名: 对齐后的高周期指标数组,
+          'higher': 高周期K线及指标, 'higher_index': 每根K线对应的已收盘高周期K线下标（无则为-1）}
+    """
+    features: Dict[str, Any] = dict(columns)
+    features['interval_ms'] = INTERVAL_MS[interval]
+    features.update(compute_indicators(columns['high'], columns['low'], columns['close']))
+
+    if higher_interval:
+        higher_ms = INTERVAL_MS[higher_interval]
+        higher = resample(columns, higher_ms)
+        higher.update(compute_indicators(higher['high'], higher['low'], higher['close']))
+        # K线收盘时已经收盘的最后一根高周期K线
+        close_time = columns['open_time'] + features['interval_ms']
+        index = np.searchsorted(higher['open_time'] + higher_ms, close_time, side='right') - 1
+        safe_index = np.maximum(index, 0)
+        for field in INDICATOR_FIELDS:
+            features['h1_' + field] = np.where(index >= 0, higher[field][safe_index], np.nan)
+        features['higher'] = higher
+        features['higher_index'] = index
+    return features
+
+
+class Strategy:
+    """
+    决策函数接口
+
+    向量化策略实现 prepare() 返回每根K线的动作编码数组（HOLD/BUY_OPEN/SELL_OPEN/CLOSE）；
+    prepare() 返回None时，模拟器在每根K线收盘时调用 decide(bar) 逐根决策。
+    """
+
+    warmup = 50  # 前warmup根K线指标未稳定，不做决策
+
+    def prepare(self, features: Dict[str, Any]) -> Optional[np.ndarray]:
+        return None
+
+    def decide(self, bar: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        """bar包含当前K线、指标值、index、features和模拟持仓position；返回动作或含action的字典"""
+        raise NotImplementedError
+
+
+class RuleStrategy(Strategy):
+    """示例规则策略（向量化）：15分钟与1小时MACD同向且价格在SMA50同侧时顺势开仓，RSI极值时平仓"""
+
+    def __init__(self, rsi_high: float = 75.0, rsi_low: float = 25.0):
+        self.rsi_high = rsi_high
+        self.rsi_low = rsi_low
+
+    def prepare(self, features: Dict[str, Any]) -> np.ndarray:
+        close = features['close']
+        macd_up = features['macd'] > features['macd_signal']
+        h1_macd = features.get('h1_macd', features['macd'])
+        long_cond = macd_up & (h1_macd > 0) & (close > features['sma_50']) & (features['rsi'] < self.rsi_high)
+        short_cond = ~macd_up & (h1_macd < 0) & (close < features['sma_50']) & (features['rsi'] > self.rsi_low)
+        exit_cond = (features['rsi'] >= self.rsi_high) | (features['rsi'] <= self.rsi_low)
+
+        actions = np.full(len(close), HOLD, dtype=np.int8)
+        actions[exit_cond] = CLOSE
+        actions[long_cond] = BUY_OPEN
+        actions[short_cond] = SELL_OPEN
+        return actions
+
+
+class CallableStrategy(Strategy):
+    """把普通函数 fn(bar) -> 动作 包装为逐根决策策略"""
+
+    def __init__(self, fn: Callable[[Dict[str, Any]], Union[str, Dict[str, Any]]], warmup: int = 50):
+        self.fn = fn
+        self.warmup = warmup
+
+    def decide(self, bar: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        return self.fn(bar)
+
+
+def parse_decision_text(text: str) -> Dict[str, Any]:
+    """从AI回复中提取JSON决策，无法解析时返回HOLD"""
+    start_idx = text.find('{')
+    end_idx = text.rfind('}') + 1
+    if start_idx != -1 and end_idx != 0:
+        try:
+            return json.loads(text[start_idx:end_idx])
+        except ValueError:
+            pass
+    return {'action': 'HOLD', 'reason': '解析失败', 'confidence': 'LOW'}
+
+
+class LLMStrategy(Strategy):
+    """
+    用实盘同款提示词驱动LLM（或桩函数）逐根决策
+
+    complete(messages) 返回模型回复文本；回复按提示词的SHA1缓存到cache_file（JSONL），
+    重复回测同一段行情时不再调用模型。every控制每隔几根K线决策一次。
+    """
+
+    def __init__(self, complete: Callable[[List[Dict[str, str]]], str], coin: str = 'BNB', leverage: int = 3,
+                 prompt_format: str = 'compact', cache_file: Optional[str] = None, every: int = 1,
+                 reason_chars: int = 40):
+        self.complete = complete
+        self.coin = coin
+        self.leverage = leverage
+        self.prompt_format = prompt_format
+        self.cache_file = cache_file
+        self.every = max(1, every)
+        self.reason_chars = reason_chars
+        self.calls = 0
+        self.cache_hits = 0
+        self._recent: deque = deque(maxlen=3)
+        self._cache: Dict[str, str] = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._cache[record['key']] = record['response']
+
+    def decide(self, bar: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        if bar['index'] % self.every:
+            return 'HOLD'
+        features = bar['features']
+        i = bar['index']
+        start_time = _to_datetime(features['open_time'][0])
+        bar_time = _to_datetime(features['open_time'][i])
+        self.calls += 1
+        prompt = build_prompt(self.prompt_format, {
+            'coin': self.coin,
+            'leverage': self.leverage,
+            'market_data': bar_market_data(features, i, bar['position']),
+            'data_1h': bar_higher_data(features, i),
+            'btc_data': None,
+            'balance': bar['balance'],
+            'stats_text': '',
+            'recent_decisions': list(self._recent),
+            'start_time': start_time,
+            'runtime_minutes': (bar_time - start_time).total_seconds() / 60,
+            'invocation_count': self.calls,
+        }, reason_chars=self.reason_chars)
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+        key = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+        response = self._cache.get(key)
+        if response is None:
+            response = self.complete(messages)
+            self._cache[key] = response
+            if self.cache_file:
+                with open(self.cache_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+        else:
+            self.cache_hits += 1
+
+        decision = parse_decision_text(response)
+        self._recent.append({
+            'time': bar_time.isoformat(),
+            'coin': self.coin,
+            'action': decision.get('action', 'HOLD'),
+            'reason': decision.get('reason', 'N/A'),
+            'confidence': decision.get('confidence', 'LOW'),
+        })
+        return decision
+
+
+def _to_datetime(open_time_ms: int) -> datetime:
+    return datetime.fromtimestamp(int(open_time_ms) / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _iso(open_time_ms: int) -> str:
+    return _to_datetime(open_time_ms).isoformat()
+
+
+def bar_market_data(features: Dict[str, Any], i: int, position: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """按实盘 build_market_data 的字段构造第i根K线收盘时的市场数据（无持仓量数据，资金费率为0）"""
+    interval_min = features['interval_ms'] / 60000
+    open_time, o, h, l, c, v = (features[k] for k in ('open_time', 'open', 'high', 'low', 'close', 'volume'))
+    start = _to_datetime(open_time[i])
+    day_bars = int(86400000 // features['interval_ms'])
+    history = [
+        [int(open_time[k]), o[k], h[k], l[k], c[k], v[k]]
+        for k in range(max(0, i - 16), i)
+    ]
+    return {
+        'symbol': features.get('symbol'),
+        'price': float(c[i]),
+        'change_24h': float((c[i] / c[i - day_bars] - 1) * 100) if i >= day_bars else 0.0,
+        'change_15m': float((c[i] / c[i - 16] - 1) * 100) if i >= 16 else 0.0,
+        'funding_rate': 0.0,
+        'open_interest': 0.0,
+        'position': position,
+        'current_kline': {
+            'open': float(o[i]),
+            'high': float(h[i]),
+            'low': float(l[i]),
+            'close': float(c[i]),
+            'volume': float(v[i]),
+            'change': float((c[i] - o[i]) / o[i] * 100) if o[i] > 0 else 0.0,
+            'elapsed_min': interval_min,
+            'start_time': start.strftime('%H:%M'),
+            'end_time': (start + timedelta(minutes=interval_min)).strftime('%H:%M'),
+        },
+        'historical_klines': history,
+        'rsi': float(features['rsi'][i]),
+        'macd': float(features['macd'][i]),
+        'macd_signal': float(features['macd_signal'][i]),
+        'atr': float(features['atr_14'][i]),
+        'bb_position': float(features['bb_position'][i]),
+        'sma_20': float(features['sma_20'][i]),
+        'sma_50': float(features['sma_50'][i]),
+        'rsi_series': features['rsi'][max(0, i - 9):i + 1].tolist(),
+        'macd_series': features['macd'][max(0, i - 9):i + 1].tolist(),
+        'atr_series': features['atr_14'][max(0, i - 9):i + 1].tolist(),
+    }
+
+
+def bar_higher_data(features: Dict[str, Any], i: int) -> Optional[Dict[str, Any]]:
+    """第i根K线收盘时已收盘的1小时指标（字段同实盘 build_1h_data）"""
+    if 'higher' not in features or features['higher_index'][i] < 0:
+        return None
+    higher = features['higher']
+    j = int(features['higher_index'][i])
+    return {
+        'rsi': float(higher['rsi'][j]),
+        'macd': float(higher['macd'][j]),
+        'macd_signal': float(higher['macd_signal'][j]),
+        'sma_20': float(higher['sma_20'][j]),
+        'sma_50': float(higher['sma_50'][j]),
+        'rsi_series': higher['rsi'][max(0, j - 9):j + 1].tolist(),
+        'macd_series': higher['macd'][max(0, j - 9):j + 1].tolist(),
+    }
+
+
+def _action_code(decision: Union[str, Dict[str, Any], None]) -> int:
+    if isinstance(decision, dict):
+        decision = decision.get('action')
+    try:
+        return ACTIONS.index(decision)
+    except ValueError:
+        return HOLD
+
+
+class FuturesAccount:
+    """
+    模拟U本位合约账户（单交易对、单向持仓）
+
+    开仓保证金 = 钱包余额 × margin_ratio，名义价值 = 保证金 × 杠杆；
+    强平价按逐仓公式估算，强平时损失全部保证金。
+    """
+
+    def __init__(self, features: Dict[str, Any], initial_balance: float = 1000.0, leverage: int = 3,
+                 margin_ratio: float = 0.3, fee_rate: float = 0.0004, slippage_bps: float = 0.0,
+                 funding_rate: Union[float, np.ndarray] = 0.0001, maintenance_margin_rate: float = 0.004,
+                 min_balance: float = 10.0, qty_step: float = 0.0, symbol: str = 'BNBUSDT'):
+        self.features = features
+        self.wallet = initial_balance
+        self.leverage = leverage
+        self.margin_ratio = margin_ratio
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10000.0
+        self.maintenance_margin_rate = maintenance_margin_rate
+        self.min_balance = min_balance
+        self.qty_step = qty_step
+        self.symbol = symbol
+        self.trades: List[Dict[str, Any]] = []
+
+        self.side = 0
+        self.qty = 0.0
+        self.entry_price = 0.0
+        self.entry_bar = 0
+        self.liq_price = 0.0
+        self.checked = 0  # 已检查过强平的最后一根K线
+
+        # 资金费前缀和：F[b] = Σ(k≤b) 结算标记 × 费率 × 开盘价，持仓期间资金费 = 方向 × 数量 × (F[出] - F[入])
+        open_time = features['open_time']
+        settles = (open_time % FUNDING_INTERVAL_MS) == 0
+        rates = np.broadcast_to(np.asarray(funding_rate, dtype=np.float64), open_time.shape)
+        self._funding_prefix = np.cumsum(np.where(settles, rates * features['open'], 0.0))
+
+    @property
+    def margin(self) -> float:
+        return self.entry_price * self.qty / self.leverage if self.side else 0.0
+
+    def position(self, i: int) -> Optional[Dict[str, Any]]:
+        """第i根K线收盘时的持仓（字段与实盘 parse_position 一致）"""
+        if not self.side:
+            return None
+        price = self.features['close'][i]
+        return {
+            'side': _SIDES[self.side],
+            'amount': self.qty,
+            'entry_price': self.entry_price,
+            'unrealized_pnl': float(self.side * self.qty * (price - self.entry_price)),
+            'leverage': self.leverage,
+        }
+
+    def balance(self, i: int) -> Dict[str, float]:
+        position = self.position(i)
+        unrealized = position['unrealized_pnl'] if position else 0.0
+        return {
+            'total': self.wallet,
+            'available': self.wallet - self.margin + min(unrealized, 0.0),
+            'unrealized_pnl': unrealized,
+        }
+
+    def check_liquidation(self, i: int):
+        """检查 (checked, i] 区间内是否触及强平价"""
+        if self.side and i > self.checked:
+            if self.side > 0:
+                hits = self.features['low'][self.checked + 1:i + 1] <= self.liq_price
+            else:
+                hits = self.features['high'][self.checked + 1:i + 1] >= self.liq_price
+            if hits.any():
+                bar = self.checked + 1 + int(np.argmax(hits))
+                self._close(bar, self.liq_price, liquidated=True)
+        self.checked = i
+
+    def execute(self, i: int, action: int):
+        """第i根K线收盘时决策，按第i+1根K线开盘价（含滑点）成交"""
+        target = _TARGETS.get(action)
+        if target is None or target == self.side or i + 1 >= len(self.features['open']):
+            return
+        fill_bar = i + 1
+        price = float(self.features['open'][fill_bar])
+        if self.side:
+            self._close(fill_bar, price * (1 - self.side * self.slippage))
+        if target:
+            self._open(fill_bar, target, price * (1 + target * self.slippage))
+        self.checked = i
+
+    def _open(self, bar: int, side: int, price: float):
+        if self.wallet <= self.min_balance:
+            return
+        qty = self.wallet * self.margin_ratio * self.leverage / price
+        if self.qty_step > 0:
+            qty = math.floor(qty / self.qty_step) * self.qty_step
+        if qty <= 0:
+            return
+        self.side = side
+        self.qty = qty
+        self.entry_price = price
+        self.entry_bar = bar
+        self.liq_price = price * (1 - side * (1.0 / self.leverage - self.maintenance_margin_rate))
+
+    def _close(self, bar: int, price: float, liquidated: bool = False):
+        prefix = self._funding_prefix
+        funding = float(self.side * self.qty * (prefix[bar] - prefix[self.entry_bar]))
+        open_time = self.features['open_time']
+        trade = build_trade(
+            self.symbol, _SIDES[self.side], self.qty, self.entry_price, price,
+            entry_time=_iso(open_time[self.entry_bar]), exit_time=_iso(open_time[bar]),
+            fee_rate=self.fee_rate, leverage=self.leverage, funding=funding,
+        )
+        if liquidated:
+            # 强平清算费：剩余的维持保证金归保险基金
+            clearance = self.maintenance_margin_rate * self.qty * self.entry_price
+            trade['fees'] += clearance
+            trade['pnl'] -= clearance
+            trade['is_win'] = False
+        trade['entry_bar'] = self.entry_bar
+        trade['exit_bar'] = bar
+        trade['liquidated'] = liquidated
+        self.trades.append(trade)
+        self.wallet += trade['pnl']
+        self.side = 0
+        self.qty = 0.0
+
+
+def run_backtest(columns: Dict[str, np.ndarray], strategy: Strategy, interval: str = '15m',
+                 initial_balance: float = 1000.0, leverage: int = 3, margin_ratio: float = 0.3,
+                 fee_rate: float = 0.0004, slippage_bps: float = 0.0,
+                 funding_rate: Union[float, np.ndarray] = 0.0001, maintenance_margin_rate: float = 0.004,
+                 qty_step: float = 0.0, symbol: str = 'BNBUSDT', close_at_end: bool = True) -> Dict[str, Any]:
+    """
+    回测一个交易对
+
+    funding_rate 可为常数或与K线等长的数组（在每根K线开盘时刻结算时使用）。
+    返回 {'summary', 'trades', 'equity', 'open_time', 'actions', 'features'}
+    """
+    started = time.perf_counter()
+    features = build_features(columns, interval)
+    features['symbol'] = symbol
+    n = len(columns['close'])
+    account = FuturesAccount(
+        features, initial_balance=initial_balance, leverage=leverage, margin_ratio=margin_ratio,
+        fee_rate=fee_rate, slippage_bps=slippage_bps, funding_rate=funding_rate,
+        maintenance_margin_rate=maintenance_margin_rate, qty_step=qty_step, symbol=symbol,
+    )
+    indicator_seconds = time.perf_counter() - started
+
+    actions = strategy.prepare(features)
+    warmup = min(strategy.warmup, n)
+    if actions is not None:
+        actions = np.asarray(actions, dtype=np.int8)
+        actions[:warmup] = HOLD
+        # 只在动作可能改变持仓的K线上推进账户
+        for i in np.flatnonzero(actions != HOLD):
+            account.check_liquidation(int(i))
+            account.execute(int(i), int(actions[i]))
+    else:
+        actions = np.full(n, HOLD, dtype=np.int8)
+        for i in range(warmup, n - 1):
+            account.check_liquidation(i)
+            bar = {field: float(features[field][i]) for field in ('open', 'high', 'low', 'close', 'volume')}
+            bar.update({field: float(features[field][i]) for field in INDICATOR_FIELDS})
+            bar.update(index=i, time=_iso(features['open_time'][i]), features=features,
+                       position=account.position(i), balance=account.balance(i))
+            actions[i] = _action_code(strategy.decide(bar))
+            account.execute(i, int(actions[i]))
+
+    account.check_liquidation(n - 1)
+    open_at_end = account.position(n - 1)
+    if account.side and close_at_end:
+        account._close(n - 1, float(features['close'][n - 1]))
+
+    equity = equity_curve(features, account.trades, initial_balance, open_at_end if not close_at_end else None,
+                          account.entry_bar)
+    summary = summarize(features, account.trades, equity, initial_balance)
+    summary['indicator_seconds'] = indicator_seconds
+    summary['elapsed_seconds'] = time.perf_counter() - started
+    return {
+        'summary': summary,
+        'trades': account.trades,
+        'equity': equity,
+        'open_time': features['open_time'],
+        'actions': actions,
+        'features': features,
+    }
+
+
+def equity_curve(features: Dict[str, Any], trades: List[Dict[str, Any]], initial_balance: float,
+                 open_position: Optional[Dict[str, Any]] = None, open_entry_bar: int = 0) -> np.ndarray:
+    """按收盘价逐根计算账户权益（钱包余额 + 未实现盈亏）"""
+    close = features['close']
+    n = len(close)
+    realized = np.zeros(n)
+    unrealized = np.zeros(n)
+    for trade in trades:
+        realized[trade['exit_bar']] += trade['pnl']
+        direction = 1 if trade['side'] == 'LONG' else -1
+        segment = slice(trade['entry_bar'], trade['exit_bar'])
+        unrealized[segment] = direction * trade['qty'] * (close[segment] - trade['entry_price'])
+    if open_position:
+        direction = 1 if open_position['side'] == 'LONG' else -1
+        segment = slice(open_entry_bar, n)
+        unrealized[segment] = direction * open_position['amount'] * (close[segment] - open_position['entry_price'])
+    return initial_balance + np.cumsum(realized) + unrealized
+
+
+def summarize(features: Dict[str, Any], trades: List[Dict[str, Any]], equity: np.ndarray,
+              initial_balance: float) -> Dict[str, Any]:
+    """回测汇总：收益、逐根权益回撤、年化夏普，以及与实盘同口径的逐笔绩效指标"""
+    metrics = PerformanceMetrics()
+    for trade in trades:
+        metrics.update(trade, equity_before=initial_balance)
+    per_trade = metrics.summary()
+    per_trade.pop('equity_curve')
+
+    open_time = features['open_time']
+    close = features['close']
+    years = max((open_time[-1] - open_time[0]) / YEAR_MS, 1e-9)
+    final = float(equity[-1])
+    peak = np.maximum.accumulate(equity)
+    drawdown = (peak - equity) / peak
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(equity) / equity[:-1]
+    returns = returns[np.isfinite(returns)]
+    bars_per_year = YEAR_MS / features['interval_ms']
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    sharpe = float(returns.mean() / std * math.sqrt(bars_per_year)) if std > 0 else None
+
+    held_bars = sum(t['exit_bar'] - t['entry_bar'] for t in trades)
+    growth = final / initial_balance
+    return {
+        'bars': len(close),
+        'start': _iso(open_time[0]),
+        'end': _iso(open_time[-1]),
+        'initial_balance': initial_balance,
+        'final_equity': final,
+        'total_return_pct': (growth - 1) * 100,
+        'annual_return_pct': (growth ** (1 / years) - 1) * 100 if growth > 0 else -100.0,
+        'buy_hold_return_pct': float((close[-1] / close[0] - 1) * 100),
+        'max_drawdown_pct': float(drawdown.max() * 100),
+        'sharpe_annualized': sharpe,
+        'exposure_pct': held_bars / len(close) * 100,
+        'liquidations': sum(1 for t in trades if t.get('liquidated')),
+        'total_funding': sum(t['funding'] for t in trades),
+        'per_trade': per_trade,
+    }
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """回测报告文本"""
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+
+    per_trade = summary['per_trade']
+    hold = per_trade['avg_hold_minutes']
+    return "\n".join([
+        "=" * 60,
+        f"回测区间: {summary['start'][:16]} → {summary['end'][:16]}（{summary['bars']}根K线）",
+        f"初始资金: {summary['initial_balance']:.2f} USDT | 最终权益: {summary['final_equity']:.2f} USDT",
+        f"总收益: {summary['total_return_pct']:+.2f}% | 年化: {summary['annual_return_pct']:+.2f}% | "
+        f"持有不动: {summary['buy_hold_return_pct']:+.2f}%",
+        f"最大回撤(逐根): {summary['max_drawdown_pct']:.2f}% | 年化夏普(逐根): {fmt(summary['sharpe_annualized'], '.2f')}",
+        f"交易: {per_trade['trades']}笔 | 胜率 {fmt(per_trade['win_rate'], '.1%')} | "
+        f"盈亏比 {fmt(per_trade['profit_factor'], '.2f')} | 平均持仓 {fmt(hold, '.0f')}分钟 | "
+        f"持仓时间占比 {summary['exposure_pct']:.1f}%",
+        f"每笔夏普 {fmt(per_trade['sharpe'], '.2f')} | 每笔索提诺 {fmt(per_trade['sortino'], '.2f')} | "
+        f"强平 {summary['liquidations']}次",
+        f"手续费: {per_trade['total_fees']:.2f} USDT | 资金费: {summary['total_funding']:.2f} USDT",
+        f"耗时: 指标 {summary['indicator_seconds']:.3f}秒 | 总计 {summary['elapsed_seconds']:.3f}秒",
+        "=" * 60,
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K线历史回测')
+    parser.add_argument('--file', help='K线文件（.csv 或 .json），不指定时从K线存储读取')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='K线存储目录（见kline_store.py）')
+    parser.add_argument('--start', help='开始时间（UTC），如 2022-01-01')
+    parser.add_argument('--end', help='结束时间（UTC）')
+    parser.add_argument('--symbol', default='BNBUSDT')
+    parser.add_argument('--interval', default='15m', choices=sorted(INTERVAL_MS))
+    parser.add_argument('--balance', type=float, default=1000.0, help='初始资金（USDT）')
+    parser.add_argument('--leverage', type=int, default=3)
+    parser.add_argument('--margin-ratio', type=float, default=0.3, help='每次开仓使用余额的比例')
+    parser.add_argument('--fee', type=float, default=0.0004, help='吃单手续费率')
+    parser.add_argument('--slippage-bps', type=float, default=0.0, help='成交滑点（基点）')
+    parser.add_argument('--funding', type=float, default=0.0001, help='每8小时资金费率（多头支付为正）')
+    parser.add_argument('--trades-out', help='把逐笔交易写入JSONL文件')
+    args = parser.parse_args()
+
+    if args.file:
+        columns = load_klines(args.file)
+    else:
+        columns = KlineStore(args.store).read(
+            args.symbol, args.interval,
+            parse_time(args.start) if args.start else None,
+            parse_time(args.end) if args.end else None,
+        )
+        if not columns:
+            print(f"❌ {args.store} 中没有 {args.symbol} {args.interval} 的K线，"
+                  f"请先运行 python src/kline_store.py download")
+            return
+    result = run_backtest(
+        columns, RuleStrategy(), interval=args.interval, initial_balance=args.balance,
+        leverage=args.leverage, margin_ratio=args.margin_ratio, fee_rate=args.fee,
+        slippage_bps=args.slippage_bps, funding_rate=args.funding, symbol=args.symbol,
+    )
+    print(format_report(result['summary']))
+
+    if args.trades_out:
+        with open(args.trades_out, 'w', encoding='utf-8') as f:
+            for trade in result['trades']:
+                f.write(json.dumps(trade, ensure_ascii=False) + '\n')
+        print(f"✅ 已写入 {len(result['trades'])} 笔交易: {args.trades_out}")
+
+
+if __name__ == '__main__':
+    main()
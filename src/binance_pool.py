@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binance Pool Module - Shared Binance clients and single-flight TTL cache
+币安客户端池模块 - 进程内共享客户端与单飞TTL缓存
+
+创建 Client 会请求一次交易所（ping），按API密钥复用实例；
+SingleFlightCache 在TTL内直接返回缓存结果，过期后多个并发请求只触发一次上游刷新。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from binance.client import Client
+
+
+class BinanceClientPool:
+    """按 (api_key, api_secret) 复用 binance Client 实例"""
+
+    def __init__(self, factory: Callable[..., Client] = Client):
+        self.factory = factory
+        self._clients: Dict[Tuple[str, str], Client] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, api_secret: str) -> Client:
+        """获取（必要时创建）该密钥对应的客户端"""
+        key = (api_key, api_secret)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # 在锁内创建，避免并发请求重复建立连接
+                client = self.factory(api_key, api_secret)
+                self._clients[key] = client
+            return client
+
+    def invalidate(self):
+        """密钥变更后丢弃所有客户端"""
+        with self._lock:
+            for client in self._clients.values():
+                session = getattr(client, 'session', None)
+                if session is not None:
+                    session.close()
+            self._clients.clear()
+
+
+class SingleFlightCache:
+    """
+    TTL缓存：过期后第一个请求负责调用loader刷新，同时到达的请求等待同一次结果
+
+    loader抛出的异常会传递给本次等待的所有请求，但不会写入缓存
+    """
+
+    def __init__(self, loader: Callable[[], Any], ttl: float):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._inflight: Optional[Future] = None
+        self._generation = 0
+
+    def get(self) -> Any:
+        with self._lock:
+            if self._loaded_at is not None and time.time() - self._loaded_at < self.ttl:
+                return self._value
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = Future()
+                generation = self._generation
+
+        if not leader:
+            return flight.result()
+
+        try:
+            value = self.loader()
+        except Exception as e:
+            with self._lock:
+                if self._inflight is flight:
+                    self._inflight = None
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            # 刷新期间被invalidate的结果不写入缓存
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.time()
+            if self._inflight is flight:
+                self._inflight = None
+        flight.set_result(value)
+        return value
+
+    def invalidate(self):
+        """清空缓存，下一次get重新加载"""
+        with self._lock:
+            self._generation += 1
+            self._value = None
+            self._loaded_at = None
+            self._inflight = None
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoint Module - Persist runtime state for warm restarts
+检查点模块 - 保存运行时状态，重启后热启动
+
+各组件（K线缓存、AI决策缓存等）以 dump/load 函数注册，
+每轮交易结束和退出时写入同一个JSON文件（先写临时文件再原子替换，
+崩溃时不会留下半截文件）。启动时恢复各组件，K线只需补齐停机期间缺失的部分，
+不必冷启动重新拉取全部历史。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Any, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_FILE = 'bot_checkpoint.json'
+
+
+class Checkpoint:
+    """按组件名保存/恢复状态，单个组件恢复失败不影响其他组件"""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_FILE, max_age: float = 86400):
+        # max_age: 超过该时长（秒）的检查点视为过期，直接冷启动
+        self.path = path
+        self.max_age = max_age
+        self._components: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, dump: Callable[[], Any], load: Callable[[Any], None]):
+        """注册组件：dump() 返回可JSON序列化的状态，load(state) 恢复状态"""
+        self._components[name] = (dump, load)
+
+    def save(self) -> bool:
+        """写入检查点，返回是否成功"""
+        state = {'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'components': {}}
+        for name, (dump, _) in self._components.items():
+            try:
+                state['components'][name] = dump()
+            except Exception as e:
+                logger.warning(f"⚠️ 检查点组件保存失败 {name}: {e}")
+
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                return True
+            except Exception as e:
+                logger.warning(f"⚠️ 保存检查点失败: {e}")
+                return False
+
+    def restore(self) -> List[str]:
+        """读取检查点并恢复已注册的组件，返回恢复成功的组件名"""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取检查点失败，冷启动: {e}")
+            return []
+
+        if state.get('version') != CHECKPOINT_VERSION:
+            logger.warning("⚠️ 检查点版本不一致，冷启动")
+            return []
+        age = time.time() - state.get('saved_at', 0)
+        if age > self.max_age:
+            logger.warning(f"⚠️ 检查点已过期（{age / 3600:.1f}小时前），冷启动")
+            return []
+
+        restored = []
+        for name, (_, load) in self._components.items():
+            if name not in state['components']:
+                continue
+            try:
+                load(state['components'][name])
+                restored.append(name)
+            except Exception as e:
+                logger.warning(f"⚠️ 检查点组件恢复失败 {name}: {e}")
+        return restored
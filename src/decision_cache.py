@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decision Cache Module - Reuse AI decisions for unchanged market state
+决策缓存模块 - 市场状态未明显变化时复用AI决策
+
+把价格、RSI、MACD方向和持仓状态量化成指纹，TTL内指纹相同则直接返回
+上次的决策，省去一次3~10秒的AI调用。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import math
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+class DecisionCache:
+    """按量化后的市场状态缓存AI决策，统计命中率和节省的调用耗时"""
+
+    def __init__(self, ttl_seconds: float = 1800, price_bucket_pct: float = 0.3, rsi_bucket: float = 5.0):
+        # ttl_seconds <= 0 时关闭缓存
+        self.ttl_seconds = ttl_seconds
+        self.price_bucket_pct = price_bucket_pct
+        self.rsi_bucket = rsi_bucket
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def fingerprint(self, symbol: str, market_data: Dict[str, Any]) -> Tuple:
+        """市场状态指纹：价格按百分比分桶、RSI分桶、MACD符号、持仓方向和数量"""
+        price = market_data['price']
+        price_bucket = int(math.floor(math.log(price) / math.log1p(self.price_bucket_pct / 100))) if price > 0 else 0
+
+        rsi = market_data['rsi']
+        rsi_bucket = int(rsi // self.rsi_bucket) if not math.isnan(rsi) else None
+
+        macd = market_data['macd']
+        macd_sign = (macd > 0) - (macd < 0) if not math.isnan(macd) else 0
+
+        position = market_data.get('position')
+        position_state = (position['side'], position['amount']) if position else None
+
+        return (symbol, price_bucket, rsi_bucket, macd_sign, position_state)
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """查找未过期的缓存决策，同时记录命中/未命中"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry['time'] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry['latency']
+            return dict(entry['decision'])
+
+    def put(self, key: Tuple, decision: Dict[str, Any], latency: float):
+        """写入一次AI调用的决策及其耗时"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {'time': now, 'decision': dict(decision), 'latency': latency}
+            # 顺带清理过期条目
+            expired = [k for k, v in self._entries.items() if now - v['time'] > self.ttl_seconds]
+            for k in expired:
+                del self._entries[k]
+
+    def to_state(self) -> Dict[str, Any]:
+        """未过期的缓存条目（用于检查点，指纹元组转成列表）"""
+        now = time.time()
+        with self._lock:
+            return {
+                'entries': [
+                    [list(key[:4]) + [list(key[4]) if key[4] else None], entry]
+                    for key, entry in self._entries.items() if now - entry['time'] <= self.ttl_seconds
+                ]
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        """从检查点恢复缓存条目，过期条目在下次写入时清理"""
+        with self._lock:
+            for key, entry in state['entries']:
+                position_state = tuple(key[4]) if key[4] else None
+                self._entries[tuple(key[:4]) + (position_state,)] = entry
+
+    def report(self) -> str:
+        """命中统计文本"""
+        with self._lock:
+            total = self.hits + self.misses
+            hit_rate = self.hits / total * 100 if total else 0.0
+            return (f"🗂️ 决策缓存: 命中 {self.hits} / 未命中 {self.misses} "
+                    f"(命中率 {hit_rate:.1f}%)，累计节省AI调用 {self.saved_seconds:.1f}秒")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decision Journal Module - Append-only JSONL decision log
+决策日志模块 - 只追加写入的JSONL决策记录
+
+每条决策一行JSON，追加写入后fsync，写入开销O(1)；内存中保留最近N条供提示词使用，
+读取方（网页）用 tail_jsonl 只读文件末尾。文件超过max_lines行时后台压缩：
+较早的记录移入归档文件（path.1，按大小轮转到path.2、path.3…），当前文件只保留最近keep_lines行。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_journals: Dict[str, 'DecisionJournal'] = {}
+_journals_lock = threading.Lock()
+
+
+def tail_jsonl(path: str, n: int, block_size: int = 8192) -> List[Dict[str, Any]]:
+    """从文件末尾读取最近n条记录（从旧→新），跳过写了一半的坏行"""
+    if n <= 0 or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= n:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+
+    entries = []
+    for line in data.splitlines()[-(n + 1):]:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            continue
+    return entries[-n:]
+
+
+def open_journal(path: str, **kwargs) -> 'DecisionJournal':
+    """按文件路径返回共享的日志实例，避免多个实例同时压缩同一文件"""
+    key = os.path.abspath(path)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = DecisionJournal(path, **kwargs)
+            _journals[key] = journal
+        elif kwargs.get('ring_size', 0) > journal.ring_size:
+            journal.resize(kwargs['ring_size'])
+        return journal
+
+
+class DecisionJournal:
+    """只追加的JSONL决策日志，带内存环形缓冲和后台压缩"""
+
+    def __init__(self, path: str, ring_size: int = 100, max_lines: int = 2000, keep_lines: int = 500,
+                 archive_max_bytes: int = 5 * 1024 * 1024, backups: int = 3, fsync: bool = True,
+                 legacy_file: Optional[str] = None):
+        self.path = path
+        self.ring_size = ring_size
+        self.max_lines = max_lines
+        self.keep_lines = max(keep_lines, ring_size)
+        self.archive_max_bytes = archive_max_bytes
+        self.backups = backups
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        # 压缩之间互斥；压缩期间不占用_lock，append不受影响
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+
+        if legacy_file and os.path.exists(legacy_file) and not os.path.exists(path):
+            self._migrate(legacy_file)
+
+        self._line_count = self._count_lines()
+        self._ring = deque(tail_jsonl(path, ring_size), maxlen=ring_size)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _count_lines(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _migrate(self, legacy_file: str):
+        """把旧版整体读写的JSON决策文件转换为JSONL（按时间排序），原文件重命名为.bak"""
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('decisions', [])
+            entries.sort(key=lambda e: e.get('time') or e.get('decision_time') or '')
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.replace(legacy_file, legacy_file + '.bak')
+            logger.info(f"✅ 已将 {legacy_file} 中的 {len(entries)} 条决策迁移到 {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️ 迁移旧决策文件失败: {e}")
+
+    def resize(self, ring_size: int):
+        """扩大内存缓冲"""
+        with self._lock:
+            self.ring_size = ring_size
+            self.keep_lines = max(self.keep_lines, ring_size)
+            self._ring = deque(tail_jsonl(self.path, ring_size), maxlen=ring_size)
+
+    def append(self, entry: Dict[str, Any]):
+        """追加一条记录：写一行并fsync，超过max_lines时触发后台压缩"""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._ring.append(entry)
+            self._line_count += 1
+            need_compact = self._line_count > self.max_lines and not self._compacting
+            if need_compact:
+                self._compacting = True
+        if need_compact:
+            threading.Thread(target=self._compact_in_background, name='journal-compact', daemon=True).start()
+
+    def recent(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """内存中最近n条记录（从旧→新）"""
+        with self._lock:
+            entries = list(self._ring)
+        return entries if n is None else entries[-n:]
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.warning(f"⚠️ 决策日志压缩失败: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """
+        较早的记录移入归档，当前文件只保留最近keep_lines行
+
+        只在记录文件长度和最后换文件时持有_lock：读取、写归档和临时文件期间append照常写入，
+        换文件前把这段时间追加的内容补到临时文件末尾
+        """
+        with self._compact_lock:
+            with self._lock:
+                snapshot_size = os.path.getsize(self.path)
+            with open(self.path, 'rb') as f:
+                lines = f.read(snapshot_size).splitlines(keepends=True)
+            if len(lines) <= self.keep_lines:
+                return
+            archived, kept = lines[:-self.keep_lines], lines[-self.keep_lines:]
+
+            archive_path = f"{self.path}.1"
+            with open(archive_path, 'ab') as f:
+                f.writelines(archived)
+                f.flush()
+                os.fsync(f.fileno())
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self._lock:
+                with open(self.path, 'rb') as f:
+                    f.seek(snapshot_size)
+                    appended = f.read()
+                with open(tmp_path, 'ab') as f:
+                    f.write(appended)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._file.close()
+                os.replace(tmp_path, self.path)
+                self._file = open(self.path, 'a', encoding='utf-8')
+                self._line_count = len(kept) + appended.count(b'\n')
+
+            if os.path.getsize(archive_path) > self.archive_max_bytes:
+                self._rotate_archives()
+
+    def _rotate_archives(self):
+        """path.1 → path.2 → … → path.{backups}，最旧的删除"""
+        oldest = f"{self.path}.{self.backups}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-AI Trading Bot - BNB单币种自动交易系统
+AI Trading Bot - 币安合约AI自动交易系统（默认BNB，可同时交易多个币种）
 基于币安原生库 python-binance
 
 Author: AI Trading Bot
@@ -9,100 +9,135 @@ License: MIT
 """
 
 import os
+import sys
 import time
-import schedule
-from openai import OpenAI
 from datetime import datetime, timedelta
 import json
 import re
-from dotenv import load_dotenv
 import logging
-from logging.handlers import RotatingFileHandler
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
-import pandas as pd
-import math
-
-from trading_statistics import TradingStatistics
-
-# 加载环境变量（从项目根目录）
-import sys
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-dotenv_path = os.path.join(project_root, '.env')
-load_dotenv(dotenv_path)
+import threading
+import atexit
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from app_context import AppContext
+from decision_journal import open_journal
+from exchange_info import floor_to_step
+from metrics import CYCLE_METRICS_FILE, METRICS_SNAPSHOT_FILE
+from llm_stream import stream_decision
+from prompt_builder import SYSTEM_PROMPT, build_prompt, estimate_tokens
+from scheduler import CandleScheduler
 
 # 记录程序启动时间和调用次数
 PROGRAM_START_TIME = datetime.now()
 INVOCATION_COUNT = 0
 RUNTIME_FILE = 'current_runtime.json'
 
-# 配置日志
-log_handler = RotatingFileHandler(
-    'bnb_trader.log',
-    maxBytes=10*1024*1024,
-    backupCount=3,
-    encoding='utf-8'
-)
-log_handler.setFormatter(logging.Formatter('%(message)s'))
-
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('%(message)s'))
-
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[log_handler, console_handler]
-)
 
 def print(*args, **kwargs):
     message = ' '.join(str(arg) for arg in args)
     logging.info(message)
 
-# 初始化DeepSeek客户端
-deepseek_client = OpenAI(
-    api_key=os.getenv('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com"
-)
 
-# 重试连接Binance
-print("🔗 正在连接Binance API...")
-binance_client = None
-max_retries = 5
-retry_delay = 3
-
-for attempt in range(max_retries):
-    try:
-        binance_client = Client(
-            api_key=os.getenv('BINANCE_API_KEY'),
-            api_secret=os.getenv('BINANCE_SECRET'),
-            requests_params={'timeout': 30}
-        )
-        print(f"✅ Binance客户端初始化成功")
-        break
-    except Exception as e:
-        print(f"⚠️ Binance连接失败 (尝试 {attempt + 1}/{max_retries}): {str(e)[:100]}")
-        if attempt < max_retries - 1:
-            print(f"   等待 {retry_delay} 秒后重试...")
-            time.sleep(retry_delay)
-        else:
-            print("❌ 无法连接到Binance API，请检查网络连接")
-            exit(1)
-
-if binance_client is None:
-    print("❌ 初始化失败，程序退出")
-    exit(1)
-
-# 交易配置
+# 交易配置（各交易对的默认值）
 TRADE_CONFIG = {
-    'symbol': 'BNBUSDT',  # BNB/USDT合约
+    'symbols': ['BNBUSDT'],  # 交易对列表，可用环境变量 TRADE_SYMBOLS=BNBUSDT,ETHUSDT 覆盖
     'leverage': 3,  # 3倍杠杆
-    'min_order_qty': 0.01,  # 最小交易数量
+    'min_order_qty': 0.01,  # 最小交易数量（交易所规则不可用时的后备值）
+    'qty_precision': 2,  # 下单数量小数位数（交易所规则不可用时的后备值）
+    'margin_ratio': 0.3,  # 每次开仓使用可用余额的比例
+    'max_workers': 8,  # 同时处理的交易对数量上限
+    'use_market_stream': True,  # 使用WebSocket推送维护K线缓存，替代每轮REST拉取
+    'use_account_stream': True,  # 使用用户数据流维护账户余额/持仓镜像，替代每轮REST查询
+    'llm_stream': True,  # 流式接收AI回复，action/confidence解析完整即提前下单
+    'decision_cache_ttl': 1800,  # 市场状态指纹相同时复用AI决策的有效期（秒），0为关闭
+    'decision_cache_price_pct': 0.3,  # 指纹中价格分桶宽度（%）
+    'decision_cache_rsi_step': 5,  # 指纹中RSI分桶宽度
+    'prompt_format': 'compact',  # 提示词格式：compact（紧凑表格，省token）/ verbose（逐行详细描述）
+    'prompt_reason_chars': 40,  # compact格式中历史决策理由保留的字符数
+    'cycle_interval_minutes': 15,  # 交易周期，与15分钟K线对齐
+    'cycle_offset_seconds': 5,  # K线收盘后延迟多少秒执行，等待收盘K线推送/落库
+    'taker_fee_rate': 0.0004,  # 市价单手续费率，用于交易账本估算手续费
+    'checkpoint_file': 'bot_checkpoint.json',  # 运行状态检查点（K线缓存、指标状态、决策缓存），重启时热启动
+    'stream_ready_timeout': 5,  # 启动时等待行情推送连接并补齐K线的最长秒数
+    'exchange_info_ttl': 21600,  # 交易所下单规则（数量步长、最小名义价值等）缓存刷新间隔（秒）
+}
+
+# 各交易对的独立配置，未填写的字段使用 TRADE_CONFIG 中的默认值
+# 数量精度和最小数量以交易所规则为准，这里的值只在获取交易所信息失败时使用
+SYMBOL_CONFIGS = {
+    'BNBUSDT': {'coin': 'BNB', 'min_order_qty': 0.01, 'qty_precision': 2},
+    'ETHUSDT': {'coin': 'ETH', 'min_order_qty': 0.001, 'qty_precision': 3},
+    'BTCUSDT': {'coin': 'BTC', 'min_order_qty': 0.001, 'qty_precision': 3},
+    'SOLUSDT': {'coin': 'SOL', 'min_order_qty': 0.1, 'qty_precision': 1},
+    'DOGEUSDT': {'coin': 'DOGE', 'min_order_qty': 10, 'qty_precision': 0},
+    'XRPUSDT': {'coin': 'XRP', 'min_order_qty': 1, 'qty_precision': 0},
 }
 
-# 初始化交易统计
-trading_stats = TradingStatistics('trading_stats.json')
+# BTC大盘参考（所有交易对共享）
+REFERENCE_SYMBOL = 'BTCUSDT'
 
-# AI决策记录文件
-AI_DECISIONS_FILE = 'ai_decisions.json'
+
+def get_symbol_config(symbol):
+    """合并默认配置、交易对独立配置和交易所下单规则（数量步长、最小数量、最小名义价值）"""
+    config = {
+        'symbol': symbol,
+        'coin': symbol[:-4] if symbol.endswith('USDT') else symbol,
+        'leverage': TRADE_CONFIG['leverage'],
+        'min_order_qty': TRADE_CONFIG['min_order_qty'],
+        'qty_precision': TRADE_CONFIG['qty_precision'],
+        'margin_ratio': TRADE_CONFIG['margin_ratio'],
+        'min_notional': 0,
+        'max_order_qty': None,
+    }
+    config.update(SYMBOL_CONFIGS.get(symbol, {}))
+    config['step_size'] = 10 ** -config['qty_precision']
+
+    filters = app.exchange_info.filters(symbol)
+    if filters and filters['step_size']:
+        config.update({
+            'step_size': filters['step_size'],
+            'qty_precision': filters['qty_precision'],
+            'min_order_qty': filters['min_qty'],
+            'max_order_qty': filters['max_qty'] or None,
+            'min_notional': filters['min_notional'],
+        })
+    return config
+
+# 运行上下文：客户端、存储、交易统计、K线缓存、决策缓存、检查点都在首次使用时创建，
+# 导入本模块不会读取.env、联网或写文件
+app = AppContext(TRADE_CONFIG)
+
+# 行情/账户数据并发请求线程池（只执行REST请求，不会反向等待其他任务）
+_fetch_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='fetch')
+
+# 交易对流水线线程池：数据 → 指标 → AI → 下单
+_pipeline_executor = ThreadPoolExecutor(max_workers=TRADE_CONFIG['max_workers'], thread_name_prefix='pipeline')
+
+# 流式决策提前下单使用的线程池
+_order_executor = ThreadPoolExecutor(max_workers=TRADE_CONFIG['max_workers'], thread_name_prefix='order')
+
+# 多线程共享状态的锁
+_invocation_lock = threading.Lock()
+
+
+
+def apply_env_overrides():
+    """用环境变量覆盖交易配置（TRADE_SYMBOLS=BNBUSDT,ETHUSDT）"""
+    if os.getenv('TRADE_SYMBOLS'):
+        TRADE_CONFIG['symbols'] = [
+            symbol.strip().upper() for symbol in os.getenv('TRADE_SYMBOLS').split(',') if symbol.strip()
+        ]
+
+
+def stream_subscriptions():
+    """需要订阅的K线流：BTC参考15分钟 + 各交易对15分钟/1小时"""
+    subscriptions = [(REFERENCE_SYMBOL, '15m')]
+    for symbol in TRADE_CONFIG['symbols']:
+        for interval in ('15m', '1h'):
+            if (symbol, interval) not in subscriptions:
+                subscriptions.append((symbol, interval))
+    return subscriptions
 
 
 def save_current_runtime():
@@ -120,490 +155,528 @@ def save_current_runtime():
 
 
 def save_ai_decision(coin, action, reason, confidence):
-    """保存AI决策到文件"""
+    """保存AI决策到本地存储（启用Supabase时同时后台批量写入）"""
     try:
-        if os.path.exists(AI_DECISIONS_FILE):
-            with open(AI_DECISIONS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {'decisions': []}
-        
-        decision = {
-            'time': datetime.now().isoformat(),
-            'coin': coin,
-            'action': action,
-            'reason': reason,
-            'confidence': confidence
-        }
-        data['decisions'].append(decision)
-        
-        # 只保留最近100条
-        data['decisions'] = data['decisions'][-100:]
-        
-        with open(AI_DECISIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        app.trading_stats.save_decision(action=action, coin=coin, confidence=confidence, reason=reason)
     except Exception as e:
         print(f"⚠️ 保存AI决策失败: {e}")
 
 
-def calculate_technical_indicators(df):
-    """计算技术指标"""
-    try:
-        # 移动平均线
-        df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-        df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-
-        # MACD
-        df['ema_12'] = df['close'].ewm(span=12).mean()
-        df['ema_26'] = df['close'].ewm(span=26).mean()
-        df['macd'] = df['ema_12'] - df['ema_26']
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-
-        # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-
-        # 布林带
-        df['bb_middle'] = df['close'].rolling(20).mean()
-        bb_std = df['close'].rolling(20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
-
-        # ATR
-        df['high_low'] = df['high'] - df['low']
-        df['high_close'] = abs(df['high'] - df['close'].shift())
-        df['low_close'] = abs(df['low'] - df['close'].shift())
-        df['true_range'] = df[['high_low', 'high_close', 'low_close']].max(axis=1)
-        df['atr_14'] = df['true_range'].rolling(14).mean()
-
-        df = df.bfill().ffill()
-        return df
-    except Exception as e:
-        print(f"技术指标计算失败: {e}")
-        return df
+def compute_indicator_frame(klines):
+    """
+    计算K线对应的技术指标序列 {指标名: 从旧→新的列表}
+
+    只用传入的这些K线计算（NumPy内核，预分配缓冲区），K线来自WebSocket缓存还是REST
+    结果都相同：提示词和决策缓存指纹不会因推送是否就绪而变化。
+    """
+    from indicators import INDICATOR_FIELDS, parse_klines, compute_indicators, get_buffers
+
+    with app.metrics.span('indicators'):
+        columns = parse_klines(klines)
+        outputs = compute_indicators(
+            columns['high'], columns['low'], columns['close'],
+            get_buffers(len(klines))
+        )
+        return {field: outputs[field].tolist() for field in INDICATOR_FIELDS}
+
+
+def build_btc_market_reference(klines):
+    """根据BTC 15分钟K线计算大盘参考数据"""
+    indicators = compute_indicator_frame(klines)
+
+    # 计算趋势强度
+    sma20 = indicators['sma_20'][-1]
+    sma50 = indicators['sma_50'][-1]
+    price = float(klines[-1][4])
+
+    if price > sma20 and sma20 > sma50:
+        trend = "多头"
+        strength = ((price - sma50) / sma50 * 100)
+    elif price < sma20 and sma20 < sma50:
+        trend = "空头"
+        strength = ((sma50 - price) / sma50 * 100)
+    else:
+        trend = "震荡"
+        strength = 0
+
+    return {
+        'price': price,
+        'rsi': indicators['rsi'][-1],
+        'macd': indicators['macd'][-1],
+        'trend': trend,
+        'strength': abs(strength)
+    }
 
 
 def get_btc_market_reference():
     """获取BTC大盘参考数据（15分钟周期）"""
     try:
         # 获取BTC 15分钟K线
-        klines = binance_client.futures_klines(
-            symbol='BTCUSDT',
-            interval='15m',
-            limit=50
-        )
-        
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ])
-        
-        df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = calculate_technical_indicators(df)
-
-        current = df.iloc[-1]
-        
-        # 计算趋势强度
-        sma20 = current['sma_20']
-        sma50 = current['sma_50']
-        price = current['close']
-        
-        if price > sma20 and sma20 > sma50:
-            trend = "多头"
-            strength = ((price - sma50) / sma50 * 100)
-        elif price < sma20 and sma20 < sma50:
-            trend = "空头"
-            strength = ((sma50 - price) / sma50 * 100)
-        else:
-            trend = "震荡"
-            strength = 0
-
-        return {
-            'price': current['close'],
-            'rsi': current['rsi'],
-            'macd': current['macd'],
-            'trend': trend,
-            'strength': abs(strength)
-        }
+        klines = fetch_klines(REFERENCE_SYMBOL, '15m', 50)
+        return build_btc_market_reference(klines)
     except Exception as e:
         print(f"⚠️ 获取BTC数据失败: {e}")
         return None
 
 
-def get_bnb_1h_data():
-    """获取BNB 1小时数据"""
+def build_1h_data(symbol, klines):
+    """根据1小时K线计算技术指标"""
+    indicators = compute_indicator_frame(klines)
+
+    return {
+        'rsi': indicators['rsi'][-1],
+        'macd': indicators['macd'][-1],
+        'macd_signal': indicators['macd_signal'][-1],
+        'sma_20': indicators['sma_20'][-1],
+        'sma_50': indicators['sma_50'][-1],
+        'rsi_series': indicators['rsi'][-10:],
+        'macd_series': indicators['macd'][-10:],
+    }
+
+
+def get_1h_data(symbol='BNBUSDT'):
+    """获取1小时数据"""
     try:
         # 获取30根1小时K线（确保有足够数据计算指标）
-        klines = binance_client.futures_klines(
-            symbol='BNBUSDT',
-            interval='1h',
-            limit=30
-        )
-        
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ])
-        
-        df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = calculate_technical_indicators(df)
-        current_data = df.iloc[-1]
-        
-        return {
-            'rsi': current_data['rsi'],
-            'macd': current_data['macd'],
-            'macd_signal': current_data['macd_signal'],
-            'sma_20': current_data['sma_20'],
-            'sma_50': current_data['sma_50'],
-            'rsi_series': df['rsi'].tail(10).tolist(),
-            'macd_series': df['macd'].tail(10).tolist(),
-        }
+        klines = fetch_klines(symbol, '1h', 30)
+        return build_1h_data(symbol, klines)
     except Exception as e:
-        print(f"❌ 获取BNB 1小时数据失败: {e}")
+        print(f"❌ 获取{symbol} 1小时数据失败: {e}")
         return None
 
 
-def get_bnb_market_data():
-    """获取BNB完整市场数据（15分钟）"""
+def build_market_data(symbol, klines, ticker_24h, funding_rate_data, open_interest_data, position, current_time):
+    """根据原始REST响应构建完整市场数据（15分钟）"""
+    indicators = compute_indicator_frame(klines)
+
+    # 当前K线（未完成）
+    current_kline = klines[-1]
+    current_open = float(current_kline[1])
+    current_high = float(current_kline[2])
+    current_low = float(current_kline[3])
+    current_close = float(current_kline[4])
+    current_volume = float(current_kline[5])
+    current_change = ((current_close - current_open) / current_open * 100) if current_open > 0 else 0
+
+    kline_start_time = datetime.fromtimestamp(int(current_kline[0])/1000)
+    kline_end_time = kline_start_time + timedelta(minutes=15)
+    elapsed_min = (current_time - kline_start_time).total_seconds() / 60
+
+    # 计算24小时涨跌
+    change_24h = float(ticker_24h['priceChangePercent'])
+
+    # 资金费率
+    funding_rate = float(funding_rate_data[0]['fundingRate']) if funding_rate_data else 0
+
+    # 持仓量
+    open_interest = float(open_interest_data['openInterest'])
+
+    # 计算15分钟涨跌（从16根前到现在）
+    if len(klines) >= 17:
+        price_16_ago = float(klines[-17][4])
+        change_15m = ((current_close - price_16_ago) / price_16_ago * 100)
+    else:
+        change_15m = 0
+
+    return {
+        'symbol': symbol,
+        'price': current_close,
+        'change_24h': change_24h,
+        'change_15m': change_15m,
+        'funding_rate': funding_rate,
+        'open_interest': open_interest,
+        'position': position,
+        # 当前K线实时数据
+        'current_kline': {
+            'open': current_open,
+            'high': current_high,
+            'low': current_low,
+            'close': current_close,
+            'volume': current_volume,
+            'change': current_change,
+            'elapsed_min': elapsed_min,
+            'start_time': kline_start_time.strftime('%H:%M'),
+            'end_time': kline_end_time.strftime('%H:%M')
+        },
+        # 历史16根K线
+        'historical_klines': klines[-17:-1],
+        # 技术指标
+        'rsi': indicators['rsi'][-1],
+        'macd': indicators['macd'][-1],
+        'macd_signal': indicators['macd_signal'][-1],
+        'atr': indicators['atr_14'][-1],
+        'bb_position': indicators['bb_position'][-1],
+        'sma_20': indicators['sma_20'][-1],
+        'sma_50': indicators['sma_50'][-1],
+        # 时间序列（最近10个值，从旧→新）
+        'rsi_series': indicators['rsi'][-10:],
+        'macd_series': indicators['macd'][-10:],
+        'atr_series': indicators['atr_14'][-10:],
+    }
+
+
+def market_data_requests(symbol):
+    """单个交易对每轮需要的行情请求（最后一根15分钟K线是当前未完成的）"""
+    return {
+        'klines_15m': (app.binance_client.futures_klines, {'symbol': symbol, 'interval': '15m', 'limit': 17}),
+        'ticker_24h': (app.binance_client.futures_ticker, {'symbol': symbol}),
+        'funding_rate': (app.binance_client.futures_funding_rate, {'symbol': symbol, 'limit': 1}),
+        'open_interest': (app.binance_client.futures_open_interest, {'symbol': symbol}),
+        'klines_1h': (app.binance_client.futures_klines, {'symbol': symbol, 'interval': '1h', 'limit': 30}),
+    }
+
+
+def get_market_data(symbol='BNBUSDT'):
+    """获取完整市场数据（15分钟）"""
     try:
         current_time = datetime.now()
-        
-        # 获取17根15分钟K线（最后一根是当前未完成的）
-        klines = binance_client.futures_klines(
-            symbol='BNBUSDT',
-            interval='15m',
-            limit=17
-        )
-        
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ])
-        
-        df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = calculate_technical_indicators(df)
-        
-        # 当前K线（未完成）
-        current_kline = klines[-1]
-        current_open = float(current_kline[1])
-        current_high = float(current_kline[2])
-        current_low = float(current_kline[3])
-        current_close = float(current_kline[4])
-        current_volume = float(current_kline[5])
-        current_change = ((current_close - current_open) / current_open * 100) if current_open > 0 else 0
-        
-        kline_start_time = datetime.fromtimestamp(int(current_kline[0])/1000)
-        kline_end_time = kline_start_time + timedelta(minutes=15)
-        elapsed_min = (current_time - kline_start_time).total_seconds() / 60
-        
-        # 计算24小时涨跌
-        ticker_24h = binance_client.futures_ticker(symbol='BNBUSDT')
-        change_24h = float(ticker_24h['priceChangePercent'])
-        
-        # 资金费率
-        funding_rate_data = binance_client.futures_funding_rate(symbol='BNBUSDT', limit=1)
-        funding_rate = float(funding_rate_data[0]['fundingRate']) if funding_rate_data else 0
-        
-        # 持仓量
-        open_interest_data = binance_client.futures_open_interest(symbol='BNBUSDT')
-        open_interest = float(open_interest_data['openInterest'])
-        
-        # 获取当前持仓
-        position = get_current_position()
-        
-        current_data = df.iloc[-1]
-        
-        # 计算15分钟涨跌（从16根前到现在）
-        if len(df) >= 17:
-            price_16_ago = df.iloc[-17]['close']
-            change_15m = ((current_close - price_16_ago) / price_16_ago * 100)
+
+        requests = market_data_requests(symbol)
+        del requests['klines_1h']
+        requests['positions'] = (app.binance_client.futures_position_information, {'symbol': symbol})
+        results, errors = fetch_concurrently(requests)
+        for name in ('klines_15m', 'ticker_24h', 'funding_rate', 'open_interest'):
+            if name in errors:
+                raise errors[name]
+
+        if 'positions' in errors:
+            print(f"⚠️ 获取持仓失败: {errors['positions']}")
+            position = None
         else:
-            change_15m = 0
-        
-        return {
-            'price': current_close,
-            'change_24h': change_24h,
-            'change_15m': change_15m,
-            'funding_rate': funding_rate,
-            'open_interest': open_interest,
-            'position': position,
-            # 当前K线实时数据
-            'current_kline': {
-                'open': current_open,
-                'high': current_high,
-                'low': current_low,
-                'close': current_close,
-                'volume': current_volume,
-                'change': current_change,
-                'elapsed_min': elapsed_min,
-                'start_time': kline_start_time.strftime('%H:%M'),
-                'end_time': kline_end_time.strftime('%H:%M')
-            },
-            # 历史16根K线
-            'historical_klines': klines[-17:-1],
-            # 技术指标
-            'rsi': current_data['rsi'],
-            'macd': current_data['macd'],
-            'macd_signal': current_data['macd_signal'],
-            'atr': current_data['atr_14'],
-            'bb_position': current_data['bb_position'],
-            'sma_20': current_data['sma_20'],
-            'sma_50': current_data['sma_50'],
-            # 时间序列（最近10个值，从旧→新）
-            'rsi_series': df['rsi'].tail(10).tolist(),
-            'macd_series': df['macd'].tail(10).tolist(),
-            'atr_series': df['atr_14'].tail(10).tolist(),
-        }
+            position = parse_position(results['positions'], symbol)
+
+        return build_market_data(
+            symbol,
+            results['klines_15m'],
+            results['ticker_24h'],
+            results['funding_rate'],
+            results['open_interest'],
+            position,
+            current_time
+        )
     except Exception as e:
-        print(f"❌ 获取BNB数据失败: {e}")
+        print(f"❌ 获取{symbol}数据失败: {e}")
         import traceback
         traceback.print_exc()
         return None
 
 
-def get_current_position():
-    """获取当前BNB持仓"""
+def parse_position(positions, symbol):
+    """从futures_position_information响应中解析指定交易对的当前持仓"""
+    for pos in positions:
+        if pos.get('symbol', symbol) != symbol:
+            continue
+        position_amt = float(pos['positionAmt'])
+        if position_amt != 0:
+            return {
+                'side': 'LONG' if position_amt > 0 else 'SHORT',
+                'amount': abs(position_amt),
+                'entry_price': float(pos['entryPrice']),
+                'unrealized_pnl': float(pos['unRealizedProfit']),
+                # positionRisk v3 不再返回杠杆，取账户信息中记录的当前杠杆
+                'leverage': int(pos['leverage']) if 'leverage' in pos else app.exchange_info.applied_leverage(symbol)
+            }
+    return None
+
+
+def get_current_position(symbol='BNBUSDT'):
+    """获取当前持仓：优先读取账户推送镜像，未连接时走REST"""
     try:
-        positions = binance_client.futures_position_information(symbol='BNBUSDT')
-
-        for pos in positions:
-            position_amt = float(pos['positionAmt'])
-            if position_amt != 0:
-                    return {
-                    'side': 'LONG' if position_amt > 0 else 'SHORT',
-                    'amount': abs(position_amt),
-                    'entry_price': float(pos['entryPrice']),
-                    'unrealized_pnl': float(pos['unRealizedProfit']),
-                    'leverage': int(pos['leverage'])
-                }
-        return None
+        positions = app.account_mirror.get_positions(symbol)
+        if positions is None:
+            positions = app.binance_client.futures_position_information(symbol=symbol)
+        return parse_position(positions, symbol)
     except Exception as e:
         print(f"⚠️ 获取持仓失败: {e}")
         return None
 
 
+def parse_account_balance(account):
+    """从futures_account响应中解析USDT余额"""
+    for asset in account['assets']:
+        if asset['asset'] == 'USDT':
+            return {
+                'total': float(asset['walletBalance']),
+                'available': float(asset['availableBalance']),
+                'unrealized_pnl': float(asset['unrealizedProfit'])
+            }
+    return None
+
+
 def get_account_balance():
-    """获取账户余额"""
+    """获取账户余额：优先读取账户推送镜像，未连接时走REST"""
     try:
-        account = binance_client.futures_account()
-        for asset in account['assets']:
-            if asset['asset'] == 'USDT':
-                return {
-                    'total': float(asset['walletBalance']),
-                    'available': float(asset['availableBalance']),
-                    'unrealized_pnl': float(asset['unrealizedProfit'])
-                }
-        return None
+        account = app.account_mirror.get_account()
+        if account is None:
+            account = app.binance_client.futures_account()
+        return parse_account_balance(account)
     except Exception as e:
         print(f"⚠️ 获取余额失败: {e}")
         return None
 
 
-def analyze_portfolio_with_ai(market_data, bnb_1h_data, btc_data):
-    """使用AI分析市场并做出交易决策"""
-    global INVOCATION_COUNT
-    INVOCATION_COUNT += 1
-    
-    # 保存运行时状态
-    save_current_runtime()
-    
+def fetch_klines(symbol, interval, limit):
+    """获取K线：优先读取WebSocket缓存，未就绪时走REST"""
+    klines = app.candle_store.get_klines(symbol, interval, limit)
+    if klines is None:
+        klines = app.binance_client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+    return klines
+
+
+def lookup_stream_cache(method, kwargs):
+    """行情缓存或账户镜像能提供的REST响应直接返回，否则返回None"""
+    result = app.candle_store.lookup_rest(method, kwargs)
+    if result is None:
+        result = app.account_mirror.lookup_rest(method, kwargs)
+    return result
+
+
+def submit_requests(requests):
+    """
+    发出一组REST请求但不等待（WebSocket缓存/账户镜像能提供的请求直接取缓存）
+
+    requests: {名称: (函数, 关键字参数)}
+    返回 (cached, futures)：缓存命中的结果和进行中请求的Future
+    """
+    cached = {}
+    futures = {}
+    for name, (func, kwargs) in requests.items():
+        result = lookup_stream_cache(func.__name__, kwargs)
+        if result is not None:
+            cached[name] = result
+        else:
+            futures[name] = _fetch_executor.submit(func, **kwargs)
+    return cached, futures
+
+
+def collect_requests(cached, futures):
+    """等待submit_requests发出的请求，返回 (results, errors)"""
+    results = dict(cached)
+    errors = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+
+def fetch_concurrently(requests):
+    """
+    并发执行一组REST请求
+
+    requests: {名称: (函数, 关键字参数)}
+    返回 (results, errors)，分别为成功结果和异常的 {名称: 值} 字典
+    """
+    return collect_requests(*submit_requests(requests))
+
+
+class SharedSnapshot:
+    """
+    每轮所有交易对共享的数据：BTC大盘参考、账户余额和全部持仓，各只请求一次
+
+    请求在创建时立即发出，与各交易对的行情请求同时进行；首次读取时才等待结果。
+    账户推送已连接时余额和持仓直接取自账户镜像，不发出REST请求
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self._pending = submit_requests({
+            'btc_klines': (app.binance_client.futures_klines, {'symbol': REFERENCE_SYMBOL, 'interval': '15m', 'limit': 50}),
+            'account': (app.binance_client.futures_account, {}),
+            'positions': (app.binance_client.futures_position_information, {}),
+        })
+        self._lock = threading.Lock()
+        self._data = None
+
+    def get(self):
+        """返回 {'btc_data', 'balance', 'positions', 'fetch_seconds'}"""
+        with self._lock:
+            if self._data is None:
+                self._data = self._build()
+            return self._data
+
+    def _build(self):
+        results, errors = collect_requests(*self._pending)
+        for name, e in errors.items():
+            print(f"⚠️ 请求 {name} 失败: {str(e)[:100]}")
+
+        btc_data = None
+        try:
+            btc_data = build_btc_market_reference(results['btc_klines'])
+        except Exception as e:
+            print(f"⚠️ 获取BTC数据失败: {e}")
+
+        balance = None
+        try:
+            balance = parse_account_balance(results['account'])
+            # 账户信息中带有各交易对当前杠杆，与配置一致时本轮不再调整
+            app.exchange_info.observe_leverage(results['account'].get('positions', []))
+        except Exception as e:
+            print(f"⚠️ 获取余额失败: {e}")
+
+        positions = {}
+        if 'positions' in results:
+            for symbol in TRADE_CONFIG['symbols']:
+                positions[symbol] = parse_position(results['positions'], symbol)
+
+        return {
+            'btc_data': btc_data,
+            'balance': balance,
+            'positions': positions,
+            'positions_ok': 'positions' in results,
+            'fetch_seconds': time.time() - self.start,
+        }
+
+
+def gather_market_snapshot(symbol, shared):
+    """
+    数据采集阶段：交易对行情请求与共享数据请求同时在途，返回统一快照
+
+    总耗时约等于最慢的单个请求，而不是多次往返之和
+    """
+    start = time.time()
     current_time = datetime.now()
-    runtime_minutes = (current_time - PROGRAM_START_TIME).total_seconds() / 60
-    
-    # 构建当前K线文本
-    ck = market_data['current_kline']
-    if ck['change'] > 0:
-        kline_body = "🟢 阳线"
-    elif ck['change'] < 0:
-        kline_body = "🔴 阴线"
-    else:
-        kline_body = "➖ 平线"
-    
-    volatility = ((ck['high'] - ck['low']) / ck['open'] * 100) if ck['open'] > 0 else 0
-    
-    current_kline_text = f"""
-【当前K线实时状态】（15分钟周期进行中）
-- 时间窗口: {ck['start_time']} - {ck['end_time']} (已运行 {ck['elapsed_min']:.0f}/15分钟)
-- 开盘价: ${ck['open']:.2f}
-- 当前价: ${ck['close']:.2f}
-- 本K最高: ${ck['high']:.2f}
-- 本K最低: ${ck['low']:.2f}
-- 成交量: {ck['volume']:.2f}
-- K线状态: {kline_body} ({ck['change']:+.2f}%)
-- 波动幅度: {volatility:.2f}%"""
-    
-    # 构建历史K线文本
-    kline_text = "\n【历史16根K线】（按时间顺序：从旧→新，共4小时历史数据）："
-    for i, kline in enumerate(market_data['historical_klines'], 1):
-        open_p = float(kline[1])
-        high_p = float(kline[2])
-        low_p = float(kline[3])
-        close_p = float(kline[4])
-        change = ((close_p - open_p) / open_p * 100) if open_p > 0 else 0
-        body = "🟢" if close_p > open_p else "🔴" if close_p < open_p else "➖"
-        kline_text += f"\n  K{i}: {body} O${open_p:.2f} H${high_p:.2f} L${low_p:.2f} C${close_p:.2f} ({change:+.2f}%)"
-    
-    # 构建技术指标文本（15分钟）
-    rsi_series_text = ", ".join([f"{x:.1f}" for x in market_data['rsi_series'][-5:]])
-    macd_series_text = ", ".join([f"{x:.4f}" for x in market_data['macd_series'][-5:]])
-    atr_series_text = ", ".join([f"{x:.2f}" for x in market_data['atr_series'][-5:]])
-    
-    # 构建1小时数据文本
-    if bnb_1h_data:
-        rsi_series_1h_text = ", ".join([f"{x:.1f}" for x in bnb_1h_data['rsi_series'][-5:]])
-        macd_series_1h_text = ", ".join([f"{x:.4f}" for x in bnb_1h_data['macd_series'][-5:]])
-        bnb_1h_text = f"""
-
-【1小时技术指标】
-- RSI: {bnb_1h_data['rsi']:.1f} | 时间序列: [{rsi_series_1h_text}]
-- MACD: {bnb_1h_data['macd']:.4f} | 时间序列: [{macd_series_1h_text}]
-- SMA20: ${bnb_1h_data['sma_20']:.2f} | SMA50: ${bnb_1h_data['sma_50']:.2f}"""
-    else:
-        bnb_1h_text = ""
-    
-    # SMA位置关系（客观数据）
-    sma20 = market_data['sma_20']
-    sma50 = market_data['sma_50']
-    price = market_data['price']
-    
-    # 资金费率（客观数据）
-    funding_rate = market_data['funding_rate']
-    if funding_rate > 0.0001:
-        funding_text = "多头付费"
-    elif funding_rate < -0.0001:
-        funding_text = "空头付费"
-    else:
-        funding_text = "中性"
-    
-    # BTC大盘参考
-    btc_text = ""
-    if btc_data:
-        btc_text = f"""
-【BTC大盘参考】（15分钟周期）
-- 价格: ${btc_data['price']:,.2f}
-- RSI: {btc_data['rsi']:.1f}
-- MACD: {btc_data['macd']:.4f}
-- 趋势: {btc_data['trend']} (强度{btc_data['strength']:.2f}%)"""
-    
-    # 持仓信息
-    position_text = ""
-    if market_data['position']:
-        pos = market_data['position']
-        pnl_percent = (pos['unrealized_pnl'] / (pos['amount'] * pos['entry_price'] / TRADE_CONFIG['leverage'])) * 100 if pos['entry_price'] > 0 else 0
-        position_text = f"""
-    【当前持仓】
-- 方向: {pos['side']}
-- 数量: {pos['amount']:.2f} BNB
-- 开仓价: ${pos['entry_price']:.2f}
-- 未实现盈亏: {pos['unrealized_pnl']:+.2f} USDT ({pnl_percent:+.2f}%)"""
+
+    results, errors = fetch_concurrently(market_data_requests(symbol))
+    for name, e in errors.items():
+        print(f"⚠️ [{symbol}] 请求 {name} 失败: {str(e)[:100]}")
+
+    shared_data = shared.get()
+    if shared_data['positions_ok']:
+        position = shared_data['positions'].get(symbol)
     else:
-        position_text = "\n【当前持仓】无持仓"
-    
-    # 读取最近的AI决策历史
-    last_decisions_text = ""
+        position = get_current_position(symbol)
+
+    market_data = None
     try:
-        if os.path.exists(AI_DECISIONS_FILE):
-            with open(AI_DECISIONS_FILE, 'r', encoding='utf-8') as f:
-                decisions_data = json.load(f)
-                recent_decisions = decisions_data.get('decisions', [])[-3:]
-                
-                if recent_decisions:
-                    last_decisions_text = "\n【最近AI决策记录】（最近45分钟）"
-                    for i, dec in enumerate(reversed(recent_decisions), 1):
-                        time_str = dec.get('time', 'N/A')[:19] if dec.get('time') else 'N/A'
-                        coin = dec.get('coin', 'N/A')
-                        action = dec.get('action', 'N/A')
-                        reason = dec.get('reason', 'N/A')
-                        confidence = dec.get('confidence', 'N/A')
-                        
-                        last_decisions_text += f"""
-{i}. {time_str} - {coin}
-   操作: {action}
-   理由: {reason}
-   信心: {confidence}
-"""
+        market_data = build_market_data(
+            symbol,
+            results['klines_15m'],
+            results['ticker_24h'],
+            results['funding_rate'],
+            results['open_interest'],
+            position,
+            current_time
+        )
     except Exception as e:
-        print(f"⚠️ 读取历史决策失败: {e}")
-    
-    # 账户余额
-    balance = get_account_balance()
-    balance_text = ""
-    if balance:
-        balance_text = f"""
-【账户状态】
-- 总权益: {balance['total']:.2f} USDT
-- 可用余额: {balance['available']:.2f} USDT
-- 未实现盈亏: {balance['unrealized_pnl']:+.2f} USDT"""
-    
-    # 统计信息
-    stats_text = trading_stats.generate_stats_text_for_ai()
-    
-    market_text = f"""
-【系统运行状态】
-- 启动时间: {PROGRAM_START_TIME.strftime('%Y-%m-%d %H:%M:%S')}
-- 运行时长: {runtime_minutes:.1f}分钟
-- AI调用次数: {INVOCATION_COUNT}次
-
-【BNB/USDT市场数据】
-- 价格: ${market_data['price']:,.2f} | 24h涨跌: {market_data['change_24h']:+.2f}% | 15m涨跌: {market_data['change_15m']:+.2f}%
-- 资金费率: {funding_rate:.6f} ({funding_text}) | 持仓量: {market_data['open_interest']:,.0f}{current_kline_text}
-
-【15分钟技术指标】
-- RSI: {market_data['rsi']:.1f} | 时间序列: [{rsi_series_text}]
-- MACD: {market_data['macd']:.4f} | 时间序列: [{macd_series_text}]
-- ATR: {market_data['atr']:.2f} | 时间序列: [{atr_series_text}]
-- 价格: ${price:.2f} | SMA20: ${sma20:.2f} | SMA50: ${sma50:.2f}
-- 布林带位置: {market_data['bb_position']:.2%}{bnb_1h_text}{kline_text}{btc_text}{balance_text}{position_text}{stats_text}{last_decisions_text}
-"""
-    
-    prompt = f"""
-你是一位专业的日内交易员，负责BNB/USDT合约交易（3倍杠杆）。
-
-{market_text}
-
-【数据周期】
-- 15分钟K线数据
-- 历史16根K线（4小时历史数据，从旧→新）
-
-【决策要求】
-1. 综合分析当前K线实时状态、历史K线形态、技术指标、BTC大盘
-2. 给出交易决策：BUY_OPEN（开多）/ SELL_OPEN（开空）/ CLOSE（平仓）/ HOLD（观望）
-3. 说明决策理由（包含K线形态和技术指标分析）
-4. 评估信心程度：HIGH / MEDIUM / LOW
-
-请严格按照以下JSON格式回复（不要有任何额外文本）：
-{{
-    "action": "BUY_OPEN|SELL_OPEN|CLOSE|HOLD",
-    "reason": "K线：[形态描述] | 指标：[指标描述]",
-    "confidence": "HIGH|MEDIUM|LOW"
-    }}
-    """
+        print(f"❌ 获取{symbol}数据失败: {e}")
 
+    data_1h = None
     try:
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一位专业的日内交易员，专注于技术分析和风险控制。"},
-                {"role": "user", "content": prompt}
-            ],
-            stream=False,
-            temperature=0.1
+        data_1h = build_1h_data(symbol, results['klines_1h'])
+    except Exception as e:
+        print(f"❌ 获取{symbol} 1小时数据失败: {e}")
+
+    return {
+        'symbol': symbol,
+        'market_data': market_data,
+        'data_1h': data_1h,
+        'btc_data': shared_data['btc_data'],
+        'balance': shared_data['balance'],
+        'fetch_time': current_time,
+        'fetch_seconds': time.time() - start,
+    }
+
+
+def analyze_portfolio_with_ai(symbol_config, market_data, data_1h, btc_data, balance=None,
+                              on_early_decision=None):
+    """
+    使用AI分析市场并做出交易决策（balance为空时单独查询账户余额）
+
+    流式模式下，action和confidence解析完整时会先调用 on_early_decision(decision)；
+    市场状态指纹命中决策缓存时直接返回缓存的决策，不调用AI
+    """
+    global INVOCATION_COUNT
+    symbol = symbol_config['symbol']
+    coin = symbol_config['coin']
+    leverage = symbol_config['leverage']
+
+    cache_key = app.decision_cache.fingerprint(symbol, market_data)
+    cached_decision = app.decision_cache.get(cache_key)
+    if cached_decision is not None:
+        print(f"🗂️ [{symbol}] 市场状态未变化，复用缓存决策: {cached_decision.get('action')}")
+        save_ai_decision(
+            coin=coin,
+            action=cached_decision.get('action', 'HOLD'),
+            reason=f"[缓存] {cached_decision.get('reason', 'N/A')}",
+            confidence=cached_decision.get('confidence', 'LOW')
         )
+        return cached_decision
 
-        result = response.choices[0].message.content
+    with _invocation_lock:
+        INVOCATION_COUNT += 1
+        invocation_count = INVOCATION_COUNT
+
+        # 保存运行时状态
+        save_current_runtime()
+    
+    current_time = datetime.now()
+    runtime_minutes = (current_time - PROGRAM_START_TIME).total_seconds() / 60
+
+    # 读取最近的AI决策历史
+    recent_decisions = app.storage.query_decisions(limit=3, coin=coin)
+
+    # 账户余额（优先使用数据采集阶段的快照）
+    if balance is None:
+        balance = get_account_balance()
+
+    prompt_format = TRADE_CONFIG.get('prompt_format', 'verbose')
+    with app.metrics.span('prompt_build'):
+        prompt = build_prompt(prompt_format, {
+            'coin': coin,
+            'leverage': leverage,
+            'market_data': market_data,
+            'data_1h': data_1h,
+            'btc_data': btc_data,
+            'balance': balance,
+            'stats_text': app.trading_stats.generate_stats_text_for_ai(),
+            'recent_decisions': recent_decisions,
+            'start_time': PROGRAM_START_TIME,
+            'runtime_minutes': runtime_minutes,
+            'invocation_count': invocation_count,
+        }, reason_chars=TRADE_CONFIG.get('prompt_reason_chars', 40))
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    prompt_chars = sum(len(m['content']) for m in messages)
+    prompt_tokens = sum(estimate_tokens(m['content']) for m in messages)
+    print(f"📏 [{symbol}] 提示词({prompt_format}): {prompt_chars}字符，估算约{prompt_tokens} tokens")
+
+    try:
+        ai_start = time.time()
+        ai_cpu_start = time.thread_time()
+        if TRADE_CONFIG.get('llm_stream', False):
+            streamed = stream_decision(
+                app.deepseek_client,
+                "deepseek-chat",
+                messages,
+                temperature=0.1,
+                on_early_decision=on_early_decision,
+                log=print
+            )
+            result = streamed['content']
+            usage = streamed['usage']
+            if streamed['ttft'] is not None:
+                app.metrics.observe('llm.ttft', streamed['ttft'])
+            early_text = f"{streamed['early_latency']:.2f}秒" if streamed['early_latency'] is not None else "无"
+            ttft_text = f"{streamed['ttft']:.2f}秒" if streamed['ttft'] is not None else "无"
+            print(f"⏱️ [{symbol}] AI首token {ttft_text} | 决策字段 {early_text} | 完整回复 {streamed['total_latency']:.2f}秒")
+        else:
+            response = app.deepseek_client.chat.completions.create(
+                model="deepseek-chat",
+                messages=messages,
+                stream=False,
+                temperature=0.1
+            )
+            result = response.choices[0].message.content
+            usage = getattr(response, 'usage', None)
+        ai_latency = time.time() - ai_start
+        app.metrics.observe('llm.total', ai_latency, time.thread_time() - ai_cpu_start)
+        if usage is not None:
+            print(f"📏 [{symbol}] 实际token用量: 输入 {usage.prompt_tokens} | 输出 {usage.completion_tokens}")
         print(f"\n{'='*60}")
         print(f"AI原始回复: {result}")
         print(f"{'='*60}\n")
@@ -618,11 +691,12 @@ def analyze_portfolio_with_ai(market_data, bnb_1h_data, btc_data):
             
             # 保存决策
             save_ai_decision(
-                coin='BNB',
+                coin=coin,
                 action=decision.get('action', 'HOLD'),
                 reason=decision.get('reason', 'N/A'),
                 confidence=decision.get('confidence', 'LOW')
             )
+            app.decision_cache.put(cache_key, decision, ai_latency)
             
             return decision
         else:
@@ -636,12 +710,103 @@ def analyze_portfolio_with_ai(market_data, bnb_1h_data, btc_data):
         return {"action": "HOLD", "reason": f"AI调用失败: {e}", "confidence": "LOW"}
 
 
-def execute_trade(decision, market_data):
-    """执行交易"""
+def calculate_order_qty(symbol_config, balance, price):
+    """按可用余额比例和杠杆计算开仓数量，按交易所数量步长向下取整，不超过单笔市价单上限"""
+    margin = balance['available'] * symbol_config['margin_ratio']
+    position_value = margin * symbol_config['leverage']
+    qty = position_value / price
+    if symbol_config['max_order_qty']:
+        qty = min(qty, symbol_config['max_order_qty'])
+    return floor_to_step(qty, symbol_config['step_size'])
+
+
+def meets_order_minimums(symbol_config, qty, price):
+    """交易所会拒绝低于最小数量或最小名义价值的开仓"""
+    return qty >= symbol_config['min_order_qty'] and qty * price >= symbol_config['min_notional']
+
+
+def record_close(symbol_config, position, exit_price, balance):
+    """平仓后写入交易账本（成交价取订单响应的成交均价）"""
+    try:
+        trade = app.trading_stats.close_position(
+            symbol_config['symbol'],
+            position['side'],
+            position['amount'],
+            position['entry_price'],
+            exit_price,
+            leverage=position.get('leverage') or symbol_config['leverage'],
+            equity_before=balance['total'] if balance else None
+        )
+        print(f"📒 [{symbol_config['symbol']}] 平仓盈亏 {trade['pnl']:+.2f} USDT（手续费 {trade['fees']:.2f}）")
+    except Exception as e:
+        print(f"⚠️ 记录平仓失败: {e}")
+
+
+def record_open(symbol_config, side, qty, price):
+    """开仓后记录到交易账本"""
+    try:
+        app.trading_stats.open_position(symbol_config['symbol'], side, qty, price)
+    except Exception as e:
+        print(f"⚠️ 记录开仓失败: {e}")
+
+
+def place_market_order(symbol, side, quantity):
+    """
+    下市价单，返回成交结果 {'status', 'qty', 'price'}
+
+    newOrderRespType=RESULT 时交易所在撮合完成后才返回，响应中即有成交数量和均价，无需等待后再查询；
+    偶尔未到最终状态就返回时，从账户推送等待该订单的成交更新
+    """
+    order = app.binance_client.futures_create_order(
+        symbol=symbol,
+        side=side,
+        type='MARKET',
+        quantity=quantity,
+        newOrderRespType='RESULT'
+    )
+    avg_price = float(order.get('avgPrice') or 0)
+    fill = {
+        'status': order.get('status'),
+        'qty': float(order.get('executedQty') or 0),
+        'price': avg_price if avg_price > 0 else None,
+    }
+    if fill['status'] != 'FILLED' and order.get('orderId') is not None:
+        update = app.account_mirror.wait_order(order['orderId'], timeout=3)
+        if update and update['qty'] >= fill['qty']:
+            fill = {'status': update['status'], 'qty': update['qty'], 'price': update['price'] or fill['price']}
+    return fill
+
+
+def record_fill(symbol_config, fill, market_data, balance, position, close_qty, open_side=None):
+    """按订单成交结果记账：成交数量先抵消原持仓，剩余部分为新开仓（成交均价缺失时用当前市价）"""
+    symbol = symbol_config['symbol']
+    if fill['status'] != 'FILLED':
+        print(f"⚠️ [{symbol}] 订单未完全成交: {fill['status']}，成交 {fill['qty']}")
+    if fill['qty'] <= 0:
+        return
+
+    price = fill['price'] or market_data['price']
+    closed_qty = min(fill['qty'], close_qty)
+    if closed_qty > 0:
+        record_close(symbol_config, dict(position, amount=closed_qty), price, balance)
+    opened_qty = round(fill['qty'] - closed_qty, symbol_config['qty_precision'])
+    if open_side and opened_qty > 0:
+        record_open(symbol_config, open_side, opened_qty, price)
+    print(f"🧾 [{symbol}] 成交 {fill['qty']} @ {price}")
+
+
+def execute_trade(decision, market_data, symbol_config, balance=None):
+    """
+    执行交易
+
+    balance: 本轮共享快照中的余额。账户推送已连接时改用实时镜像；两者都没有时才单独请求REST
+    """
     action = decision.get('action', 'HOLD')
+    symbol = symbol_config['symbol']
+    coin = symbol_config['coin']
 
     print(f"\n{'='*60}")
-    print(f"📊 AI交易决策")
+    print(f"📊 AI交易决策 [{symbol}]")
     print(f"{'='*60}")
     print(f"操作: {action}")
     print(f"理由: {decision.get('reason', 'N/A')}")
@@ -649,150 +814,251 @@ def execute_trade(decision, market_data):
     print(f"{'='*60}\n")
     
     if action == 'HOLD':
-        print("💤 观望，不执行交易")
+        print(f"💤 [{symbol}] 观望，不执行交易")
         return
 
     if TRADE_CONFIG.get('test_mode', False):
-        print("🧪 测试模式，仅模拟")
+        print(f"🧪 [{symbol}] 测试模式，仅模拟")
         return
 
     try:
         current_position = market_data['position']
-        balance = get_account_balance()
+        live_account = app.account_mirror.get_account()
+        if live_account is not None:
+            balance = parse_account_balance(live_account)
+        elif balance is None:
+            balance = get_account_balance()
         
-        if action == 'BUY_OPEN':
-            if current_position and current_position['side'] == 'SHORT':
-                # 先平空仓
-                print(f"📈 平空仓: {current_position['amount']:.2f} BNB")
-                binance_client.futures_create_order(
-                    symbol='BNBUSDT',
-                    side='BUY',
-                    type='MARKET',
-                    quantity=current_position['amount']
-                )
-                time.sleep(1)
-            
-            if not current_position or current_position['side'] == 'SHORT':
-                # 开多仓（使用30%可用余额）
-                if balance and balance['available'] > 10:
-                    margin = balance['available'] * 0.3
-                    position_value = margin * TRADE_CONFIG['leverage']
-                    qty = position_value / market_data['price']
-                    qty = math.floor(qty * 100) / 100  # 保留2位小数
-                    
-                    if qty >= TRADE_CONFIG['min_order_qty']:
-                        print(f"📈 开多仓: {qty:.2f} BNB")
-                        binance_client.futures_create_order(
-                            symbol='BNBUSDT',
-                            side='BUY',
-                            type='MARKET',
-                            quantity=qty
-                        )
-        
-        elif action == 'SELL_OPEN':
-            if current_position and current_position['side'] == 'LONG':
-                # 先平多仓
-                print(f"📉 平多仓: {current_position['amount']:.2f} BNB")
-                binance_client.futures_create_order(
-                    symbol='BNBUSDT',
-                    side='SELL',
-                    type='MARKET',
-                    quantity=current_position['amount']
-                )
-                time.sleep(1)
-            
-            if not current_position or current_position['side'] == 'LONG':
-                # 开空仓（使用30%可用余额）
+        if action in ('BUY_OPEN', 'SELL_OPEN'):
+            side = 'LONG' if action == 'BUY_OPEN' else 'SHORT'
+            order_side = 'BUY' if side == 'LONG' else 'SELL'
+            emoji = '📈' if side == 'LONG' else '📉'
+            side_text = '多' if side == 'LONG' else '空'
+
+            if current_position and current_position['side'] == side:
+                print(f"{emoji} [{symbol}] 已持有{side_text}仓，不重复开仓")
+            else:
+                # 有反向持仓时平仓和开仓合并为一笔净数量市价单（单向持仓模式），只需一次往返
+                close_qty = current_position['amount'] if current_position else 0
+                open_qty = 0
+                # 开仓使用margin_ratio比例的可用余额
                 if balance and balance['available'] > 10:
-                    margin = balance['available'] * 0.3
-                    position_value = margin * TRADE_CONFIG['leverage']
-                    qty = position_value / market_data['price']
-                    qty = math.floor(qty * 100) / 100
-                    
-                    if qty >= TRADE_CONFIG['min_order_qty']:
-                        print(f"📉 开空仓: {qty:.2f} BNB")
-                        binance_client.futures_create_order(
-                            symbol='BNBUSDT',
-                            side='SELL',
-                            type='MARKET',
-                            quantity=qty
-                        )
-        
+                    qty = calculate_order_qty(symbol_config, balance, market_data['price'])
+                    if meets_order_minimums(symbol_config, qty, market_data['price']):
+                        open_qty = qty
+
+                # 合并后的数量同样受单笔市价单上限限制：优先缩减开仓部分，缩减后不够最小下单量时平仓和开仓分两笔
+                max_qty = symbol_config['max_order_qty']
+                split_orders = False
+                if close_qty and open_qty and max_qty and close_qty + open_qty > max_qty:
+                    clamped_qty = floor_to_step(max_qty - close_qty, symbol_config['step_size'])
+                    if clamped_qty > 0 and meets_order_minimums(symbol_config, clamped_qty, market_data['price']):
+                        open_qty = clamped_qty
+                    else:
+                        split_orders = True
+
+                if split_orders:
+                    print(f"🔄 反手开{side_text}: 平{current_position['amount']} + 开{open_qty} {coin}（超过单笔上限，分两笔市价单）")
+                elif close_qty and open_qty:
+                    print(f"🔄 反手开{side_text}: 平{current_position['amount']} + 开{open_qty} {coin}（单笔市价单）")
+                elif close_qty:
+                    print(f"{emoji} 平{'空' if side == 'LONG' else '多'}仓: {close_qty} {coin}（余额不足，不开新仓）")
+                elif open_qty:
+                    print(f"{emoji} 开{side_text}仓: {open_qty} {coin}")
+
+                if split_orders:
+                    fill = place_market_order(symbol, order_side, close_qty)
+                    record_fill(symbol_config, fill, market_data, balance, current_position, close_qty)
+                    # 平仓没有完全成交时不开新仓，避免与剩余原持仓相抵
+                    if fill['status'] == 'FILLED':
+                        fill = place_market_order(symbol, order_side, open_qty)
+                        record_fill(symbol_config, fill, market_data, balance, None, 0, side)
+                elif close_qty or open_qty:
+                    total_qty = round(close_qty + open_qty, symbol_config['qty_precision'])
+                    fill = place_market_order(symbol, order_side, total_qty)
+                    record_fill(symbol_config, fill, market_data, balance, current_position, close_qty, side)
+
         elif action == 'CLOSE':
             if current_position:
-                side = 'SELL' if current_position['side'] == 'LONG' else 'BUY'
-                print(f"🔒 平仓: {current_position['side']} {current_position['amount']:.2f} BNB")
-                binance_client.futures_create_order(
-                    symbol='BNBUSDT',
-                    side=side,
-                    type='MARKET',
-                    quantity=current_position['amount']
-                )
+                order_side = 'SELL' if current_position['side'] == 'LONG' else 'BUY'
+                print(f"🔒 平仓: {current_position['side']} {current_position['amount']} {coin}")
+                fill = place_market_order(symbol, order_side, current_position['amount'])
+                record_fill(symbol_config, fill, market_data, balance, current_position, current_position['amount'])
         
-        print("✅ 交易执行成功")
+        print(f"✅ [{symbol}] 交易执行成功")
 
     except Exception as e:
-        print(f"❌ 交易执行失败: {e}")
+        print(f"❌ [{symbol}] 交易执行失败: {e}")
         import traceback
         traceback.print_exc()
 
 
+def start_market_stream():
+    """启动WebSocket行情订阅"""
+    from market_stream import MarketStreamSubscriber
+
+    if app.market_stream is not None:
+        return
+    app.market_stream = MarketStreamSubscriber(
+        app.candle_store,
+        stream_subscriptions(),
+        seeder=lambda symbol, interval, limit, start_time=None: app.binance_client.futures_klines(
+            symbol=symbol, interval=interval, limit=limit,
+            **({'startTime': start_time} if start_time else {})
+        )
+    )
+    app.market_stream.start()
+
+
+def start_account_stream():
+    """启动用户数据流订阅（账户余额、持仓、订单成交镜像）"""
+    from account_stream import AccountStreamSubscriber
+
+    if app.account_stream is not None:
+        return
+    app.account_stream = AccountStreamSubscriber(app.account_mirror, app.binance_client)
+    app.account_stream.start()
+
+
+def run_symbol_pipeline(symbol_config, shared):
+    """单个交易对的完整流水线：数据 → 指标 → AI → 下单"""
+    with app.metrics.span('pipeline'):
+        symbol = symbol_config['symbol']
+
+        # 行情请求与共享数据请求同时在途
+        snapshot = gather_market_snapshot(symbol, shared)
+
+        # 共享快照已带回账户中的当前杠杆，只有与配置不一致时才调整
+        try:
+            if app.exchange_info.ensure_leverage(symbol, symbol_config['leverage']):
+                print(f"⚙️ [{symbol}] 杠杆已调整为 {symbol_config['leverage']}x")
+        except Exception as e:
+            print(f"⚠️ [{symbol}] 设置杠杆失败: {str(e)[:100]}")
+        app.metrics.observe('fetch', snapshot['fetch_seconds'])
+        print(f"📡 [{symbol}] 数据采集耗时: {snapshot['fetch_seconds']:.2f}秒")
+
+        market_data = snapshot['market_data']
+        if not market_data:
+            print(f"⚠️ [{symbol}] 获取市场数据失败，跳过本次")
+            return
+
+        # 流式模式下action/confidence一解析完整就提前下单，reason继续生成
+        early_orders = []
+
+        def on_early_decision(early_decision):
+            early_decision = dict(early_decision, reason='（流式生成中，见后续日志）')
+            early_orders.append(_order_executor.submit(
+                execute_trade, early_decision, market_data, symbol_config, snapshot['balance']))
+
+        # AI分析
+        decision = analyze_portfolio_with_ai(
+            symbol_config,
+            market_data,
+            snapshot['data_1h'],
+            snapshot['btc_data'],
+            snapshot['balance'],
+            on_early_decision=on_early_decision
+        )
+
+        # 执行交易（已提前下单的只等待其完成）
+        if early_orders:
+            early_orders[0].result()
+        else:
+            execute_trade(decision, market_data, symbol_config, snapshot['balance'])
+
+
+def publish_cycle_metrics(cycle_seconds):
+    """本轮各阶段耗时写成一行JSON（日志 + cycle_metrics.jsonl），并更新供 /metrics 读取的直方图快照"""
+    record = app.metrics.end_cycle(cycle_seconds)
+    print(f"📊 阶段耗时: {json.dumps(record, ensure_ascii=False)}")
+    try:
+        open_journal(CYCLE_METRICS_FILE, ring_size=1, fsync=False).append(record)
+        app.metrics.write_snapshot(METRICS_SNAPSHOT_FILE)
+    except Exception as e:
+        print(f"⚠️ 保存阶段耗时指标失败: {e}")
+
+
 def trading_bot():
-    """主交易逻辑"""
+    """主交易逻辑：所有交易对在有界线程池中并发执行"""
     print("\n" + "=" * 60)
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
 
-    # 设置杠杆（首次）
-    try:
-        binance_client.futures_change_leverage(
-            symbol='BNBUSDT',
-            leverage=TRADE_CONFIG['leverage']
-        )
-    except:
-        pass
-    
-    # 获取市场数据
-    market_data = get_bnb_market_data()
-    if not market_data:
-        print("⚠️ 获取市场数据失败，跳过本次")
-        return
+    cycle_start = time.time()
 
-    # 获取1小时数据
-    bnb_1h_data = get_bnb_1h_data()
-    
-    # 获取BTC参考
-    btc_data = get_btc_market_reference()
-    
-    # AI分析
-    decision = analyze_portfolio_with_ai(market_data, bnb_1h_data, btc_data)
-    
-    # 执行交易
-    execute_trade(decision, market_data)
+    # BTC参考、账户余额、全部持仓每轮只请求一次，供所有交易对共享
+    shared = SharedSnapshot()
+
+    futures = {
+        symbol: _pipeline_executor.submit(run_symbol_pipeline, get_symbol_config(symbol), shared)
+        for symbol in TRADE_CONFIG['symbols']
+    }
+    for symbol, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            print(f"❌ [{symbol}] 流水线异常: {e}")
+            import traceback
+            traceback.print_exc()
+
+    cycle_seconds = time.time() - cycle_start
+    print(f"⏱️ 本轮完成: {len(futures)}个交易对，耗时 {cycle_seconds:.2f}秒")
+    if app.decision_cache.enabled:
+        print(app.decision_cache.report())
+    publish_cycle_metrics(cycle_seconds)
+    app.checkpoint.save()
 
 
 def main():
     """主函数"""
-    print(f"BNB自动交易机器人启动成功！")
+    app.load_env()
+    app.setup_logging()
+    apply_env_overrides()
+
+    print(f"AI自动交易机器人启动成功！")
+    print(f"交易对: {', '.join(TRADE_CONFIG['symbols'])}")
     print(f"杠杆: {TRADE_CONFIG['leverage']}x")
-    print(f"交易周期: 15分钟")
+    print(f"交易周期: {TRADE_CONFIG['cycle_interval_minutes']}分钟（K线收盘后{TRADE_CONFIG['cycle_offset_seconds']}秒执行）")
 
     if TRADE_CONFIG.get('test_mode', False):
         print("🧪 当前为测试模式")
     else:
         print("🚨 实盘交易模式，请谨慎操作！")
 
-    # 每15分钟执行一次
-        schedule.every(15).minutes.do(trading_bot)
-        print("执行频率: 每15分钟一次")
+    try:
+        app.binance_client
+    except ConnectionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    restored = app.checkpoint.restore()
+    if restored:
+        print(f"♻️ 已从检查点恢复: {', '.join(restored)}")
+    # 部署/重启时（SIGTERM）同样保存检查点
+    atexit.register(app.checkpoint.save)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    if TRADE_CONFIG.get('use_market_stream', False):
+        start_market_stream()
+        # 恢复的K线只需补齐缺口，通常一秒内就绪；超时则本轮回退REST
+        if not app.market_stream.wait_ready(TRADE_CONFIG['stream_ready_timeout']):
+            print("⚠️ 行情推送尚未就绪，本轮使用REST数据")
+
+    if TRADE_CONFIG.get('use_account_stream', False):
+        start_account_stream()
+        if not app.account_stream.wait_ready(TRADE_CONFIG['stream_ready_timeout']):
+            print("⚠️ 账户推送尚未就绪，本轮使用REST查询余额和持仓")
 
     # 立即执行一次
     trading_bot()
 
-    # 循环执行
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    # 之后在每根K线收盘后执行
+    scheduler = CandleScheduler(
+        trading_bot,
+        interval_minutes=TRADE_CONFIG['cycle_interval_minutes'],
+        offset_seconds=TRADE_CONFIG['cycle_offset_seconds']
+    )
+    scheduler.run_forever()
 
 
 if __name__ == "__main__":
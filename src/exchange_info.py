@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exchange Info Module - Cached symbol filters and applied leverage
+交易所信息模块 - 缓存交易对下单规则与当前杠杆
+
+futures_exchange_info 只在首次使用时请求一次，之后按较长的TTL刷新，从中解析每个交易对的
+数量步长/最小最大数量（MARKET_LOT_SIZE，缺失时用LOT_SIZE）、最小名义价值（MIN_NOTIONAL）
+和价格步长（PRICE_FILTER），下单数量按交易所规则取整，任何币种都不需要手工维护精度表。
+
+同时记录各交易对在交易所上当前生效的杠杆（来自账户信息或调整杠杆的响应），
+只有与配置不一致时才发出调整杠杆请求，而不是每轮每个交易对都请求一次。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import logging
+import threading
+import time
+from decimal import Decimal, ROUND_FLOOR
+from typing import Dict, Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def floor_to_step(value: float, step: float) -> float:
+    """按步长向下取整（十进制计算，避免 0.3/0.1 之类的浮点误差）"""
+    step = Decimal(str(step))
+    if step <= 0:
+        return value
+    return float((Decimal(str(value)) / step).to_integral_value(ROUND_FLOOR) * step)
+
+
+def step_precision(step: float) -> int:
+    """步长对应的小数位数：0.001 → 3，1 → 0"""
+    return max(0, -Decimal(str(step)).normalize().as_tuple().exponent)
+
+
+def parse_symbol_filters(symbol_info: Dict[str, Any]) -> Dict[str, Any]:
+    """从exchangeInfo的单个交易对条目中解析下单规则"""
+    filters = {f['filterType']: f for f in symbol_info.get('filters', [])}
+    lot = filters.get('LOT_SIZE', {})
+    # 机器人只下市价单，市价单的数量规则优先
+    market_lot = filters.get('MARKET_LOT_SIZE', {})
+    step_size = float(market_lot.get('stepSize') or 0) or float(lot.get('stepSize') or 0)
+    min_qty = float(market_lot.get('minQty') or 0) or float(lot.get('minQty') or 0)
+    max_qty = float(market_lot.get('maxQty') or 0) or float(lot.get('maxQty') or 0)
+    min_notional = filters.get('MIN_NOTIONAL', {})
+    return {
+        'status': symbol_info.get('status'),
+        'step_size': step_size,
+        'min_qty': min_qty,
+        'max_qty': max_qty,
+        'min_notional': float(min_notional.get('notional') or min_notional.get('minNotional') or 0),
+        'tick_size': float(filters.get('PRICE_FILTER', {}).get('tickSize') or 0),
+        'qty_precision': step_precision(step_size) if step_size else symbol_info.get('quantityPrecision'),
+    }
+
+
+class ExchangeInfoCache:
+    """
+    交易对下单规则缓存 + 当前杠杆记录（线程安全）
+
+    loader: 返回futures_exchange_info响应的函数
+    leverage_setter: (symbol, leverage) -> 调整杠杆响应，即futures_change_leverage
+    ttl: 下单规则刷新间隔（秒）；retry_interval: 加载失败后多久再重试，期间沿用旧数据
+    """
+
+    def __init__(self, loader: Callable[[], Dict[str, Any]],
+                 leverage_setter: Callable[[str, int], Dict[str, Any]],
+                 ttl: float = 6 * 3600, retry_interval: float = 60):
+        self.loader = loader
+        self.leverage_setter = leverage_setter
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._symbols: Optional[Dict[str, Dict[str, Any]]] = None
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._leverage: Dict[str, int] = {}
+        # 加载期间持有锁：同时到达的请求等待同一次加载结果
+        self._lock = threading.Lock()
+        self._leverage_lock = threading.Lock()
+
+    def _fresh(self, now: float) -> bool:
+        return self._loaded_at is not None and now - self._loaded_at < self.ttl
+
+    def _load(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            now = time.time()
+            if self._fresh(now):
+                return self._symbols
+            if self._failed_at is not None and now - self._failed_at < self.retry_interval:
+                return self._symbols
+            try:
+                info = self.loader()
+                self._symbols = {s['symbol']: parse_symbol_filters(s) for s in info.get('symbols', [])}
+                self._loaded_at = time.time()
+                self._failed_at = None
+                logger.info(f"📋 交易所规则已加载: {len(self._symbols)}个交易对")
+            except Exception as e:
+                self._failed_at = now
+                logger.warning(f"⚠️ 获取交易所规则失败{'，沿用上次数据' if self._symbols else ''}: {str(e)[:100]}")
+            return self._symbols
+
+    def filters(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """交易对的下单规则，交易所信息不可用或没有该交易对时返回None"""
+        symbols = self._symbols if self._fresh(time.time()) else self._load()
+        if not symbols:
+            return None
+        return symbols.get(symbol)
+
+    def refresh(self):
+        """强制下次读取时重新加载（如下单被交易所以精度错误拒绝）"""
+        with self._lock:
+            self._loaded_at = None
+            self._failed_at = None
+
+    def applied_leverage(self, symbol: str) -> Optional[int]:
+        with self._leverage_lock:
+            return self._leverage.get(symbol)
+
+    def observe_leverage(self, positions: Iterable[Dict[str, Any]]):
+        """从futures_account响应的positions（每个交易对一项，含leverage）更新当前杠杆，缺少杠杆的项忽略"""
+        with self._leverage_lock:
+            for position in positions:
+                leverage = position.get('leverage')
+                if leverage in (None, '', 0, '0'):
+                    continue
+                self._leverage[position['symbol']] = int(leverage)
+
+    def ensure_leverage(self, symbol: str, leverage: int) -> bool:
+        """杠杆与交易所当前值不同（或未知）时才调整，返回是否发出了请求"""
+        if self.applied_leverage(symbol) == leverage:
+            return False
+        response = self.leverage_setter(symbol, leverage)
+        with self._leverage_lock:
+            self._leverage[symbol] = int(response.get('leverage', leverage))
+        return True
+
+    def to_state(self) -> Dict[str, Any]:
+        with self._lock, self._leverage_lock:
+            return {
+                'loaded_at': self._loaded_at,
+                'symbols': self._symbols,
+                'leverage': dict(self._leverage),
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        """恢复检查点：下单规则保留原加载时间（过期照常刷新），杠杆作为已知值直到账户信息更新"""
+        with self._lock, self._leverage_lock:
+            if state.get('symbols') and state.get('loaded_at'):
+                self._symbols = state['symbols']
+                self._loaded_at = state['loaded_at']
+            self._leverage.update({symbol: int(value) for symbol, value in state.get('leverage', {}).items()})
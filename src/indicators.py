@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indicators Module - Technical indicators
+技术指标模块
+
+同一套指标（SMA20/50、EMA12/26、MACD、RSI14、布林带、ATR14）的两种实现，口径完全一致：
+- calculate_technical_indicators: pandas整表计算（原始实现，作为对照基准）
+- compute_indicators: 基于NumPy连续数组的向量化内核，热路径使用
+
+Author: AI Trading Bot
+License: MIT
+"""
+import threading
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+KLINE_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
+]
+
+# 输出字段顺序（与pandas版本的列名一致）
+INDICATOR_FIELDS = (
+    'sma_20', 'sma_50', 'ema_12', 'ema_26', 'macd', 'macd_signal', 'rsi',
+    'bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'atr_14',
+)
+
+
+def klines_to_dataframe(klines):
+    """将futures_klines原始数据转换为DataFrame"""
+    import pandas as pd
+
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+
+    df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def calculate_technical_indicators(df):
+    """计算技术指标"""
+    try:
+        # 移动平均线
+        df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
+        df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
+
+        # MACD
+        df['ema_12'] = df['close'].ewm(span=12).mean()
+        df['ema_26'] = df['close'].ewm(span=26).mean()
+        df['macd'] = df['ema_12'] - df['ema_26']
+        df['macd_signal'] = df['macd'].ewm(span=9).mean()
+
+        # RSI
+        delta = df['close'].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        rs = gain / loss
+        df['rsi'] = 100 - (100 / (1 + rs))
+
+        # 布林带
+        df['bb_middle'] = df['close'].rolling(20).mean()
+        bb_std = df['close'].rolling(20).std()
+        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
+        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
+        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+
+        # ATR
+        df['high_low'] = df['high'] - df['low']
+        df['high_close'] = abs(df['high'] - df['close'].shift())
+        df['low_close'] = abs(df['low'] - df['close'].shift())
+        df['true_range'] = df[['high_low', 'high_close', 'low_close']].max(axis=1)
+        df['atr_14'] = df['true_range'].rolling(14).mean()
+
+        df = df.bfill().ffill()
+        return df
+    except Exception as e:
+        print(f"技术指标计算失败: {e}")
+        return df
+
+
+def parse_klines(klines: List[List[Any]]) -> Dict[str, np.ndarray]:
+    """将futures_klines原始列表直接解析为连续的float64列数组（不经过DataFrame）"""
+    raw = np.array([kline[:6] for kline in klines], dtype=np.float64).reshape(-1, 6)
+    return {
+        'open_time': raw[:, 0].astype(np.int64),
+        'open': np.ascontiguousarray(raw[:, 1]),
+        'high': np.ascontiguousarray(raw[:, 2]),
+        'low': np.ascontiguousarray(raw[:, 3]),
+        'close': np.ascontiguousarray(raw[:, 4]),
+        'volume': np.ascontiguousarray(raw[:, 5]),
+    }
+
+
+class IndicatorBuffers:
+    """compute_indicators的预分配输出/中间缓冲区，按K线数量复用"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.outputs = {field: np.empty(size, dtype=np.float64) for field in INDICATOR_FIELDS}
+        self.scratch = {
+            name: np.empty(size, dtype=np.float64)
+            for name in ('delta', 'gain', 'loss', 'true_range', 'tmp', 'num', 'den')
+        }
+
+
+_buffer_pool = threading.local()
+
+
+def get_buffers(size: int) -> IndicatorBuffers:
+    """取当前线程对应长度的缓冲区（线程内复用，线程间隔离）"""
+    pool = getattr(_buffer_pool, 'buffers', None)
+    if pool is None:
+        pool = _buffer_pool.buffers = {}
+    buffers = pool.get(size)
+    if buffers is None:
+        buffers = pool[size] = IndicatorBuffers(size)
+    return buffers
+
+
+# EWM分块长度：块内用 decay^-i 做前缀和，块长限制保证不溢出
+_EWM_BLOCK = 128
+
+
+def _ewm_mean(values: np.ndarray, span: int, out: np.ndarray, num: np.ndarray, den: np.ndarray):
+    """向量化的 ewm(span, adjust=True).mean()"""
+    decay = 1.0 - 2.0 / (span + 1.0)
+    n = len(values)
+    steps = np.arange(min(n, _EWM_BLOCK), dtype=np.float64)
+    grow = decay ** -steps
+    shrink = decay ** steps
+    carry_num = 0.0
+    carry_den = 0.0
+    for start in range(0, n, _EWM_BLOCK):
+        stop = min(start + _EWM_BLOCK, n)
+        m = stop - start
+        block_num = num[start:stop]
+        block_den = den[start:stop]
+        np.multiply(values[start:stop], grow[:m], out=block_num)
+        np.cumsum(block_num, out=block_num)
+        block_num *= shrink[:m]
+        np.cumsum(shrink[:m], out=block_den)
+        # 上一块的累计量按 decay^(t+1) 衰减后并入
+        block_num += carry_num * decay * shrink[:m]
+        block_den += carry_den * decay * shrink[:m]
+        np.divide(block_num, block_den, out=out[start:stop])
+        carry_num = block_num[-1]
+        carry_den = block_den[-1]
+
+
+def _rolling_mean(values: np.ndarray, window: int, out: np.ndarray, min_periods: Optional[int] = None):
+    """rolling(window, min_periods).mean()，min_periods默认等于window"""
+    n = len(values)
+    min_periods = window if min_periods is None else min_periods
+    head = min(window - 1, n)
+    if head > 0:
+        np.cumsum(values[:head], out=out[:head])
+        out[:head] /= np.arange(1, head + 1)
+        out[:min(min_periods - 1, head)] = np.nan
+    if n >= window:
+        sliding_window_view(values, window).mean(axis=1, out=out[window - 1:])
+
+
+def _rolling_std(values: np.ndarray, window: int, out: np.ndarray):
+    """rolling(window).std()（ddof=1）"""
+    n = len(values)
+    out[:min(window - 1, n)] = np.nan
+    if n >= window:
+        sliding_window_view(values, window).std(axis=1, ddof=1, out=out[window - 1:])
+
+
+def fill_gaps_array(values: np.ndarray):
+    """原地执行与 Series.bfill().ffill() 相同的缺失值填充"""
+    missing = np.isnan(values)
+    if not missing.any():
+        return
+    n = len(values)
+    positions = np.where(missing, n, np.arange(n))
+    next_valid = np.minimum.accumulate(positions[::-1])[::-1]
+    backfill = missing & (next_valid < n)
+    values[backfill] = values[next_valid[backfill]]
+    trailing = missing & (next_valid == n)
+    if trailing.any() and not trailing.all():
+        values[trailing] = values[np.flatnonzero(~missing)[-1]]
+
+
+def compute_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                       buffers: Optional[IndicatorBuffers] = None) -> Dict[str, np.ndarray]:
+    """
+    NumPy向量化指标内核，结果与calculate_technical_indicators一致
+
+    buffers为预分配缓冲区，返回的数组即buffers.outputs中的数组，
+    下次使用同一缓冲区计算时会被覆盖，需要保留时请自行拷贝。
+    """
+    n = len(close)
+    if buffers is None or buffers.size != n:
+        buffers = IndicatorBuffers(n)
+    out = buffers.outputs
+    tmp = buffers.scratch
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # 移动平均线
+        _rolling_mean(close, 20, out['sma_20'], min_periods=1)
+        _rolling_mean(close, 50, out['sma_50'], min_periods=1)
+
+        # MACD
+        _ewm_mean(close, 12, out['ema_12'], tmp['num'], tmp['den'])
+        _ewm_mean(close, 26, out['ema_26'], tmp['num'], tmp['den'])
+        np.subtract(out['ema_12'], out['ema_26'], out=out['macd'])
+        _ewm_mean(out['macd'], 9, out['macd_signal'], tmp['num'], tmp['den'])
+
+        # RSI（第一根K线的涨跌记为0，与pandas的where语义一致）
+        delta = tmp['delta']
+        delta[:1] = 0.0
+        np.subtract(close[1:], close[:-1], out=delta[1:])
+        np.maximum(delta, 0.0, out=tmp['gain'])
+        np.minimum(delta, 0.0, out=tmp['loss'])
+        np.negative(tmp['loss'], out=tmp['loss'])
+        _rolling_mean(tmp['gain'], 14, out['rsi'])
+        _rolling_mean(tmp['loss'], 14, tmp['tmp'])
+        np.divide(out['rsi'], tmp['tmp'], out=out['rsi'])
+        out['rsi'] += 1.0
+        np.divide(100.0, out['rsi'], out=out['rsi'])
+        np.subtract(100.0, out['rsi'], out=out['rsi'])
+
+        # 布林带
+        _rolling_mean(close, 20, out['bb_middle'])
+        _rolling_std(close, 20, tmp['tmp'])
+        tmp['tmp'] *= 2
+        np.add(out['bb_middle'], tmp['tmp'], out=out['bb_upper'])
+        np.subtract(out['bb_middle'], tmp['tmp'], out=out['bb_lower'])
+        np.subtract(out['bb_upper'], out['bb_lower'], out=tmp['tmp'])
+        np.subtract(close, out['bb_lower'], out=out['bb_position'])
+        np.divide(out['bb_position'], tmp['tmp'], out=out['bb_position'])
+
+        # ATR
+        true_range = tmp['true_range']
+        np.subtract(high, low, out=true_range)
+        if n > 1:
+            np.subtract(high[1:], close[:-1], out=tmp['tmp'][1:])
+            np.abs(tmp['tmp'][1:], out=tmp['tmp'][1:])
+            np.maximum(true_range[1:], tmp['tmp'][1:], out=true_range[1:])
+            np.subtract(low[1:], close[:-1], out=tmp['tmp'][1:])
+            np.abs(tmp['tmp'][1:], out=tmp['tmp'][1:])
+            np.maximum(true_range[1:], tmp['tmp'][1:], out=true_range[1:])
+        _rolling_mean(true_range, 14, out['atr_14'])
+
+    for field in INDICATOR_FIELDS:
+        fill_gaps_array(out[field])
+    return out
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kline Store Module - Columnar on-disk kline history and bulk downloader
+K线存储模块 - 按列存储的历史K线与批量下载器
+
+目录结构: {base_dir}/{SYMBOL}/{interval}/
+- 每列一个 .npy 文件（open_time/close_time/trades 为int64，其余为float64），只追加写入
+- meta.json 记录已提交的行数，是唯一的提交点：先追加各列数据并fsync，再原子替换meta.json。
+  进程中途崩溃时，超出行数的残留数据在下次追加前被截断
+读取方用 np.memmap 映射列文件，按 open_time（有序，即时间索引）二分查找后返回零拷贝切片。
+
+KlineDownloader 分页调用 futures_klines，只保存已收盘的K线；按权重做令牌桶限速，
+参考响应头中的已用权重主动降速，遇到429/418按Retry-After等待；从已存储的最后一根K线之后续传。
+
+用法:
+  python src/kline_store.py download --symbols BNBUSDT,ETHUSDT --intervals 15m,1h --start 2022-01-01
+  python src/kline_store.py info
+
+Author: AI Trading Bot
+License: MIT
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join('data', 'klines')
+
+INTERVAL_MS = {
+    '1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+    '1h': 3600000, '2h': 7200000, '4h': 14400000, '6h': 21600000, '8h': 28800000,
+    '12h': 43200000, '1d': 86400000,
+}
+
+# (列名, dtype, futures_klines中的下标)
+COLUMNS = (
+    ('open_time', np.int64, 0),
+    ('open', np.float64, 1),
+    ('high', np.float64, 2),
+    ('low', np.float64, 3),
+    ('close', np.float64, 4),
+    ('volume', np.float64, 5),
+    ('close_time', np.int64, 6),
+    ('quote_volume', np.float64, 7),
+    ('trades', np.int64, 8),
+    ('taker_buy_base', np.float64, 9),
+    ('taker_buy_quote', np.float64, 10),
+)
+
+# 固定长度的.npy文件头，追加数据后可原地改写shape
+_HEADER_SIZE = 128
+_MAGIC = b'\x93NUMPY\x01\x00'
+
+MAX_KLINES_PER_REQUEST = 1500
+
+
+def _npy_header(dtype: np.dtype, length: int) -> bytes:
+    """生成固定为_HEADER_SIZE字节的.npy v1.0文件头"""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (np.dtype(dtype).str, length)
+    body_size = _HEADER_SIZE - len(_MAGIC) - 2
+    header = header.ljust(body_size - 1) + '\n'
+    return _MAGIC + body_size.to_bytes(2, 'little') + header.encode('latin1')
+
+
+def parse_time(value: str) -> int:
+    """'2022-01-01' / '2022-01-01 08:00' / 毫秒时间戳 → 毫秒时间戳（UTC）"""
+    if value.isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def format_time(ms: Optional[int]) -> str:
+    if ms is None:
+        return '-'
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+class KlineStore:
+    """按 (交易对, 周期) 分目录的列式K线存储，单写多读"""
+
+    def __init__(self, base_dir: str = DEFAULT_STORE_DIR):
+        self.base_dir = base_dir
+        self._write_lock = threading.Lock()
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.base_dir, symbol.upper(), interval)
+
+    def _meta_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self._dir(symbol, interval), 'meta.json')
+
+    def length(self, symbol: str, interval: str) -> int:
+        """已提交的K线数量"""
+        try:
+            with open(self._meta_path(symbol, interval), 'r', encoding='utf-8') as f:
+                return json.load(f)['length']
+        except FileNotFoundError:
+            return 0
+
+    def series(self) -> List[Tuple[str, str]]:
+        """已存储的 (交易对, 周期) 列表"""
+        result = []
+        if not os.path.isdir(self.base_dir):
+            return result
+        for symbol in sorted(os.listdir(self.base_dir)):
+            symbol_dir = os.path.join(self.base_dir, symbol)
+            if not os.path.isdir(symbol_dir):
+                continue
+            for interval in sorted(os.listdir(symbol_dir)):
+                if os.path.exists(self._meta_path(symbol, interval)):
+                    result.append((symbol, interval))
+        return result
+
+    def columns(self, symbol: str, interval: str) -> Dict[str, np.ndarray]:
+        """全部已提交数据的只读内存映射（无数据时为空字典）"""
+        length = self.length(symbol, interval)
+        if length == 0:
+            return {}
+        directory = self._dir(symbol, interval)
+        return {
+            name: np.memmap(os.path.join(directory, f'{name}.npy'), dtype=dtype, mode='r',
+                            offset=_HEADER_SIZE, shape=(length,))
+            for name, dtype, _ in COLUMNS
+        }
+
+    def read(self, symbol: str, interval: str, start: Optional[int] = None,
+             end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """open_time 在 [start, end) 内的K线列（零拷贝切片）"""
+        columns = self.columns(symbol, interval)
+        if not columns:
+            return {}
+        open_time = columns['open_time']
+        lo = int(np.searchsorted(open_time, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(open_time, end, side='left')) if end is not None else len(open_time)
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def tail(self, symbol: str, interval: str, n: int) -> Dict[str, np.ndarray]:
+        """最近n根K线（零拷贝切片）"""
+        columns = self.columns(symbol, interval)
+        return {name: values[-n:] for name, values in columns.items()} if n > 0 else {}
+
+    def tail_klines(self, symbol: str, interval: str, n: int) -> List[List[Any]]:
+        """最近n根K线，转换为futures_klines的列表格式"""
+        columns = self.tail(symbol, interval, n)
+        if not columns:
+            return []
+        rows = zip(*(columns[name].tolist() for name, _, _ in COLUMNS))
+        return [list(row) + ['0'] for row in rows]
+
+    def time_range(self, symbol: str, interval: str) -> Tuple[Optional[int], Optional[int]]:
+        """(第一根, 最后一根) 的开盘时间"""
+        columns = self.columns(symbol, interval)
+        if not columns:
+            return None, None
+        return int(columns['open_time'][0]), int(columns['open_time'][-1])
+
+    def gaps(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        """缺失区间列表 [(缺口前最后一根开盘时间, 缺口后第一根开盘时间)]（交易所停机等）"""
+        columns = self.columns(symbol, interval)
+        if not columns:
+            return []
+        open_time = columns['open_time']
+        breaks = np.flatnonzero(np.diff(open_time) != INTERVAL_MS[interval])
+        return [(int(open_time[i]), int(open_time[i + 1])) for i in breaks]
+
+    def append(self, symbol: str, interval: str, klines: List[List[Any]]) -> int:
+        """
+        追加已收盘的K线（futures_klines格式，须按时间升序），返回实际写入的行数
+
+        开盘时间不大于已存储最后一根的K线会被跳过，重复下载同一页不会产生重复数据
+        """
+        if not klines:
+            return 0
+        with self._write_lock:
+            directory = self._dir(symbol, interval)
+            os.makedirs(directory, exist_ok=True)
+            length = self.length(symbol, interval)
+            if length:
+                last = np.memmap(os.path.join(directory, 'open_time.npy'), dtype=np.int64, mode='r',
+                                 offset=_HEADER_SIZE + (length - 1) * 8, shape=(1,))[0]
+                klines = [k for k in klines if int(k[0]) > last]
+                if not klines:
+                    return 0
+
+            count = len(klines)
+            new_length = length + count
+            for name, dtype, index in COLUMNS:
+                values = np.array([k[index] for k in klines], dtype=np.float64).astype(dtype)
+                path = os.path.join(directory, f'{name}.npy')
+                mode = 'r+b' if os.path.exists(path) else 'w+b'
+                with open(path, mode) as f:
+                    # 截断上次未提交的残留数据后追加
+                    f.truncate(_HEADER_SIZE + length * values.itemsize)
+                    f.seek(0)
+                    f.write(_npy_header(dtype, new_length))
+                    f.seek(0, os.SEEK_END)
+                    f.write(values.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # 提交：原子替换meta.json
+            meta_path = self._meta_path(symbol, interval)
+            tmp_path = meta_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'symbol': symbol.upper(), 'interval': interval, 'length': new_length}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, meta_path)
+            return count
+
+
+class WeightLimiter:
+    """
+    请求权重令牌桶（每分钟weight_per_minute）
+
+    币安U本位合约每个IP每分钟2400权重，默认只用一半，给同时运行的交易机器人留余量
+    """
+
+    def __init__(self, weight_per_minute: int = 1200):
+        self.capacity = float(weight_per_minute)
+        self.rate = weight_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """服务器提示权重紧张时清空令牌，随后按速率慢慢恢复"""
+        with self._lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+
+def klines_weight(limit: int) -> int:
+    """futures_klines 按limit计算的请求权重"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class KlineDownloader:
+    """分页下载历史K线写入KlineStore，可中断、可续传"""
+
+    def __init__(self, client, store: KlineStore, limiter: Optional[WeightLimiter] = None,
+                 page_size: int = MAX_KLINES_PER_REQUEST, max_retries: int = 5):
+        self.client = client
+        self.store = store
+        self.limiter = limiter or WeightLimiter()
+        self.page_size = min(page_size, MAX_KLINES_PER_REQUEST)
+        self.max_retries = max_retries
+
+    def _fetch_page(self, symbol: str, interval: str, start: int, end: Optional[int]) -> List[List[Any]]:
+        params = {'symbol': symbol, 'interval': interval, 'startTime': start, 'limit': self.page_size}
+        if end is not None:
+            params['endTime'] = end - 1
+        for attempt in range(self.max_retries):
+            self.limiter.acquire(klines_weight(self.page_size))
+            try:
+                klines = self.client.futures_klines(**params)
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                if status in (418, 429):
+                    response = getattr(e, 'response', None)
+                    headers = getattr(response, 'headers', None) or {}
+                    retry_after = float(headers.get('Retry-After', 60))
+                    logger.warning(f"⚠️ 触发限频({status})，等待 {retry_after:.0f}秒")
+                    self.limiter.drain()
+                    time.sleep(retry_after)
+                elif attempt == self.max_retries - 1:
+                    raise
+                else:
+                    logger.warning(f"⚠️ 下载 {symbol} {interval} 失败（第{attempt + 1}次）: {e}")
+                    time.sleep(2 ** attempt)
+                continue
+            self._observe_weight()
+            return klines
+        raise RuntimeError(f"下载 {symbol} {interval} 连续{self.max_retries}次触发限频")
+
+    def _observe_weight(self):
+        """已用权重超过上限的80%时主动降速"""
+        response = getattr(self.client, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        used = headers.get('x-mbx-used-weight-1m') or headers.get('X-MBX-USED-WEIGHT-1M')
+        if used is not None and int(used) > 2400 * 0.8:
+            self.limiter.drain()
+
+    def download(self, symbol: str, interval: str, start: int, end: Optional[int] = None) -> int:
+        """
+        下载 [start, end) 的K线（end为空表示到当前），已存储的部分从最后一根之后续传
+
+        只存储已收盘的K线；返回新写入的行数
+        """
+        symbol = symbol.upper()
+        step = INTERVAL_MS[interval]
+        first, last = self.store.time_range(symbol, interval)
+        if last is not None:
+            if start < first:
+                logger.warning(f"⚠️ {symbol} {interval} 已有数据从 {format_time(first)} 开始，只能向后续传；"
+                               f"需要更早的数据请删除 {self.store._dir(symbol, interval)} 后重新下载")
+            start = max(start, last + step)
+
+        total = 0
+        cursor = start
+        while end is None or cursor < end:
+            klines = self._fetch_page(symbol, interval, cursor, end)
+            if not klines:
+                break
+            now_ms = int(time.time() * 1000)
+            closed = [k for k in klines if int(k[6]) < now_ms]
+            written = self.store.append(symbol, interval, closed)
+            total += written
+            if len(closed) < len(klines) or not closed:
+                break  # 已到达当前未收盘的K线
+            cursor = int(closed[-1][0]) + step
+            logger.info(f"📥 {symbol} {interval}: 已下载至 {format_time(int(closed[-1][0]))}（本次新增 {total} 根）")
+            if len(klines) < self.page_size:
+                break
+        return total
+
+    def download_many(self, symbols: List[str], intervals: List[str], start: int,
+                      end: Optional[int] = None) -> Dict[Tuple[str, str], int]:
+        """依次下载多个交易对和周期（共用同一个限速器）"""
+        results = {}
+        for symbol in symbols:
+            for interval in intervals:
+                results[(symbol, interval)] = self.download(symbol, interval, start, end)
+                logger.info(f"✅ {symbol} {interval}: 新增 {results[(symbol, interval)]} 根K线")
+        return results
+
+
+def print_info(store: KlineStore):
+    series = store.series()
+    if not series:
+        print(f"{store.base_dir} 中没有K线数据")
+        return
+    print(f"{'交易对':<10} {'周期':<5} {'K线数':>9}  {'起始':<16}  {'结束':<16}  缺口")
+    for symbol, interval in series:
+        first, last = store.time_range(symbol, interval)
+        print(f"{symbol:<10} {interval:<5} {store.length(symbol, interval):>9}  "
+              f"{format_time(first):<16}  {format_time(last):<16}  {len(store.gaps(symbol, interval))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史K线下载与存储')
+    parser.add_argument('--dir', default=DEFAULT_STORE_DIR, help='存储目录')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    download = sub.add_parser('download', help='下载（或续传）K线')
+    download.add_argument('--symbols', default='BNBUSDT', help='交易对，逗号分隔')
+    download.add_argument('--intervals', default='15m,1h', help='周期，逗号分隔')
+    download.add_argument('--start', required=True, help='开始时间（UTC），如 2022-01-01')
+    download.add_argument('--end', help='结束时间（UTC），默认到当前')
+    download.add_argument('--weight-per-minute', type=int, default=1200, help='每分钟最多使用的请求权重')
+
+    sub.add_parser('info', help='查看已存储的数据范围')
+    args = parser.parse_args()
+    # 下载器的进度与告警走logging，命令行下直接输出到终端
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    store = KlineStore(args.dir)
+    if args.command == 'info':
+        print_info(store)
+        return
+
+    from binance.client import Client
+
+    # K线是公开接口，不需要API密钥
+    downloader = KlineDownloader(Client(), store, WeightLimiter(args.weight_per_minute))
+    downloader.download_many(
+        [s.strip().upper() for s in args.symbols.split(',') if s.strip()],
+        [i.strip() for i in args.intervals.split(',') if i.strip()],
+        parse_time(args.start),
+        parse_time(args.end) if args.end else None,
+    )
+    print_info(store)
+
+
+if __name__ == '__main__':
+    main()
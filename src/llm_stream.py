@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM Stream Module - Streaming AI decisions with early JSON extraction
+AI流式决策模块 - 边接收token边解析JSON
+
+AI回复按 action → confidence → reason 的顺序输出，action和confidence一解析完整
+就可以回调下单，reason继续流式写入日志，不必等待完整回复。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import time
+from typing import Dict, Any, Optional, Callable, Tuple
+
+# 可提前执行的合法操作
+VALID_ACTIONS = ('BUY_OPEN', 'SELL_OPEN', 'CLOSE', 'HOLD')
+
+
+class StreamingDecisionParser:
+    """
+    增量解析回复中第一个顶层JSON对象
+
+    每个顶层字段的值一旦完整就写入 fields；正在接收的字符串值可通过
+    partial() 读取。对象之前/之后的多余文本被忽略。
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._state = 'before_object'
+        self._key = None
+        self._buffer = []
+        self._escape = False
+        self._depth = 0
+        self._in_nested_string = False
+
+    def feed(self, text: str):
+        """输入一段新收到的文本"""
+        for ch in text:
+            if self.done:
+                return
+            self._step(ch)
+
+    def partial(self, key: str) -> Optional[str]:
+        """读取字段的当前值：已完成返回完整值，正在接收的字符串返回已收到部分"""
+        if key in self.fields:
+            return self.fields[key]
+        if self._state == 'string_value' and self._key == key:
+            raw = ''.join(self._buffer)
+            if raw.endswith('\\'):
+                raw = raw[:-1]
+            try:
+                return json.loads(f'"{raw}"')
+            except ValueError:
+                return raw
+        return None
+
+    def _step(self, ch: str):
+        state = self._state
+        if state == 'before_object':
+            if ch == '{':
+                self._state = 'before_key'
+        elif state == 'before_key':
+            if ch == '"':
+                self._buffer = []
+                self._state = 'key'
+            elif ch == '}':
+                self.done = True
+        elif state == 'key':
+            if self._read_string_char(ch):
+                self._key = json.loads(f'"{"".join(self._buffer)}"')
+                self._state = 'before_colon'
+        elif state == 'before_colon':
+            if ch == ':':
+                self._state = 'before_value'
+        elif state == 'before_value':
+            if ch.isspace():
+                return
+            self._buffer = []
+            if ch == '"':
+                self._state = 'string_value'
+            elif ch in '{[':
+                self._buffer.append(ch)
+                self._depth = 1
+                self._state = 'nested_value'
+            else:
+                self._buffer.append(ch)
+                self._state = 'scalar_value'
+        elif state == 'string_value':
+            if self._read_string_char(ch):
+                self._finish_value(json.loads(f'"{"".join(self._buffer)}"'))
+        elif state == 'scalar_value':
+            if ch in ',}' or ch.isspace():
+                self._finish_value(self._parse_json(''.join(self._buffer)))
+                self._after_value(ch)
+            else:
+                self._buffer.append(ch)
+        elif state == 'nested_value':
+            self._buffer.append(ch)
+            if self._in_nested_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_nested_string = False
+            elif ch == '"':
+                self._in_nested_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_value(self._parse_json(''.join(self._buffer)))
+        elif state == 'after_value':
+            self._after_value(ch)
+
+    def _read_string_char(self, ch: str) -> bool:
+        """累积字符串内容，遇到未转义的引号返回True"""
+        if self._escape:
+            self._escape = False
+            self._buffer.append(ch)
+        elif ch == '\\':
+            self._escape = True
+            self._buffer.append(ch)
+        elif ch == '"':
+            return True
+        else:
+            self._buffer.append(ch)
+        return False
+
+    def _finish_value(self, value: Any):
+        self.fields[self._key] = value
+        self._key = None
+        self._buffer = []
+        self._state = 'after_value'
+
+    def _after_value(self, ch: str):
+        if ch == ',':
+            self._state = 'before_key'
+        elif ch == '}':
+            self.done = True
+
+    @staticmethod
+    def _parse_json(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+
+
+def stream_decision(client, model: str, messages, temperature: float = 0.1,
+                    on_early_decision: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    log: Callable[[str], None] = print,
+                    early_fields: Tuple[str, ...] = ('action', 'confidence'),
+                    reason_log_chars: int = 60) -> Dict[str, Any]:
+    """
+    以stream=True调用chat.completions，边接收边解析决策
+
+    early_fields全部完整且action合法时立即调用 on_early_decision(decision)，只调用一次；
+    reason每累积reason_log_chars个字符写一次日志。
+    返回 {'content', 'fields', 'early_fired', 'ttft', 'early_latency', 'total_latency', 'usage'}，
+    usage为服务端在最后一个chunk返回的token用量（不支持时为None）
+    """
+    start = time.time()
+    parser = StreamingDecisionParser()
+    chunks = []
+    ttft = None
+    early_latency = None
+    early_fired = False
+    logged_reason = 0
+    usage = None
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={'include_usage': True},
+        temperature=temperature
+    )
+
+    for chunk in response:
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.time() - start
+        chunks.append(text)
+        parser.feed(text)
+
+        if early_latency is None and all(field in parser.fields for field in early_fields):
+            early_latency = time.time() - start
+            decision = {field: parser.fields[field] for field in early_fields}
+            if on_early_decision and decision.get('action') in VALID_ACTIONS:
+                log(f"⚡ 提前解析到决策 ({early_latency:.2f}秒): {decision}")
+                early_fired = True
+                on_early_decision(decision)
+
+        reason = parser.partial('reason')
+        if reason and len(reason) - logged_reason >= reason_log_chars:
+            log(f"   理由(流式): {reason[logged_reason:]}")
+            logged_reason = len(reason)
+
+    reason = parser.fields.get('reason')
+    if isinstance(reason, str) and len(reason) > logged_reason:
+        log(f"   理由(流式): {reason[logged_reason:]}")
+
+    return {
+        'content': ''.join(chunks),
+        'fields': parser.fields,
+        'early_fired': early_fired,
+        'ttft': ttft,
+        'early_latency': early_latency,
+        'total_latency': time.time() - start,
+        'usage': usage,
+    }
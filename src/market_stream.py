@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Market Stream Module - Binance futures WebSocket market data
+行情推送模块 - 订阅币安合约K线、标记价格和24h行情推送
+
+后台线程维护按 (symbol, interval) 划分的内存K线缓存，
+读取方可以直接拿到与 futures_klines 相同格式的数据，无需再走REST。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+import websocket
+
+from kline_store import INTERVAL_MS, MAX_KLINES_PER_REQUEST
+
+logger = logging.getLogger(__name__)
+
+# 币安U本位合约WebSocket地址
+FUTURES_STREAM_URL = 'wss://fstream.binance.com'
+
+
+def kline_event_to_rest(k: Dict[str, Any]) -> List[Any]:
+    """将推送中的K线对象转换为futures_klines的列表格式"""
+    return [
+        k['t'], k['o'], k['h'], k['l'], k['c'], k['v'],
+        k['T'], k['q'], k['n'], k['V'], k['Q'], k.get('B', '0')
+    ]
+
+
+class CandleStore:
+    """按 (symbol, interval) 维护滚动K线缓存，K线格式与futures_klines一致"""
+
+    def __init__(self, maxlen: int = 500, max_age: float = 30.0):
+        self.maxlen = maxlen
+        # 超过max_age秒未收到推送则视为过期，读取方回退到REST
+        self.max_age = max_age
+        self.connected = False
+        self._lock = threading.Lock()
+        self._candles: Dict[Tuple[str, str], deque] = {}
+        # 已用REST补齐、之后推送连续的K线序列；其余序列的推送先暂存，补齐后按顺序重放
+        self._synced: set = set()
+        self._backlog: Dict[Tuple[str, str], Dict[int, List[Any]]] = {}
+        self._tickers: Dict[str, Dict[str, Any]] = {}
+        self._mark_prices: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Dict[Any, float] = {}
+
+    def seed(self, symbol: str, interval: str, klines: List[List[Any]]) -> bool:
+        """用REST历史K线初始化缓存，再重放等待期间暂存的推送K线，返回序列是否已连续可用"""
+        key = (symbol, interval)
+        with self._lock:
+            self._candles[key] = deque(klines, maxlen=self.maxlen)
+            return self._finish_sync(key)
+
+    def extend(self, symbol: str, interval: str, klines: List[List[Any]]) -> bool:
+        """补齐缺失的K线（从已有的最后一根开始），再重放暂存的推送K线，返回序列是否已连续可用"""
+        key = (symbol, interval)
+        with self._lock:
+            for kline in klines:
+                if not self._apply_kline(key, kline):
+                    break
+            return self._finish_sync(key)
+
+    def update_kline(self, symbol: str, interval: str, kline: List[Any]) -> bool:
+        """
+        写入一根推送K线：同一开盘时间覆盖，新K线追加
+
+        序列尚未补齐或这根K线与缓存之间有缺口时暂存，返回False，调用方需用REST补齐该序列
+        """
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._synced and self._apply_kline(key, kline):
+                self._updated_at[key] = time.time()
+                return True
+            # 有缺口：直接追加会让读取方拿到中间缺K线的窗口
+            self._synced.discard(key)
+            backlog = self._backlog.setdefault(key, {})
+            backlog[int(kline[0])] = kline
+            if len(backlog) > self.maxlen:
+                del backlog[min(backlog)]
+            return False
+
+    def invalidate(self):
+        """连接断开：所有K线序列需重新补齐后才可读取"""
+        with self._lock:
+            self._synced.clear()
+            self._backlog.clear()
+
+    def _finish_sync(self, key: Tuple[str, str]) -> bool:
+        for open_time in sorted(self._backlog.get(key, {})):
+            if not self._apply_kline(key, self._backlog[key][open_time]):
+                # REST数据还没到暂存的推送，等下一次补齐
+                return False
+        self._backlog.pop(key, None)
+        self._synced.add(key)
+        self._updated_at[key] = time.time()
+        return True
+
+    def _apply_kline(self, key: Tuple[str, str], kline: List[Any]) -> bool:
+        """写入一根K线，尚未初始化或与最后一根之间有缺口时返回False（早于最后一根的K线忽略）"""
+        buffer = self._candles.get(key)
+        if not buffer:
+            return False
+        last_open = int(buffer[-1][0])
+        open_time = int(kline[0])
+        interval_ms = INTERVAL_MS.get(key[1])
+        if open_time == last_open:
+            buffer[-1] = kline
+        elif interval_ms and open_time > last_open + interval_ms:
+            return False
+        elif open_time > last_open:
+            buffer.append(kline)
+        return True
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """缓存中最后一根K线的开盘时间（未初始化时为None）"""
+        with self._lock:
+            buffer = self._candles.get((symbol, interval))
+            return int(buffer[-1][0]) if buffer else None
+
+    def to_state(self) -> Dict[str, Any]:
+        """K线缓存（用于检查点，行情推送类数据不保存）"""
+        with self._lock:
+            return {
+                'series': [
+                    {
+                        'symbol': symbol,
+                        'interval': interval,
+                        'candles': list(buffer),
+                    }
+                    for (symbol, interval), buffer in self._candles.items() if buffer
+                ]
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        """从检查点恢复K线缓存（恢复后需经推送/补齐才视为新鲜）"""
+        with self._lock:
+            for series in state['series']:
+                self._candles[(series['symbol'], series['interval'])] = deque(series['candles'], maxlen=self.maxlen)
+
+    def update_ticker(self, symbol: str, ticker: Dict[str, Any]):
+        """写入24h行情推送"""
+        with self._lock:
+            self._tickers[symbol] = ticker
+            self._updated_at[('ticker', symbol)] = time.time()
+
+    def update_mark_price(self, symbol: str, mark: Dict[str, Any]):
+        """写入标记价格推送（包含当前资金费率）"""
+        with self._lock:
+            self._mark_prices[symbol] = mark
+            self._updated_at[('markPrice', symbol)] = time.time()
+
+    def _is_fresh(self, key) -> bool:
+        updated_at = self._updated_at.get(key)
+        return self.connected and updated_at is not None and time.time() - updated_at <= self.max_age
+
+    def get_klines(self, symbol: str, interval: str, limit: int) -> Optional[List[List[Any]]]:
+        """读取最近limit根K线，缓存未补齐、过期或数量不足时返回None"""
+        key = (symbol, interval)
+        with self._lock:
+            buffer = self._candles.get(key)
+            if buffer is None or len(buffer) < limit or key not in self._synced or not self._is_fresh(key):
+                return None
+            return list(buffer)[-limit:]
+
+    def get_ticker(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """读取24h行情（futures_ticker格式的子集）"""
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            if ticker is None or not self._is_fresh(('ticker', symbol)):
+                return None
+            return {
+                'symbol': symbol,
+                'priceChange': ticker['p'],
+                'priceChangePercent': ticker['P'],
+                'lastPrice': ticker['c'],
+                'volume': ticker['v'],
+                'quoteVolume': ticker['q'],
+            }
+
+    def get_funding_rate(self, symbol: str) -> Optional[List[Dict[str, Any]]]:
+        """读取当前资金费率（futures_funding_rate格式）"""
+        with self._lock:
+            mark = self._mark_prices.get(symbol)
+            if mark is None or not self._is_fresh(('markPrice', symbol)):
+                return None
+            return [{
+                'symbol': symbol,
+                'fundingRate': mark['r'],
+                'fundingTime': mark['T'],
+                'markPrice': mark['p'],
+            }]
+
+    def get_mark_price(self, symbol: str) -> Optional[float]:
+        """读取实时标记价格，未订阅或过期时返回None"""
+        with self._lock:
+            mark = self._mark_prices.get(symbol)
+            if mark is None or not self._is_fresh(('markPrice', symbol)):
+                return None
+            return float(mark['p'])
+
+    def lookup_rest(self, method: str, kwargs: Dict[str, Any]) -> Optional[Any]:
+        """按REST方法名从缓存构造同格式响应，无法提供时返回None"""
+        symbol = kwargs.get('symbol')
+        if method == 'futures_klines':
+            return self.get_klines(symbol, kwargs['interval'], kwargs.get('limit', 500))
+        if method == 'futures_ticker':
+            return self.get_ticker(symbol)
+        if method == 'futures_funding_rate' and kwargs.get('limit', 1) == 1:
+            return self.get_funding_rate(symbol)
+        return None
+
+
+class MarketStreamSubscriber:
+    """
+    后台订阅K线/markPrice/ticker组合流，断线自动重连并用REST补齐历史
+
+    REST补齐在单独的线程中逐个序列进行，不阻塞推送处理；每个序列补齐后才可读取，
+    推送K线与缓存之间出现缺口时该序列重新补齐
+    """
+
+    def __init__(self, store: CandleStore, subscriptions: List[Tuple[str, str]],
+                 seeder: Callable[..., List[List[Any]]],
+                 seed_limit: int = 99, base_url: str = FUTURES_STREAM_URL,
+                 reconnect_delay: float = 3.0):
+        """seeder(symbol, interval, limit, start_time=None) 调用REST获取K线，start_time为毫秒开盘时间"""
+        self.store = store
+        self.subscriptions = subscriptions
+        self.seeder = seeder
+        self.seed_limit = seed_limit
+        self.base_url = base_url.rstrip('/')
+        self.reconnect_delay = reconnect_delay
+        self.symbols = sorted({symbol for symbol, _ in subscriptions})
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._catch_up_thread: Optional[threading.Thread] = None
+        # 待补齐的序列；None表示本次连接的全部序列已处理完
+        self._catch_up_queue: queue.Queue = queue.Queue()
+        self._pending: set = set()
+        self._pending_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """组合流地址"""
+        streams = [f"{symbol.lower()}@kline_{interval}" for symbol, interval in self.subscriptions]
+        for symbol in self.symbols:
+            streams.append(f"{symbol.lower()}@markPrice@1s")
+            streams.append(f"{symbol.lower()}@ticker")
+        return f"{self.base_url}/stream?streams={'/'.join(streams)}"
+
+    def start(self):
+        """启动后台订阅线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._catch_up_thread = threading.Thread(target=self._catch_up_loop, name='market-catch-up', daemon=True)
+        self._catch_up_thread.start()
+        self._thread = threading.Thread(target=self._run, name='market-stream', daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """等待首次连接完成（K线缓存已补齐），超时返回False"""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        """停止订阅"""
+        self._stop.set()
+        self.store.connected = False
+        if self._ws:
+            self._ws.close()
+        for thread in (self._thread, self._catch_up_thread):
+            if thread:
+                thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            self._ws.run_forever(ping_interval=60, ping_timeout=10)
+            self._disconnected()
+            if not self._stop.is_set():
+                logger.warning(f"⚠️ 行情推送断开，{self.reconnect_delay:.0f}秒后重连")
+                self._stop.wait(self.reconnect_delay)
+
+    def _on_open(self, ws):
+        # 每次(重)连接后用REST补齐历史（在补齐线程中进行），补齐前该序列的推送先暂存
+        self.store.connected = True
+        for symbol, interval in self.subscriptions:
+            self._request_catch_up((symbol, interval))
+        self._catch_up_queue.put(None)
+
+    def _disconnected(self):
+        self.store.connected = False
+        self.store.invalidate()
+
+    def _request_catch_up(self, key: Tuple[str, str]):
+        """把序列加入补齐队列（已在队列中的不重复加入）"""
+        with self._pending_lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._catch_up_queue.put(key)
+
+    def _catch_up_loop(self):
+        while not self._stop.is_set():
+            try:
+                key = self._catch_up_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if key is None:
+                self._ready.set()
+                logger.info(f"✅ 行情推送已连接: {len(self.subscriptions)}个K线流")
+                continue
+            try:
+                synced = self.catch_up(*key)
+            except Exception as e:
+                synced = False
+                logger.warning(f"⚠️ 补齐K线缓存失败 {key[0]} {key[1]}: {e}")
+            with self._pending_lock:
+                self._pending.discard(key)
+            if not synced and self._catch_up_queue.empty():
+                # 该序列的下一条推送会再次请求补齐；没有其他待补齐序列时稍等，避免连续请求REST
+                self._stop.wait(self.reconnect_delay)
+
+    def catch_up(self, symbol: str, interval: str) -> bool:
+        """
+        已有缓存（断线重连、检查点恢复）时只拉取缺失的K线；
+        没有缓存或缺口超过缓存长度时重新初始化。返回序列是否已连续可用
+        """
+        last_open = self.store.last_open_time(symbol, interval)
+        interval_ms = INTERVAL_MS.get(interval)
+        if last_open is not None and interval_ms:
+            missing = (int(time.time() * 1000) - last_open) // interval_ms + 1
+            if missing < self.store.maxlen:
+                return self.store.extend(symbol, interval, self.seeder(
+                    symbol, interval, min(missing + 1, MAX_KLINES_PER_REQUEST), start_time=last_open
+                ))
+        return self.store.seed(symbol, interval, self.seeder(symbol, interval, self.seed_limit))
+
+    def _on_message(self, ws, message):
+        try:
+            payload = json.loads(message)
+            self.handle_event(payload.get('data', payload))
+        except Exception as e:
+            logger.warning(f"⚠️ 解析行情推送失败: {e}")
+
+    def handle_event(self, event: Dict[str, Any]):
+        """分发单条推送事件到缓存"""
+        event_type = event.get('e')
+        if event_type == 'kline':
+            k = event['k']
+            if not self.store.update_kline(event['s'], k['i'], kline_event_to_rest(k)):
+                self._request_catch_up((event['s'], k['i']))
+        elif event_type == 'markPriceUpdate':
+            self.store.update_mark_price(event['s'], event)
+        elif event_type == '24hrTicker':
+            self.store.update_ticker(event['s'], event)
+
+    def _on_error(self, ws, error):
+        logger.warning(f"⚠️ 行情推送错误: {error}")
+
+    def _on_close(self, ws, status_code, message):
+        self._disconnected()
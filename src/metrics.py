@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metrics Module - Per-stage span timing, histograms and Prometheus export
+指标模块 - 交易周期各阶段耗时统计、直方图与Prometheus格式导出
+
+交易周期的每个阶段（每个REST请求、指标计算、提示词组装、AI请求首token/完整回复、下单）
+记录一次耗时（以及所在线程的CPU时间），累计到内存中的固定桶直方图；
+每轮结束时汇总本轮各阶段的次数/总耗时/最大值/CPU时间，写成一行JSON，
+同时把直方图快照原子写入文件，供网页进程的 /metrics 接口按Prometheus文本格式输出。
+
+只依赖标准库，网页进程导入不会带入交易相关的依赖。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+# 直方图桶上限（秒），覆盖缓存读取（毫秒级）到AI完整回复（十秒级）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_SNAPSHOT_FILE = 'metrics_snapshot.json'
+CYCLE_METRICS_FILE = 'cycle_metrics.jsonl'
+METRIC_PREFIX = 'trading_bot'
+
+
+class Histogram:
+    """固定桶直方图：counts[i]为落在第i个桶（上一个上限, buckets[i]]的次数，最后一个为+Inf"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.buckets = tuple(state.get('buckets', buckets))
+        self.counts = list(state.get('counts', [0] * (len(self.buckets) + 1)))
+        self.count = state.get('count', 0)
+        self.sum = state.get('sum', 0.0)
+        self.max = state.get('max', 0.0)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶线性插值估算分位数（与Prometheus histogram_quantile相同），落在+Inf桶时返回最大值"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return min(lower + (self.buckets[i] - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'buckets': list(self.buckets),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """
+    按阶段名记录耗时：累计直方图（进程生命周期）+ 本轮汇总（end_cycle时清空）
+
+    阶段名约定：binance.<方法名>、indicators、prompt_build、llm.ttft、llm.total、
+    fetch（数据采集总耗时）、pipeline（单个交易对流水线）、cycle（整轮）
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.cycles = 0
+        self.last_cycle: Optional[Dict[str, Any]] = None
+        self._histograms: Dict[str, Histogram] = {}
+        self._cycle: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, cpu_seconds: Optional[float] = None):
+        """记录一次耗时（线程安全）；cpu_seconds为该阶段所在线程消耗的CPU时间"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            stats = self._cycle.get(name)
+            if stats is None:
+                stats = self._cycle[name] = [0, 0.0, 0.0, None]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if cpu_seconds is not None:
+                stats[3] = (stats[3] or 0.0) + cpu_seconds
+
+    @contextmanager
+    def span(self, name: str):
+        """计时上下文：with metrics.span('indicators'): ...（异常时同样记录）"""
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, time.thread_time() - cpu_start)
+
+    def instrument(self, target: Any, prefix: str) -> Any:
+        """包装客户端对象：每次调用公开方法都记录为 <prefix>.<方法名>"""
+        return _TimedProxy(target, self, prefix)
+
+    def end_cycle(self, cycle_seconds: float) -> Dict[str, Any]:
+        """结束一轮：记录整轮耗时，返回本轮各阶段汇总（可直接写成一行JSON）"""
+        self.observe('cycle', cycle_seconds)
+        with self._lock:
+            self.cycles += 1
+            record = {
+                'time': time.time(),
+                'cycle': self.cycles,
+                'cycle_seconds': round(cycle_seconds, 6),
+                'spans': {
+                    name: self._cycle_span(stats)
+                    for name, stats in sorted(self._cycle.items()) if name != 'cycle'
+                },
+            }
+            self._cycle = {}
+            self.last_cycle = record
+        return record
+
+    @staticmethod
+    def _cycle_span(stats: List[Any]) -> Dict[str, Any]:
+        span = {'count': stats[0], 'total': round(stats[1], 6), 'max': round(stats[2], 6)}
+        if stats[3] is not None:
+            span['cpu'] = round(stats[3], 6)
+        return span
+
+    def histogram(self, name: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """直方图快照（可JSON序列化）"""
+        with self._lock:
+            return {
+                'updated_at': time.time(),
+                'cycles': self.cycles,
+                'last_cycle': self.last_cycle,
+                'spans': {name: histogram.to_state() for name, histogram in sorted(self._histograms.items())},
+            }
+
+    def write_snapshot(self, path: str = METRICS_SNAPSHOT_FILE):
+        """原子写入快照文件（网页进程读取）"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+class _TimedProxy:
+    """转发属性访问，公开方法调用计时；保留方法名（__name__）供缓存查找使用"""
+
+    def __init__(self, target: Any, metrics: Metrics, prefix: str):
+        self._target = target
+        self._metrics = metrics
+        self._prefix = prefix
+        self._wrapped: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            span_name = f"{self._prefix}.{name}"
+            metrics = self._metrics
+
+            @functools.wraps(attr)
+            def wrapped(*args, **kwargs):
+                start = time.perf_counter()
+                cpu_start = time.thread_time()
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    metrics.observe(span_name, time.perf_counter() - start, time.thread_time() - cpu_start)
+
+            self._wrapped[name] = wrapped
+        return wrapped
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value))
+
+
+def render_prometheus(snapshot: Optional[Dict[str, Any]], prefix: str = METRIC_PREFIX) -> str:
+    """把 Metrics.snapshot() 转成Prometheus文本格式"""
+    if not snapshot:
+        return f"# no {prefix} metrics yet\n"
+
+    name = f"{prefix}_span_seconds"
+    lines = [
+        f"# HELP {name} Duration of trading cycle stages in seconds.",
+        f"# TYPE {name} histogram",
+    ]
+    for span, state in snapshot.get('spans', {}).items():
+        label = span.replace('\\', '\\\\').replace('"', '\\"')
+        cumulative = 0
+        for upper, count in zip(list(state['buckets']) + [math.inf], state['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{span="{label}",le="{_format_value(upper)}"}} {cumulative}')
+        lines.append(f'{name}_sum{{span="{label}"}} {_format_value(state["sum"])}')
+        lines.append(f'{name}_count{{span="{label}"}} {state["count"]}')
+
+    lines += [
+        f"# HELP {prefix}_cycles_total Completed trading cycles since the bot started.",
+        f"# TYPE {prefix}_cycles_total counter",
+        f"{prefix}_cycles_total {snapshot.get('cycles', 0)}",
+        f"# HELP {prefix}_metrics_updated_timestamp_seconds When the bot last wrote these metrics.",
+        f"# TYPE {prefix}_metrics_updated_timestamp_seconds gauge",
+        f"{prefix}_metrics_updated_timestamp_seconds {_format_value(snapshot.get('updated_at', 0))}",
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prompt Builder Module - Verbose and compact AI prompt formats
+提示词构建模块 - 详细格式与紧凑格式
+
+verbose 为原有的逐行中文描述；compact 把K线压缩成相对基准价的差值表格，
+指标用短字段名，历史决策理由截断，输入token约为原来的一半
+（benchmarks/bench_prompt.py 实测估算约52%，加 --api 可用接口返回的usage核对）。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import math
+from typing import Dict, List, Any
+
+PROMPT_FORMATS = ('verbose', 'compact')
+
+SYSTEM_PROMPT = "你是一位专业的日内交易员，专注于技术分析和风险控制。"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算token数（DeepSeek：1个中文字符约0.6 token，1个英文字符约0.3 token）
+
+    emoji等其他非ASCII字符按每个1 token计
+    """
+    cjk = 0
+    other = 0
+    for ch in text:
+        if '一' <= ch <= '鿿' or '　' <= ch <= '〿' or '＀' <= ch <= '￯':
+            cjk += 1
+        elif ord(ch) > 127:
+            other += 1
+    ascii_chars = len(text) - cjk - other
+    return int(math.ceil(cjk * 0.6 + ascii_chars * 0.3 + other))
+
+
+def price_decimals(price: float) -> int:
+    """按价格量级决定小数位数：600→2，0.15→5"""
+    if price <= 0:
+        return 2
+    return max(2, 4 - int(math.floor(math.log10(price))))
+
+
+def funding_label(funding_rate: float) -> str:
+    if funding_rate > 0.0001:
+        return "多头付费"
+    if funding_rate < -0.0001:
+        return "空头付费"
+    return "中性"
+
+
+def build_verbose_prompt(ctx: Dict[str, Any]) -> str:
+    """原有的详细提示词"""
+    coin = ctx['coin']
+    leverage = ctx['leverage']
+    market_data = ctx['market_data']
+    data_1h = ctx['data_1h']
+    btc_data = ctx['btc_data']
+    balance = ctx['balance']
+
+    # 构建当前K线文本
+    ck = market_data['current_kline']
+    if ck['change'] > 0:
+        kline_body = "🟢 阳线"
+    elif ck['change'] < 0:
+        kline_body = "🔴 阴线"
+    else:
+        kline_body = "➖ 平线"
+
+    volatility = ((ck['high'] - ck['low']) / ck['open'] * 100) if ck['open'] > 0 else 0
+
+    current_kline_text = f"""
+【当前K线实时状态】（15分钟周期进行中）
+- 时间窗口: {ck['start_time']} - {ck['end_time']} (已运行 {ck['elapsed_min']:.0f}/15分钟)
+- 开盘价: ${ck['open']:.2f}
+- 当前价: ${ck['close']:.2f}
+- 本K最高: ${ck['high']:.2f}
+- 本K最低: ${ck['low']:.2f}
+- 成交量: {ck['volume']:.2f}
+- K线状态: {kline_body} ({ck['change']:+.2f}%)
+- 波动幅度: {volatility:.2f}%"""
+
+    # 构建历史K线文本
+    kline_text = "\n【历史16根K线】（按时间顺序：从旧→新，共4小时历史数据）："
+    for i, kline in enumerate(market_data['historical_klines'], 1):
+        open_p = float(kline[1])
+        high_p = float(kline[2])
+        low_p = float(kline[3])
+        close_p = float(kline[4])
+        change = ((close_p - open_p) / open_p * 100) if open_p > 0 else 0
+        body = "🟢" if close_p > open_p else "🔴" if close_p < open_p else "➖"
+        kline_text += f"\n  K{i}: {body} O${open_p:.2f} H${high_p:.2f} L${low_p:.2f} C${close_p:.2f} ({change:+.2f}%)"
+
+    # 构建技术指标文本（15分钟）
+    rsi_series_text = ", ".join([f"{x:.1f}" for x in market_data['rsi_series'][-5:]])
+    macd_series_text = ", ".join([f"{x:.4f}" for x in market_data['macd_series'][-5:]])
+    atr_series_text = ", ".join([f"{x:.2f}" for x in market_data['atr_series'][-5:]])
+
+    # 构建1小时数据文本
+    if data_1h:
+        rsi_series_1h_text = ", ".join([f"{x:.1f}" for x in data_1h['rsi_series'][-5:]])
+        macd_series_1h_text = ", ".join([f"{x:.4f}" for x in data_1h['macd_series'][-5:]])
+        text_1h = f"""
+
+【1小时技术指标】
+- RSI: {data_1h['rsi']:.1f} | 时间序列: [{rsi_series_1h_text}]
+- MACD: {data_1h['macd']:.4f} | 时间序列: [{macd_series_1h_text}]
+- SMA20: ${data_1h['sma_20']:.2f} | SMA50: ${data_1h['sma_50']:.2f}"""
+    else:
+        text_1h = ""
+
+    # SMA位置关系（客观数据）
+    sma20 = market_data['sma_20']
+    sma50 = market_data['sma_50']
+    price = market_data['price']
+
+    # 资金费率（客观数据）
+    funding_rate = market_data['funding_rate']
+    funding_text = funding_label(funding_rate)
+
+    # BTC大盘参考
+    btc_text = ""
+    if btc_data:
+        btc_text = f"""
+【BTC大盘参考】（15分钟周期）
+- 价格: ${btc_data['price']:,.2f}
+- RSI: {btc_data['rsi']:.1f}
+- MACD: {btc_data['macd']:.4f}
+- 趋势: {btc_data['trend']} (强度{btc_data['strength']:.2f}%)"""
+
+    # 持仓信息
+    position_text = ""
+    if market_data['position']:
+        pos = market_data['position']
+        pnl_percent = (pos['unrealized_pnl'] / (pos['amount'] * pos['entry_price'] / leverage)) * 100 if pos['entry_price'] > 0 else 0
+        position_text = f"""
+    【当前持仓】
+- 方向: {pos['side']}
+- 数量: {pos['amount']:.2f} {coin}
+- 开仓价: ${pos['entry_price']:.2f}
+- 未实现盈亏: {pos['unrealized_pnl']:+.2f} USDT ({pnl_percent:+.2f}%)"""
+    else:
+        position_text = "\n【当前持仓】无持仓"
+
+    # 最近的AI决策历史
+    last_decisions_text = ""
+    recent_decisions = ctx['recent_decisions']
+    if recent_decisions:
+        last_decisions_text = "\n【最近AI决策记录】（最近45分钟）"
+        for i, dec in enumerate(reversed(recent_decisions), 1):
+            time_str = dec.get('time', 'N/A')[:19] if dec.get('time') else 'N/A'
+            last_decisions_text += f"""
+{i}. {time_str} - {dec.get('coin', 'N/A')}
+   操作: {dec.get('action', 'N/A')}
+   理由: {dec.get('reason', 'N/A')}
+   信心: {dec.get('confidence', 'N/A')}
+"""
+
+    balance_text = ""
+    if balance:
+        balance_text = f"""
+【账户状态】
+- 总权益: {balance['total']:.2f} USDT
+- 可用余额: {balance['available']:.2f} USDT
+- 未实现盈亏: {balance['unrealized_pnl']:+.2f} USDT"""
+
+    stats_text = ctx['stats_text']
+
+    market_text = f"""
+【系统运行状态】
+- 启动时间: {ctx['start_time'].strftime('%Y-%m-%d %H:%M:%S')}
+- 运行时长: {ctx['runtime_minutes']:.1f}分钟
+- AI调用次数: {ctx['invocation_count']}次
+
+【{coin}/USDT市场数据】
+- 价格: ${market_data['price']:,.2f} | 24h涨跌: {market_data['change_24h']:+.2f}% | 15m涨跌: {market_data['change_15m']:+.2f}%
+- 资金费率: {funding_rate:.6f} ({funding_text}) | 持仓量: {market_data['open_interest']:,.0f}{current_kline_text}
+
+【15分钟技术指标】
+- RSI: {market_data['rsi']:.1f} | 时间序列: [{rsi_series_text}]
+- MACD: {market_data['macd']:.4f} | 时间序列: [{macd_series_text}]
+- ATR: {market_data['atr']:.2f} | 时间序列: [{atr_series_text}]
+- 价格: ${price:.2f} | SMA20: ${sma20:.2f} | SMA50: ${sma50:.2f}
+- 布林带位置: {market_data['bb_position']:.2%}{text_1h}{kline_text}{btc_text}{balance_text}{position_text}{stats_text}{last_decisions_text}
+"""
+
+    return f"""
+你是一位专业的日内交易员，负责{coin}/USDT合约交易（{leverage}倍杠杆）。
+
+{market_text}
+
+【数据周期】
+- 15分钟K线数据
+- 历史16根K线（4小时历史数据，从旧→新）
+
+【决策要求】
+1. 综合分析当前K线实时状态、历史K线形态、技术指标、BTC大盘
+2. 给出交易决策：BUY_OPEN（开多）/ SELL_OPEN（开空）/ CLOSE（平仓）/ HOLD（观望）
+3. 说明决策理由（包含K线形态和技术指标分析）
+4. 评估信心程度：HIGH / MEDIUM / LOW
+
+请严格按照以下JSON格式和字段顺序回复（不要有任何额外文本）：
+{{
+    "action": "BUY_OPEN|SELL_OPEN|CLOSE|HOLD",
+    "confidence": "HIGH|MEDIUM|LOW",
+    "reason": "K线：[形态描述] | 指标：[指标描述]"
+    }}
+    """
+
+
+def _series(values: List[float], fmt: str) -> str:
+    return "/".join(format(x, fmt) for x in values)
+
+
+def build_compact_prompt(ctx: Dict[str, Any], reason_chars: int = 40) -> str:
+    """
+    紧凑提示词：K线为CSV表格，价格相对首根开盘价做差值编码，
+    指标序列用'/'分隔，历史决策理由截断到reason_chars个字符
+    """
+    coin = ctx['coin']
+    leverage = ctx['leverage']
+    market_data = ctx['market_data']
+    data_1h = ctx['data_1h']
+    btc_data = ctx['btc_data']
+    balance = ctx['balance']
+    price = market_data['price']
+    dp = price_decimals(price)
+
+    lines = [
+        f"{coin}/USDT合约 {leverage}x 日内交易。运行{ctx['runtime_minutes']:.0f}分钟，第{ctx['invocation_count']}次决策。",
+        f"[行情] 价{price:.{dp}f} 24h{market_data['change_24h']:+.2f}% 15m{market_data['change_15m']:+.2f}% "
+        f"费率{market_data['funding_rate']:.6f}({funding_label(market_data['funding_rate'])}) OI{market_data['open_interest']:.0f}",
+    ]
+
+    # 历史K线 + 当前K线：相对基准价B的差值，chg为单根涨跌%
+    ck = market_data['current_kline']
+    rows = [
+        (float(k[1]), float(k[2]), float(k[3]), float(k[4]))
+        for k in market_data['historical_klines']
+    ]
+    rows.append((ck['open'], ck['high'], ck['low'], ck['close']))
+    base = rows[0][0]
+    lines.append(f"[15m K线 旧→新，末行为进行中{ck['elapsed_min']:.0f}/15分钟] B={base:.{dp}f} 列=o,h,l,c(相对B),chg%")
+    for o, h, l, c in rows:
+        change = ((c - o) / o * 100) if o > 0 else 0
+        lines.append(f"{o - base:+.{dp}f},{h - base:+.{dp}f},{l - base:+.{dp}f},{c - base:+.{dp}f},{change:+.2f}")
+
+    lines.append(
+        f"[15m指标] RSI {_series(market_data['rsi_series'][-5:], '.1f')} | "
+        f"MACD {_series(market_data['macd_series'][-5:], '.4f')} | "
+        f"ATR {_series(market_data['atr_series'][-5:], f'.{dp}f')} | "
+        f"SMA20 {market_data['sma_20']:.{dp}f} SMA50 {market_data['sma_50']:.{dp}f} BB位置{market_data['bb_position']:.0%}"
+    )
+    if data_1h:
+        lines.append(
+            f"[1h指标] RSI {_series(data_1h['rsi_series'][-5:], '.1f')} | "
+            f"MACD {_series(data_1h['macd_series'][-5:], '.4f')} | "
+            f"SMA20 {data_1h['sma_20']:.{dp}f} SMA50 {data_1h['sma_50']:.{dp}f}"
+        )
+    if btc_data:
+        lines.append(
+            f"[BTC 15m] 价{btc_data['price']:.0f} RSI {btc_data['rsi']:.1f} MACD {btc_data['macd']:.2f} "
+            f"{btc_data['trend']}({btc_data['strength']:.2f}%)"
+        )
+    if balance:
+        lines.append(
+            f"[账户] 权益{balance['total']:.2f} 可用{balance['available']:.2f} 未实现{balance['unrealized_pnl']:+.2f} USDT"
+        )
+
+    pos = market_data['position']
+    if pos:
+        pnl_percent = (pos['unrealized_pnl'] / (pos['amount'] * pos['entry_price'] / leverage)) * 100 if pos['entry_price'] > 0 else 0
+        lines.append(
+            f"[持仓] {pos['side']} {pos['amount']} {coin} 开仓{pos['entry_price']:.{dp}f} "
+            f"盈亏{pos['unrealized_pnl']:+.2f}({pnl_percent:+.2f}%)"
+        )
+    else:
+        lines.append("[持仓] 无")
+
+    stats_text = ctx['stats_text'].strip()
+    if stats_text:
+        lines.append(stats_text)
+
+    recent_decisions = ctx['recent_decisions']
+    if recent_decisions:
+        lines.append("[最近决策 新→旧]")
+        for dec in reversed(recent_decisions):
+            time_str = dec.get('time', '')[11:16] or 'N/A'
+            reason = str(dec.get('reason', ''))
+            if len(reason) > reason_chars:
+                reason = reason[:reason_chars] + '…'
+            lines.append(f"{time_str} {dec.get('action', 'N/A')} {dec.get('confidence', 'N/A')} {reason}")
+
+    lines.append(
+        "综合K线形态、指标、BTC大盘给出决策。只回复JSON，字段顺序固定："
+        '{"action":"BUY_OPEN|SELL_OPEN|CLOSE|HOLD","confidence":"HIGH|MEDIUM|LOW",'
+        '"reason":"K线：[形态] | 指标：[描述]"}'
+    )
+    return "\n".join(lines)
+
+
+def build_prompt(prompt_format: str, ctx: Dict[str, Any], reason_chars: int = 40) -> str:
+    """按格式名构建提示词"""
+    if prompt_format == 'compact':
+        return build_compact_prompt(ctx, reason_chars)
+    if prompt_format == 'verbose':
+        return build_verbose_prompt(ctx)
+    raise ValueError(f"未知的提示词格式: {prompt_format}，可选: {', '.join(PROMPT_FORMATS)}")
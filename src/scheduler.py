@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scheduler Module - Run jobs aligned to kline close
+调度模块 - 对齐K线收盘时间执行任务
+
+币安K线按UTC整点切分（15m即每小时的00/15/30/45分），调度器在每根K线收盘后
+固定偏移秒数触发任务，保证每轮都基于刚收盘的K线决策，不会随运行时间漂移。
+上一轮超时跨过下一个触发点时跳过被错过的轮次，不会叠加执行。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CandleScheduler:
+    """在每根K线收盘后 offset_seconds 秒触发 job，记录每轮的延迟和耗时"""
+
+    def __init__(self, job: Callable[[], Any], interval_minutes: int = 15,
+                 offset_seconds: float = 5.0, history_size: int = 100):
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutes必须大于0")
+        self.job = job
+        self.period = interval_minutes * 60
+        self.offset_seconds = offset_seconds
+        self.skipped = 0
+        self.history = deque(maxlen=history_size)
+        self._stop = threading.Event()
+
+    def next_fire_time(self, now: Optional[float] = None) -> float:
+        """now之后的下一个触发时间（K线收盘时间 + 偏移）"""
+        if now is None:
+            now = time.time()
+        slot = math.floor((now - self.offset_seconds) / self.period) + 1
+        return slot * self.period + self.offset_seconds
+
+    def run_once(self, target: float) -> Dict[str, Any]:
+        """执行一轮任务并记录：lateness为实际开始时间相对计划时间的延迟"""
+        started = time.time()
+        error = None
+        try:
+            self.job()
+        except Exception as e:
+            error = str(e)
+            logger.exception(f"❌ 定时任务异常: {e}")
+        finished = time.time()
+
+        record = {
+            'target': datetime.fromtimestamp(target).isoformat(),
+            'lateness': started - target,
+            'duration': finished - started,
+            'error': error,
+        }
+        self.history.append(record)
+        stats = self.lateness_stats()
+        logger.info(f"⏰ 计划 {datetime.fromtimestamp(target).strftime('%H:%M:%S')} | "
+                    f"延迟 {record['lateness']:.2f}秒 | 耗时 {record['duration']:.2f}秒 | "
+                    f"近{stats['count']}轮平均延迟 {stats['mean']:.2f}秒，最大 {stats['max']:.2f}秒")
+        return record
+
+    def run_forever(self):
+        """阻塞运行，直到 stop() 被调用"""
+        target = self.next_fire_time()
+        logger.info(f"⏰ 下次执行: {datetime.fromtimestamp(target).strftime('%Y-%m-%d %H:%M:%S')}")
+        while not self._stop.is_set():
+            # Event.wait可能提前返回，循环直到真正到点
+            remaining = target - time.time()
+            if remaining > 0:
+                self._stop.wait(remaining)
+                continue
+
+            self.run_once(target)
+
+            # 本轮超时跨过了后续触发点：跳过这些轮次，从下一个未来触发点继续
+            next_target = self.next_fire_time()
+            missed = int(round((next_target - target) / self.period)) - 1
+            if missed > 0:
+                self.skipped += missed
+                logger.warning(f"⚠️ 本轮耗时超过K线周期，跳过 {missed} 轮（累计跳过 {self.skipped} 轮）")
+            target = next_target
+
+    def stop(self):
+        self._stop.set()
+
+    def lateness_stats(self) -> Dict[str, float]:
+        """最近若干轮的延迟统计（秒）"""
+        latenesses = [r['lateness'] for r in self.history]
+        if not latenesses:
+            return {'count': 0, 'mean': 0.0, 'max': 0.0}
+        return {
+            'count': len(latenesses),
+            'mean': sum(latenesses) / len(latenesses),
+            'max': max(latenesses),
+        }
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Storage Module - Pluggable storage for stats, decisions and trades
+存储模块 - 交易统计、AI决策、成交记录的可替换存储后端
+
+- JsonStorage: 原有的本地文件（trading_stats.json + ai_decisions.jsonl + trades.jsonl）
+- SQLiteStorage: 嵌入式SQLite（WAL模式），机器人写入的同时网页可以并发做按时间/币种的索引查询
+
+机器人和网页通过 open_storage() 打开同一个后端，后端类型由环境变量 STORAGE_BACKEND 指定。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from decision_journal import open_journal, tail_jsonl
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ('sqlite', 'json')
+
+SQLITE_FILE = 'trading_data.db'
+STATS_FILE = 'trading_stats.json'
+DECISIONS_FILE = 'ai_decisions.jsonl'
+TRADES_FILE = 'trades.jsonl'
+LEGACY_DECISIONS_FILE = 'ai_decisions.json'
+
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """文件版本签名 (mtime_ns, size)，文件不存在时返回None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _entry_time(entry: Dict[str, Any]) -> str:
+    return entry.get('time') or entry.get('decision_time') or ''
+
+
+class StorageBackend:
+    """
+    存储后端接口
+
+    决策和成交记录按时间从旧→新返回；since/until 为ISO时间字符串（闭区间）
+    """
+
+    def load_stats(self) -> Optional[Dict[str, Any]]:
+        """读取交易统计，不存在时返回None"""
+        raise NotImplementedError
+
+    def save_stats(self, stats: Dict[str, Any]):
+        raise NotImplementedError
+
+    def append_decision(self, decision: Dict[str, Any]):
+        raise NotImplementedError
+
+    def query_decisions(self, limit: int = 100, coin: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近limit条满足条件的决策（从旧→新）"""
+        raise NotImplementedError
+
+    def append_trade(self, trade: Dict[str, Any]):
+        raise NotImplementedError
+
+    def query_trades(self, limit: int = 100, symbol: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近limit条满足条件的成交记录（从旧→新）"""
+        raise NotImplementedError
+
+    def signature(self) -> Dict[str, Any]:
+        """各类数据的版本号 {'stats', 'decisions', 'trades'}，数据变化时对应的值改变"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """本地JSON文件存储：统计为整体JSON，决策和成交为只追加的JSONL日志"""
+
+    def __init__(self, stats_file: str = STATS_FILE, decisions_file: str = DECISIONS_FILE,
+                 trades_file: str = TRADES_FILE, legacy_decisions_file: Optional[str] = None,
+                 writable: bool = False):
+        self.stats_file = stats_file
+        self.decisions_file = decisions_file
+        self.trades_file = trades_file
+        self.legacy_decisions_file = legacy_decisions_file
+        self._lock = threading.Lock()
+        self._decisions = None
+        self._trades = None
+        if writable:
+            # 写入方启动时即打开日志（顺带迁移旧版ai_decisions.json）
+            self._decisions = self._decision_journal()
+
+    def _decision_journal(self):
+        if self._decisions is None:
+            self._decisions = open_journal(self.decisions_file, ring_size=100,
+                                           legacy_file=self.legacy_decisions_file)
+        return self._decisions
+
+    def load_stats(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.stats_file):
+            return None
+        with open(self.stats_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_stats(self, stats: Dict[str, Any]):
+        with self._lock:
+            tmp_path = self.stats_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_file)
+
+    def append_decision(self, decision: Dict[str, Any]):
+        self._decision_journal().append(decision)
+
+    def query_decisions(self, limit: int = 100, coin: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        journal = self._decisions
+        if journal is not None and since is None and limit <= journal.ring_size:
+            result = _filter_entries(journal.recent(), 'coin', coin, since, until)[-limit:]
+            # 环形缓存里是所有币种的最近决策，筛选后不足limit条时更早的记录可能还在文件里
+            if len(result) >= limit or (coin is None and until is None):
+                return result
+        if os.path.exists(self.decisions_file):
+            # 有过滤条件时先多读一些再筛选，仍不够时整个文件扫描；按时间范围查询只能整个文件扫描
+            entries = None
+            if since is None:
+                count = limit if coin is None and until is None else limit * 20
+                entries = tail_jsonl(self.decisions_file, count)
+                if len(entries) == count and len(_filter_entries(entries, 'coin', coin, since, until)) < limit:
+                    entries = None
+            if entries is None:
+                entries = tail_jsonl(self.decisions_file, file_line_count(self.decisions_file))
+        elif self.legacy_decisions_file and os.path.exists(self.legacy_decisions_file):
+            # 机器人尚未迁移时读取旧版JSON文件
+            with open(self.legacy_decisions_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('decisions', [])
+        else:
+            entries = []
+        return _filter_entries(entries, 'coin', coin, since, until)[-limit:]
+
+    def append_trade(self, trade: Dict[str, Any]):
+        with self._lock:
+            if self._trades is None:
+                self._trades = open_journal(self.trades_file, ring_size=100)
+        self._trades.append(trade)
+
+    def query_trades(self, limit: int = 100, symbol: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.trades_file):
+            return []
+        count = limit if symbol is None and since is None else file_line_count(self.trades_file)
+        entries = tail_jsonl(self.trades_file, count)
+        return _filter_entries(entries, 'symbol', symbol, since, until)[-limit:]
+
+    def signature(self) -> Dict[str, Any]:
+        decisions_file = self.decisions_file
+        if not os.path.exists(decisions_file) and self.legacy_decisions_file:
+            decisions_file = self.legacy_decisions_file
+        return {
+            'stats': file_signature(self.stats_file),
+            'decisions': file_signature(decisions_file),
+            'trades': file_signature(self.trades_file),
+        }
+
+
+def file_line_count(path: str) -> int:
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def _filter_entries(entries: List[Dict[str, Any]], key: str, value: Optional[str],
+                    since: Optional[str], until: Optional[str]) -> List[Dict[str, Any]]:
+    if value is not None:
+        entries = [e for e in entries if e.get(key) == value]
+    if since is not None:
+        entries = [e for e in entries if _entry_time(e) >= since]
+    if until is not None:
+        entries = [e for e in entries if _entry_time(e) <= until]
+    return entries
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite存储：WAL模式支持一写多读并发，决策按(time)、(coin, time)索引，成交按(time)、(symbol, time)索引
+
+    每个线程使用独立连接；所有SQL都是固定语句+参数绑定，由sqlite3的语句缓存复用预编译结果
+    """
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            time TEXT NOT NULL,
+            coin TEXT,
+            action TEXT,
+            confidence TEXT,
+            reason TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_decisions_time ON decisions(time)",
+        "CREATE INDEX IF NOT EXISTS idx_decisions_coin_time ON decisions(coin, time)",
+        """CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            time TEXT NOT NULL,
+            symbol TEXT,
+            data TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_trades_time ON trades(time)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_symbol_time ON trades(symbol, time)",
+    ]
+
+    def __init__(self, db_file: str = SQLITE_FILE, busy_timeout: float = 5.0):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load_stats(self) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM stats WHERE id = 1").fetchone()
+        return json.loads(row['data']) if row else None
+
+    def save_stats(self, stats: Dict[str, Any]):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO stats (id, data, updated_at) VALUES (1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (json.dumps(stats, ensure_ascii=False), stats.get('last_update') or '')
+            )
+
+    def append_decision(self, decision: Dict[str, Any]):
+        self.append_decisions([decision])
+
+    def append_decisions(self, decisions: List[Dict[str, Any]]):
+        """批量写入决策（一个事务）"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO decisions (time, coin, action, confidence, reason) VALUES (?, ?, ?, ?, ?)",
+                [(_entry_time(d), d.get('coin'), d.get('action'), d.get('confidence'), d.get('reason'))
+                 for d in decisions]
+            )
+
+    def query_decisions(self, limit: int = 100, coin: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, params = _where_clause('coin', coin, since, until)
+        rows = self._conn().execute(
+            f"SELECT id, time, coin, action, confidence, reason FROM decisions{where} "
+            f"ORDER BY time DESC, id DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def append_trade(self, trade: Dict[str, Any]):
+        self.append_trades([trade])
+
+    def append_trades(self, trades: List[Dict[str, Any]]):
+        """批量写入成交记录（一个事务）"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO trades (time, symbol, data) VALUES (?, ?, ?)",
+                [(_entry_time(t), t.get('symbol'), json.dumps(t, ensure_ascii=False)) for t in trades]
+            )
+
+    def query_trades(self, limit: int = 100, symbol: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, params = _where_clause('symbol', symbol, since, until)
+        rows = self._conn().execute(
+            f"SELECT data FROM trades{where} ORDER BY time DESC, id DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [json.loads(row['data']) for row in reversed(rows)]
+
+    def signature(self) -> Dict[str, Any]:
+        conn = self._conn()
+        stats = conn.execute("SELECT updated_at FROM stats WHERE id = 1").fetchone()
+        decisions = conn.execute("SELECT MAX(id) FROM decisions").fetchone()
+        trades = conn.execute("SELECT MAX(id) FROM trades").fetchone()
+        return {
+            'stats': stats[0] if stats else None,
+            'decisions': decisions[0],
+            'trades': trades[0],
+        }
+
+    def is_empty(self) -> bool:
+        conn = self._conn()
+        return (conn.execute("SELECT 1 FROM stats LIMIT 1").fetchone() is None
+                and conn.execute("SELECT 1 FROM decisions LIMIT 1").fetchone() is None)
+
+    def import_json(self, source: JsonStorage):
+        """从JSON文件存储导入全部数据（含已归档的决策日志）"""
+        stats = source.load_stats()
+        if stats:
+            self.save_stats(stats)
+
+        decision_files = [f"{source.decisions_file}.{i}" for i in range(9, 0, -1)] + [source.decisions_file]
+        count = 0
+        for path in decision_files:
+            if not os.path.exists(path):
+                continue
+            entries = tail_jsonl(path, file_line_count(path))
+            self.append_decisions(entries)
+            count += len(entries)
+        if count == 0 and source.legacy_decisions_file and os.path.exists(source.legacy_decisions_file):
+            with open(source.legacy_decisions_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('decisions', [])
+            entries.sort(key=_entry_time)
+            self.append_decisions(entries)
+            count = len(entries)
+
+        if os.path.exists(source.trades_file):
+            self.append_trades(tail_jsonl(source.trades_file, file_line_count(source.trades_file)))
+
+        if stats or count:
+            logger.info(f"✅ 已将本地JSON数据导入 {self.db_file}: 统计{'1' if stats else '0'}份，决策{count}条")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _where_clause(key: str, value: Optional[str], since: Optional[str],
+                  until: Optional[str]) -> Tuple[str, List[Any]]:
+    conditions = []
+    params: List[Any] = []
+    if value is not None:
+        conditions.append(f"{key} = ?")
+        params.append(value)
+    if since is not None:
+        conditions.append("time >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("time <= ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def open_storage(backend: Optional[str] = None, base_dir: str = '.', writable: bool = False) -> StorageBackend:
+    """
+    打开存储后端（默认读取环境变量 STORAGE_BACKEND，未设置时为sqlite）
+
+    writable=True 表示写入方（交易机器人）：SQLite为空时自动导入已有的JSON数据
+    """
+    backend = (backend or os.getenv('STORAGE_BACKEND') or 'sqlite').lower()
+    json_storage = JsonStorage(
+        stats_file=os.path.join(base_dir, STATS_FILE),
+        decisions_file=os.path.join(base_dir, DECISIONS_FILE),
+        trades_file=os.path.join(base_dir, TRADES_FILE),
+        legacy_decisions_file=os.path.join(base_dir, LEGACY_DECISIONS_FILE),
+        writable=writable and backend == 'json'
+    )
+    if backend == 'json':
+        return json_storage
+    if backend == 'sqlite':
+        storage = SQLiteStorage(os.path.join(base_dir, SQLITE_FILE))
+        if writable and storage.is_empty():
+            storage.import_json(json_storage)
+        return storage
+    raise ValueError(f"未知的存储后端: {backend}，可选: {', '.join(STORAGE_BACKENDS)}")
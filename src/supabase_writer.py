@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supabase Writer Module - Write-behind persistence for Supabase
+Supabase后台写入模块 - 交易流程不再等待数据库
+
+统计数据只保留最新一份，每次刷新合并为一次upsert；决策进入有界队列，按批insert。
+Supabase不可用（或队列已满）时写入本地落盘文件，连接恢复后按顺序重放。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SupabaseWriter:
+    """后台线程批量写入Supabase，失败时落盘并在恢复后重放"""
+
+    def __init__(self, client, spill_file: str = 'supabase_spill.jsonl', flush_interval: float = 2.0,
+                 batch_size: int = 50, max_queue: int = 1000, retry_interval: float = 30.0):
+        self.client = client
+        self.spill_file = spill_file
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self._decisions: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._pending_stats: Optional[Dict[str, Any]] = None
+        self._stats_id = None
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._retry_at = 0.0
+
+    def start(self):
+        """启动后台写入线程，进程退出时自动刷新剩余数据"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='supabase-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0):
+        """停止线程，尽量写完剩余数据（写不进去的落盘）"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def submit_stats(self, stats: Dict[str, Any]):
+        """提交最新统计数据（只保留最后一份，不阻塞）"""
+        with self._lock:
+            self._pending_stats = dict(stats)
+        self._wakeup.set()
+
+    def submit_decision(self, decision: Dict[str, Any]):
+        """提交一条决策（不阻塞，队列已满时直接落盘）"""
+        try:
+            self._decisions.put_nowait(dict(decision))
+        except queue.Full:
+            self._spill('ai_decisions', [decision])
+            return
+        if self._decisions.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """尚未写入的决策数量（不含落盘文件）"""
+        return self._decisions.qsize()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self._retry_at = 0.0
+        self.flush(final=True)
+
+    def flush(self, final: bool = False):
+        """写入一次：先重放落盘文件，再写统计和决策；失败则全部落盘"""
+        with self._lock:
+            stats, self._pending_stats = self._pending_stats, None
+        decisions = self._drain()
+
+        if time.time() < self._retry_at:
+            # 仍在重试等待期内：直接落盘，不碰网络
+            self._spill_pending(stats, decisions)
+            return
+
+        try:
+            self._replay_spill()
+            if stats is not None:
+                self._upsert_stats(stats)
+                stats = None
+            while decisions:
+                self._insert_decisions(decisions[:self.batch_size])
+                decisions = decisions[self.batch_size:]
+                if not decisions and not final:
+                    decisions = self._drain()
+        except Exception as e:
+            logger.warning(f"⚠️ 写入Supabase失败，{self.retry_interval:.0f}秒内的数据将暂存到 {self.spill_file}: {e}")
+            self._retry_at = time.time() + self.retry_interval
+            self._spill_pending(stats, decisions)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        items = []
+        while True:
+            try:
+                items.append(self._decisions.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _upsert_stats(self, stats: Dict[str, Any]):
+        """统计表只有一行：首次写入时查出id，之后按id upsert"""
+        row = dict(stats)
+        if self._stats_id is None:
+            self._stats_id = row.get('id')
+        if self._stats_id is None:
+            response = self.client.table('trading_stats').select('id').order('last_update', desc=True).limit(1).execute()
+            if response.data:
+                self._stats_id = response.data[0]['id']
+        if self._stats_id is None:
+            row.pop('id', None)
+            response = self.client.table('trading_stats').insert(row).execute()
+            if response.data:
+                self._stats_id = response.data[0].get('id')
+            return
+        row['id'] = self._stats_id
+        self.client.table('trading_stats').upsert(row).execute()
+
+    def _insert_decisions(self, rows: List[Dict[str, Any]]):
+        self.client.table('ai_decisions').insert(rows).execute()
+
+    def _spill(self, table: str, rows: List[Dict[str, Any]]):
+        """追加到落盘文件并fsync"""
+        line = json.dumps({'table': table, 'rows': rows}, ensure_ascii=False) + '\n'
+        with self._spill_lock:
+            with open(self.spill_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _spill_pending(self, stats: Optional[Dict[str, Any]], decisions: List[Dict[str, Any]]):
+        if stats is not None:
+            self._spill('trading_stats', [stats])
+        if decisions:
+            self._spill('ai_decisions', decisions)
+
+    def _replay_spill(self):
+        """
+        按原顺序重放落盘数据：统计只写最后一份，决策按批insert；全部成功后删除文件
+
+        中途失败时整个文件下次重放，已写入的批次可能重复（至少一次）
+        """
+        replay_file = self.spill_file + '.replay'
+        with self._spill_lock:
+            # 先改名，重放期间新的落盘写入新文件；上次重放失败留下的文件优先处理
+            if not os.path.exists(replay_file):
+                if not os.path.exists(self.spill_file):
+                    return
+                os.replace(self.spill_file, replay_file)
+
+        records = []
+        with open(replay_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 进程崩溃时写了一半的行
+                    continue
+
+        last_stats = None
+        decisions = []
+        for record in records:
+            if record['table'] == 'trading_stats':
+                last_stats = record['rows'][-1]
+            else:
+                decisions.extend(record['rows'])
+
+        for i in range(0, len(decisions), self.batch_size):
+            self._insert_decisions(decisions[i:i + self.batch_size])
+        if last_stats is not None:
+            self._upsert_stats(last_stats)
+
+        os.remove(replay_file)
+        logger.info(f"✅ 已重放暂存的Supabase数据: {len(decisions)}条决策")
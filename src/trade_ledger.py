@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trade Ledger Module - Per-trade ledger with incremental performance metrics
+交易账本模块 - 逐笔交易记录与增量绩效指标
+
+每笔平仓生成一条账本记录（开平仓价、方向、数量、手续费、盈亏、持仓时长），
+绩效指标随每笔交易O(1)更新：资金曲线、最大回撤、夏普/索提诺比率、盈亏比、平均持仓时间。
+指标只保存累加量（state），重启后从state恢复，不需要重新扫描历史交易。
+
+夏普/索提诺按每笔交易的保证金收益率计算（未年化）。
+
+Author: AI Trading Bot
+License: MIT
+"""
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+DEFAULT_FEE_RATE = 0.0004  # 币安U本位合约吃单手续费率
+EQUITY_CURVE_POINTS = 500
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def build_trade(symbol: str, side: str, qty: float, entry_price: float, exit_price: float,
+                entry_time: Optional[str] = None, exit_time: Optional[str] = None,
+                fee_rate: float = DEFAULT_FEE_RATE, leverage: int = 1, funding: float = 0.0) -> Dict[str, Any]:
+    """
+    生成一条平仓记录（side为LONG/SHORT）
+
+    手续费按开仓、平仓两边的名义价值估算；funding为持仓期间支付的资金费（收到为负）；
+    return_pct为扣费后盈亏占保证金的比例
+    """
+    exit_time = exit_time or datetime.now().isoformat()
+    direction = 1 if side == 'LONG' else -1
+    gross_pnl = (exit_price - entry_price) * qty * direction
+    fees = (entry_price + exit_price) * qty * fee_rate
+    pnl = gross_pnl - fees - funding
+    margin = entry_price * qty / max(leverage, 1)
+
+    duration = None
+    opened, closed = _parse_time(entry_time), _parse_time(exit_time)
+    if opened and closed:
+        duration = max((closed - opened).total_seconds(), 0.0)
+
+    return {
+        'time': exit_time,
+        'symbol': symbol,
+        'side': side,
+        'qty': qty,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'entry_time': entry_time,
+        'exit_time': exit_time,
+        'leverage': leverage,
+        'fees': fees,
+        'funding': funding,
+        'gross_pnl': gross_pnl,
+        'pnl': pnl,
+        'return_pct': pnl / margin * 100 if margin > 0 else 0.0,
+        'duration_seconds': duration,
+        'is_win': pnl > 0,
+    }
+
+
+class PerformanceMetrics:
+    """增量绩效指标：每笔交易O(1)更新，state可序列化保存"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.trades = state.get('trades', 0)
+        self.wins = state.get('wins', 0)
+        self.total_pnl = state.get('total_pnl', 0.0)
+        self.total_fees = state.get('total_fees', 0.0)
+        self.gross_profit = state.get('gross_profit', 0.0)
+        self.gross_loss = state.get('gross_loss', 0.0)
+        self.starting_equity = state.get('starting_equity')
+        self.peak_equity = state.get('peak_equity', 0.0)
+        self.max_drawdown = state.get('max_drawdown', 0.0)
+        self.max_drawdown_pct = state.get('max_drawdown_pct', 0.0)
+        # Welford在线均值/方差 + 下行偏差平方和
+        self.return_count = state.get('return_count', 0)
+        self.return_mean = state.get('return_mean', 0.0)
+        self.return_m2 = state.get('return_m2', 0.0)
+        self.downside_sq = state.get('downside_sq', 0.0)
+        self.hold_count = state.get('hold_count', 0)
+        self.hold_seconds = state.get('hold_seconds', 0.0)
+        self.equity_curve = deque(state.get('equity_curve', []), maxlen=EQUITY_CURVE_POINTS)
+
+    @property
+    def equity(self) -> float:
+        """当前权益：有初始权益时为初始权益+累计盈亏，否则为累计盈亏"""
+        return (self.starting_equity or 0.0) + self.total_pnl
+
+    def update(self, trade: Dict[str, Any], equity_before: Optional[float] = None):
+        """计入一笔平仓；equity_before为平仓前的账户权益，仅首笔用于确定初始权益"""
+        pnl = float(trade.get('pnl') or 0.0)
+        if self.starting_equity is None and equity_before:
+            self.starting_equity = equity_before - self.total_pnl
+            self.peak_equity = max(self.peak_equity + self.starting_equity, self.starting_equity)
+
+        self.trades += 1
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        else:
+            self.gross_loss += -pnl
+        self.total_pnl += pnl
+        self.total_fees += float(trade.get('fees') or 0.0)
+
+        equity = self.equity
+        self.peak_equity = max(self.peak_equity, equity)
+        drawdown = self.peak_equity - equity
+        self.max_drawdown = max(self.max_drawdown, drawdown)
+        if self.starting_equity is not None and self.peak_equity > 0:
+            self.max_drawdown_pct = max(self.max_drawdown_pct, drawdown / self.peak_equity * 100)
+        self.equity_curve.append([trade.get('time'), round(equity, 8)])
+
+        if trade.get('return_pct') is not None:
+            r = float(trade['return_pct'])
+            self.return_count += 1
+            delta = r - self.return_mean
+            self.return_mean += delta / self.return_count
+            self.return_m2 += delta * (r - self.return_mean)
+            if r < 0:
+                self.downside_sq += r * r
+
+        if trade.get('duration_seconds') is not None:
+            self.hold_count += 1
+            self.hold_seconds += float(trade['duration_seconds'])
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'trades': self.trades,
+            'wins': self.wins,
+            'total_pnl': self.total_pnl,
+            'total_fees': self.total_fees,
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'starting_equity': self.starting_equity,
+            'peak_equity': self.peak_equity,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'return_count': self.return_count,
+            'return_mean': self.return_mean,
+            'return_m2': self.return_m2,
+            'downside_sq': self.downside_sq,
+            'hold_count': self.hold_count,
+            'hold_seconds': self.hold_seconds,
+            'equity_curve': list(self.equity_curve),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """派生指标（无法计算的为None）"""
+        sharpe = sortino = None
+        if self.return_count >= 2:
+            std = math.sqrt(self.return_m2 / (self.return_count - 1))
+            if std > 0:
+                sharpe = self.return_mean / std
+            downside = math.sqrt(self.downside_sq / self.return_count)
+            if downside > 0:
+                sortino = self.return_mean / downside
+
+        if self.gross_loss > 0:
+            profit_factor = self.gross_profit / self.gross_loss
+        else:
+            profit_factor = None
+
+        return {
+            'trades': self.trades,
+            'win_rate': self.wins / self.trades if self.trades else None,
+            'total_pnl': self.total_pnl,
+            'total_fees': self.total_fees,
+            'equity': self.equity,
+            'current_drawdown': self.peak_equity - self.equity,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'profit_factor': profit_factor,
+            'avg_return_pct': self.return_mean if self.return_count else None,
+            'avg_hold_minutes': self.hold_seconds / self.hold_count / 60 if self.hold_count else None,
+            'equity_curve': list(self.equity_curve),
+        }
+
+
+class TradeLedger:
+    """
+    交易账本：记录本程序开出的仓位（用于计算持仓时长），平仓时生成账本记录并更新指标
+
+    state结构: {'open': {symbol: {side, qty, price, time}}, 'metrics': PerformanceMetrics.to_state()}
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None, fee_rate: float = DEFAULT_FEE_RATE):
+        state = state or {}
+        self.fee_rate = fee_rate
+        self.open_positions: Dict[str, Dict[str, Any]] = dict(state.get('open', {}))
+        self.metrics = PerformanceMetrics(state.get('metrics'))
+
+    def open_position(self, symbol: str, side: str, qty: float, price: float, time: Optional[str] = None):
+        """记录开仓"""
+        self.open_positions[symbol] = {
+            'side': side,
+            'qty': qty,
+            'price': price,
+            'time': time or datetime.now().isoformat(),
+        }
+
+    def close_position(self, symbol: str, side: str, qty: float, entry_price: float, exit_price: float,
+                       leverage: int = 1, exit_time: Optional[str] = None,
+                       equity_before: Optional[float] = None) -> Dict[str, Any]:
+        """
+        记录平仓并更新指标，返回账本记录
+
+        开仓价以交易所持仓为准；开仓时间来自本账本（程序外开的仓位没有开仓时间，不计入平均持仓时长）
+        """
+        opened = self.open_positions.pop(symbol, None)
+        entry_time = opened['time'] if opened and opened['side'] == side else None
+        trade = build_trade(symbol, side, qty, entry_price, exit_price, entry_time=entry_time,
+                            exit_time=exit_time, fee_rate=self.fee_rate, leverage=leverage)
+        self.metrics.update(trade, equity_before=equity_before)
+        return trade
+
+    def replay(self, trades: List[Dict[str, Any]]):
+        """用已有的交易记录（从旧→新）重建指标，仅在没有保存state时使用"""
+        for trade in trades:
+            self.metrics.update(trade)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'open': dict(self.open_positions), 'metrics': self.metrics.to_state()}
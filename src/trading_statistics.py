@@ -10,17 +10,23 @@ Simplified version for single coin trading (BNB)
 Author: AI Trading Bot
 License: MIT
 """
-import json
 import os
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+from storage import StorageBackend, JsonStorage
+from supabase_writer import SupabaseWriter
+from trade_ledger import TradeLedger, DEFAULT_FEE_RATE
+
 class TradingStatistics:
-    def __init__(self, stats_file='trading_stats.json', decisions_file='ai_decisions.json'):
-        self.stats_file = stats_file
-        self.decisions_file = decisions_file
+    def __init__(self, stats_file='trading_stats.json', decisions_file='ai_decisions.jsonl',
+                 storage: Optional[StorageBackend] = None, fee_rate: float = DEFAULT_FEE_RATE):
+        # 本地存储后端（见storage.py），未指定时使用JSON文件
+        self.storage = storage or JsonStorage(stats_file=stats_file, decisions_file=decisions_file, writable=True)
         self.supabase: Optional[Any] = None
         self.use_supabase = False
+        self.writer: Optional[SupabaseWriter] = None
         
         # 初始化Supabase客户端（如果环境变量存在）
         if os.getenv('SUPABASE_URL') and os.getenv('SUPABASE_KEY'):
@@ -31,14 +37,22 @@ class TradingStatistics:
                     os.getenv('SUPABASE_KEY')
                 )
                 self.use_supabase = True
+                # 交易流程中的写入交给后台线程，不等待网络
+                self.writer = SupabaseWriter(self.supabase)
+                self.writer.start()
                 print("已连接到Supabase数据库")
             except Exception as e:
                 print(f"连接Supabase失败: {e}")
                 self.use_supabase = False
         
+        # 开平仓可能在流水线线程和提前下单线程中同时发生：账本修改、汇总统计累加、
+        # 账本序列化和写入存储都在这把锁内进行
+        self._lock = threading.Lock()
+
         # 初始化统计数据
         self.stats = self._load_stats()
         self.decisions = self._load_decisions()
+        self.ledger = self._load_ledger(fee_rate)
     
     def _load_stats(self) -> Dict[str, Any]:
         """加载交易统计数据"""
@@ -61,15 +75,15 @@ class TradingStatistics:
                     return initial_stats
             except Exception as e:
                 print(f"从Supabase加载统计数据失败: {e}")
-                return self._load_stats_from_file()
+                return self._load_stats_local()
         else:
-            return self._load_stats_from_file()
+            return self._load_stats_local()
     
-    def _load_stats_from_file(self) -> Dict[str, Any]:
-        """从本地文件加载统计数据"""
-        if os.path.exists(self.stats_file):
-            with open(self.stats_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+    def _load_stats_local(self) -> Dict[str, Any]:
+        """从本地存储加载统计数据"""
+        stats = self.storage.load_stats()
+        if stats is not None:
+            return stats
         else:
             return {
                 'total_trades': 0,
@@ -79,6 +93,18 @@ class TradingStatistics:
                 'last_update': datetime.now().isoformat()
             }
     
+    def _load_ledger(self, fee_rate: float) -> TradeLedger:
+        """交易账本状态保存在本地统计数据中；旧版数据没有账本时用已有成交记录重建一次"""
+        local_stats = self.storage.load_stats() or {}
+        state = local_stats.get('ledger')
+        ledger = TradeLedger(state, fee_rate=fee_rate)
+        if state is None:
+            trades = self.storage.query_trades(limit=100000)
+            if trades:
+                ledger.replay(trades)
+                print(f"✅ 已从 {len(trades)} 条成交记录重建交易绩效指标")
+        return ledger
+    
     def _load_decisions(self) -> Dict[str, List]:
         """加载AI决策数据"""
         if self.use_supabase and self.supabase:
@@ -88,84 +114,92 @@ class TradingStatistics:
                 return {'decisions': response.data}
             except Exception as e:
                 print(f"从Supabase加载决策数据失败: {e}")
-                return self._load_decisions_from_file()
+                return self._load_decisions_local()
         else:
-            return self._load_decisions_from_file()
+            return self._load_decisions_local()
     
-    def _load_decisions_from_file(self) -> Dict[str, List]:
-        """从本地文件加载决策数据"""
-        if os.path.exists(self.decisions_file):
-            with open(self.decisions_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            return {'decisions': []}
+    def _load_decisions_local(self) -> Dict[str, List]:
+        """从本地存储加载最近50条决策（新→旧）"""
+        return {'decisions': list(reversed(self.storage.query_decisions(limit=50)))}
     
     def save_stats(self):
         """保存交易统计数据"""
+        with self._lock:
+            self._save_stats_locked()
+
+    def _save_stats_locked(self):
         self.stats['last_update'] = datetime.now().isoformat()
+        self.stats['ledger'] = self.ledger.to_state()
         
-        if self.use_supabase and self.supabase:
-            try:
-                # 更新Supabase中的统计数据
-                response = self.supabase.table('trading_stats').select('id').order('last_update', desc=True).limit(1).execute()
-                if response.data:
-                    record_id = response.data[0]['id']
-                    self.supabase.table('trading_stats').update(self.stats).eq('id', record_id).execute()
-                else:
-                    # 插入新记录
-                    self.supabase.table('trading_stats').insert(self.stats).execute()
-            except Exception as e:
-                print(f"保存统计数据到Supabase失败: {e}")
-                self._save_stats_to_file()
-        else:
-            self._save_stats_to_file()
-    
-    def _save_stats_to_file(self):
-        """保存统计数据到本地文件"""
-        with open(self.stats_file, 'w', encoding='utf-8') as f:
-            json.dump(self.stats, f, ensure_ascii=False, indent=2)
+        if self.writer:
+            # 后台合并写入Supabase（失败时暂存本地，恢复后重放）；账本只保存在本地
+            self.writer.submit_stats({k: v for k, v in self.stats.items() if k != 'ledger'})
+        self.storage.save_stats(self.stats)
     
     def save_decision(self, action: str, coin: str, confidence: str, reason: str):
-        """保存AI决策"""
-        decision = {
-            'action': action,
-            'coin': coin,
-            'confidence': confidence,
-            'reason': reason,
-            'decision_time': datetime.now().isoformat()
-        }
-        
-        if self.use_supabase and self.supabase:
-            try:
-                # 保存到Supabase
-                self.supabase.table('ai_decisions').insert(decision).execute()
-                # 同时更新本地缓存
-                self.decisions['decisions'].insert(0, decision)
-                if len(self.decisions['decisions']) > 50:
-                    self.decisions['decisions'] = self.decisions['decisions'][:50]
-            except Exception as e:
-                print(f"保存决策到Supabase失败: {e}")
-                self._save_decision_to_file(decision)
-        else:
-            self._save_decision_to_file(decision)
+        """保存AI决策：追加到本地存储（提示词历史和网页从这里读取），启用Supabase时同时进入后台批量写入队列"""
+        decision_time = datetime.now().isoformat()
+        with self._lock:
+            self._save_decision_local({
+                'time': decision_time,
+                'coin': coin,
+                'action': action,
+                'reason': reason,
+                'confidence': confidence
+            })
+        if self.writer:
+            # 字段与Supabase的ai_decisions表一致
+            self.writer.submit_decision({
+                'action': action,
+                'coin': coin,
+                'confidence': confidence,
+                'reason': reason,
+                'decision_time': decision_time
+            })
     
-    def _save_decision_to_file(self, decision: Dict):
-        """保存决策到本地文件"""
+    def _save_decision_local(self, decision: Dict):
+        """追加决策到本地存储"""
+        self.storage.append_decision(decision)
         self.decisions['decisions'].insert(0, decision)
-        # 只保留最近50条决策
+        # 内存中只保留最近50条决策
         if len(self.decisions['decisions']) > 50:
             self.decisions['decisions'] = self.decisions['decisions'][:50]
-        
-        with open(self.decisions_file, 'w', encoding='utf-8') as f:
-            json.dump(self.decisions, f, ensure_ascii=False, indent=2)
     
-    def record_trade(self, is_win: bool, pnl: float):
-        """记录交易结果"""
+    def record_trade(self, is_win: bool, pnl: float, symbol: Optional[str] = None):
+        """记录只有盈亏的交易结果（没有开平仓明细）"""
+        trade = {
+            'time': datetime.now().isoformat(),
+            'symbol': symbol,
+            'is_win': is_win,
+            'pnl': pnl
+        }
+        with self._lock:
+            self.ledger.metrics.update(trade)
+            self._record_trade(trade)
+    
+    def open_position(self, symbol: str, side: str, qty: float, price: float):
+        """记录开仓（side为LONG/SHORT），平仓时用于计算持仓时长"""
+        with self._lock:
+            self.ledger.open_position(symbol, side, qty, price)
+            self._save_stats_locked()
+    
+    def close_position(self, symbol: str, side: str, qty: float, entry_price: float, exit_price: float,
+                       leverage: int = 1, equity_before: Optional[float] = None) -> Dict[str, Any]:
+        """记录平仓：生成账本记录（含手续费、持仓时长）并增量更新绩效指标"""
+        with self._lock:
+            trade = self.ledger.close_position(symbol, side, qty, entry_price, exit_price,
+                                               leverage=leverage, equity_before=equity_before)
+            self._record_trade(trade)
+        return trade
+    
+    def _record_trade(self, trade: Dict[str, Any]):
+        """成交明细写入本地存储，更新汇总统计（调用方持有锁）"""
+        self.storage.append_trade(trade)
         self.stats['total_trades'] += 1
-        if is_win:
+        if trade['is_win']:
             self.stats['win_trades'] += 1
-        self.stats['total_pnl'] += pnl
-        self.save_stats()
+        self.stats['total_pnl'] += trade['pnl']
+        self._save_stats_locked()
     
     def get_win_rate(self) -> float:
         """计算胜率"""
@@ -173,6 +207,27 @@ class TradingStatistics:
             return 0.0
         return self.stats['win_trades'] / self.stats['total_trades']
     
+    def get_performance(self) -> Dict[str, Any]:
+        """当前绩效指标（来自增量累加量，不扫描历史）"""
+        with self._lock:
+            return self.ledger.metrics.summary()
+    
+    def generate_stats_text_for_ai(self) -> str:
+        """给AI提示词的绩效摘要，尚无平仓记录时为空"""
+        perf = self.get_performance()
+        if not perf['trades']:
+            return ""
+        
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else '-'
+        
+        hold_text = f"{perf['avg_hold_minutes']:.0f}分钟" if perf['avg_hold_minutes'] is not None else '-'
+        return f"""
+【交易绩效】
+- 已平仓{perf['trades']}笔 | 胜率 {fmt(perf['win_rate'], '.1%')} | 累计盈亏 {perf['total_pnl']:+.2f} USDT（手续费 {perf['total_fees']:.2f}）
+- 最大回撤 {perf['max_drawdown']:.2f} USDT（{perf['max_drawdown_pct']:.1f}%）| 当前回撤 {perf['current_drawdown']:.2f} USDT
+- 夏普 {fmt(perf['sharpe'], '.2f')} | 索提诺 {fmt(perf['sortino'], '.2f')} | 盈亏比 {fmt(perf['profit_factor'], '.2f')} | 平均持仓 {hold_text}"""
+    
     def get_stats(self) -> Dict[str, Any]:
         """获取统计数据"""
         return self.stats
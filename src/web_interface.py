@@ -7,37 +7,122 @@ AI Trading Bot - Web可视化界面
 
 from flask import Flask, render_template, jsonify, request
 import json
+import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 import pandas as pd
-from typing import Dict, Any, Optional
-from binance.client import Client
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from storage import StorageBackend, open_storage, file_signature
+from binance_pool import BinanceClientPool, SingleFlightCache
+from trade_ledger import PerformanceMetrics
+from metrics import METRICS_SNAPSHOT_FILE, render_prometheus
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # 设置项目根目录
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# 账户信息缓存时间（秒），页面每30秒刷新一次，多个标签页共享同一次查询
+ACCOUNT_CACHE_TTL = 10
+
+# 进程内共享的币安客户端
+binance_pool = BinanceClientPool()
+
+# 已加载数据的缓存：{缓存键: (版本号, 数据)}，文件签名或存储版本未变化时不重新读取
+_file_cache: Dict[Any, Tuple[Any, Any]] = {}
+_file_cache_lock = threading.Lock()
+
+# /api/status 预先序列化的响应体：(各数据版本, bytes)
+_status_cache: Optional[Tuple[Any, bytes]] = None
+
+# 与交易机器人共用的存储后端（只读）
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> StorageBackend:
+    """打开存储后端，类型与机器人一致（.env 或环境变量 STORAGE_BACKEND）"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = open_storage(load_env_config().get('STORAGE_BACKEND'), PROJECT_ROOT)
+        return _storage
+
+def cached_by_version(cache_key: Any, version: Any, loader: Callable[[], Any]) -> Any:
+    """
+    按版本号缓存loader结果，版本未变化时直接返回缓存
+
+    返回的对象在多个请求间共享，调用方不能修改
+    """
+    with _file_cache_lock:
+        cached = _file_cache.get(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    data = loader()
+    with _file_cache_lock:
+        _file_cache[cache_key] = (version, data)
+    return data
+
+def load_cached(file_path: str, parser: Callable[[str], Any], cache_key: Any = None) -> Any:
+    """按 (mtime_ns, size) 缓存文件解析结果，文件不存在时返回None"""
+    signature = file_signature(file_path)
+    if signature is None:
+        return None
+    return cached_by_version(cache_key if cache_key is not None else file_path, signature,
+                             lambda: parser(file_path))
+
+def _parse_json_file(file_path: str) -> Any:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def load_json_data(file_path: str) -> Dict[str, Any]:
-    """加载JSON数据文件"""
+    """加载JSON数据文件（文件未变化时直接返回缓存）"""
     try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        data = load_cached(file_path, _parse_json_file)
+        return data if data is not None else {}
     except Exception as e:
         print(f"读取文件 {file_path} 失败: {e}")
         return {}
 
+def build_stats_view(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """统计数据 + 由账本累加量派生的绩效指标（不读取成交历史）；内部账本状态不返回给前端"""
+    view = {k: v for k, v in stats.items() if k != 'ledger'}
+    ledger = stats.get('ledger') or {}
+    view['performance'] = PerformanceMetrics(ledger.get('metrics')).summary()
+    if view.get('total_trades'):
+        view['win_rate'] = view.get('win_trades', 0) / view['total_trades']
+    return view
+
 def load_trading_stats() -> Dict[str, Any]:
-    """加载交易统计数据"""
-    stats_file = os.path.join(PROJECT_ROOT, 'trading_stats.json')
-    return load_json_data(stats_file)
+    """加载交易统计数据（数据未变化时直接返回缓存）"""
+    try:
+        storage = get_storage()
+        return cached_by_version('stats', storage.signature()['stats'],
+                                 lambda: build_stats_view(storage.load_stats() or {}))
+    except Exception as e:
+        print(f"读取交易统计失败: {e}")
+        return {}
 
-def load_ai_decisions() -> Dict[str, Any]:
-    """加载AI决策数据"""
-    decisions_file = os.path.join(PROJECT_ROOT, 'ai_decisions.json')
-    return load_json_data(decisions_file)
+def load_ai_decisions(limit: int = 100, coin: Optional[str] = None,
+                      since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+    """读取最近limit条AI决策（从旧→新），可按币种和时间范围过滤"""
+    try:
+        storage = get_storage()
+        if coin is None and since is None and until is None:
+            return cached_by_version(
+                ('decisions', limit),
+                storage.signature()['decisions'],
+                lambda: {'decisions': storage.query_decisions(limit=limit)}
+            )
+        return {'decisions': storage.query_decisions(limit=limit, coin=coin, since=since, until=until)}
+    except Exception as e:
+        print(f"读取AI决策失败: {e}")
+        return {}
 
 def load_runtime_info() -> Dict[str, Any]:
     """加载运行时信息"""
@@ -92,8 +177,8 @@ def save_env_config(config: Dict[str, str]) -> None:
     with open(env_file, 'w', encoding='utf-8') as f:
         f.writelines(new_lines)
 
-def get_binance_account_info():
-    """获取币安账户信息"""
+def fetch_binance_account_info():
+    """从币安查询账户信息（复用客户端池中的Client）"""
     try:
         # 从环境变量加载API密钥
         config = load_env_config()
@@ -104,8 +189,8 @@ def get_binance_account_info():
             print("API密钥未配置")
             return None
             
-        # 初始化币安客户端
-        client = Client(api_key, api_secret)
+        # 复用已建立的币安客户端
+        client = binance_pool.get(api_key, api_secret)
         
         # 获取账户信息
         account = client.futures_account()
@@ -129,6 +214,13 @@ def get_binance_account_info():
         traceback.print_exc()
         return None
 
+# 账户信息快照：TTL内直接返回，过期后并发请求只查询一次
+account_cache = SingleFlightCache(fetch_binance_account_info, ACCOUNT_CACHE_TTL)
+
+def get_binance_account_info():
+    """获取币安账户信息（带缓存）"""
+    return account_cache.get()
+
 @app.route('/')
 def index():
     """主页面"""
@@ -162,6 +254,10 @@ def save_binance_keys():
         
         # 保存配置
         save_env_config(config)
+
+        # 密钥变更后丢弃旧客户端和账户缓存
+        binance_pool.invalidate()
+        account_cache.invalidate()
         
         return jsonify({'success': True, 'message': '币安API密钥保存成功'})
     except Exception as e:
@@ -175,11 +271,19 @@ def api_stats():
 
 @app.route('/api/decisions')
 def api_decisions():
-    """API接口：获取AI决策数据"""
-    decisions = load_ai_decisions()
-    # 只返回最近的10条决策
-    if 'decisions' in decisions:
-        decisions['decisions'] = decisions['decisions'][-10:]
+    """
+    API接口：获取AI决策数据
+
+    参数: limit（默认10，范围1~1000）、coin、since、until（ISO时间，闭区间）
+    """
+    # 负数会变成SQLite的 LIMIT -1（不限条数），0 同样没有意义，都收紧到1
+    limit = max(1, min(request.args.get('limit', 10, type=int), 1000))
+    decisions = load_ai_decisions(
+        limit=limit,
+        coin=request.args.get('coin'),
+        since=request.args.get('since'),
+        until=request.args.get('until')
+    )
     return jsonify(decisions)
 
 @app.route('/api/runtime')
@@ -206,9 +310,19 @@ def api_account():
             'unrealized_pnl': 0.0
         })
 
-@app.route('/api/status')
-def api_status():
-    """API接口：获取综合状态信息"""
+def get_status_body() -> bytes:
+    """综合状态的JSON响应体（数据未变化时直接返回已序列化的结果）"""
+    global _status_cache
+    storage_signature = get_storage().signature()
+    signatures = (
+        storage_signature['stats'],
+        storage_signature['decisions'],
+        file_signature(os.path.join(PROJECT_ROOT, 'current_runtime.json')),
+    )
+    cached = _status_cache
+    if cached is not None and cached[0] == signatures:
+        return cached[1]
+
     stats = load_trading_stats()
     decisions = load_ai_decisions()
     runtime = load_runtime_info()
@@ -218,11 +332,152 @@ def api_status():
     if 'decisions' in decisions and decisions['decisions']:
         latest_decision = decisions['decisions'][-1]
     
-    return jsonify({
+    body = app.json.dumps({
         'stats': stats,
         'latest_decision': latest_decision,
         'decisions': decisions,
         'runtime': runtime
+    }).encode('utf-8')
+    _status_cache = (signatures, body)
+    return body
+
+@app.route('/api/status')
+def api_status():
+    """API接口：获取综合状态信息"""
+    return app.response_class(get_status_body(), mimetype='application/json')
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus指标：交易周期各阶段耗时直方图（机器人每轮写入快照，文件未变化时返回缓存）"""
+    snapshot_file = os.path.join(PROJECT_ROOT, METRICS_SNAPSHOT_FILE)
+    body = cached_by_version('metrics', file_signature(snapshot_file),
+                             lambda: render_prometheus(load_json_data(snapshot_file)))
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+
+class DashboardEventHub:
+    """
+    仪表盘推送中心：有订阅者时后台线程轮询数据文件签名，只把变化推送给所有订阅者
+
+    事件: decision（新增决策列表）、stats、runtime、account；无订阅者时线程退出
+    """
+
+    def __init__(self, poll_interval: float = 0.5, account_interval: float = 30.0, queue_size: int = 100):
+        self.poll_interval = poll_interval
+        self.account_interval = account_interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._watch, name='dashboard-events', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event: str, data: Any):
+        """序列化一次，推送给所有订阅者；队列已满的慢客户端被断开"""
+        message = f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(q)
+
+    def _watch(self):
+        runtime_file = os.path.join(PROJECT_ROOT, 'current_runtime.json')
+        state = None
+
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+
+            # 单轮出错（如SQLite database is locked）只记录日志，下一轮重试，不让推送线程退出
+            try:
+                if state is None:
+                    state = self._initial_state(runtime_file)
+                self._poll(state, runtime_file)
+            except Exception as e:
+                logger.warning(f"⚠️ 仪表盘推送轮询失败，{self.poll_interval}秒后重试: {e}")
+
+            time.sleep(self.poll_interval)
+
+    def _initial_state(self, runtime_file: str) -> Dict[str, Any]:
+        """订阅开始时的数据版本和最后一条决策，之后只推送变化"""
+        latest = load_ai_decisions(limit=1).get('decisions') or []
+        return {
+            'signatures': {**get_storage().signature(), 'runtime': file_signature(runtime_file)},
+            'last_decision': latest[-1] if latest else None,
+            'last_account': None,
+            'next_account_at': time.time(),
+        }
+
+    def _poll(self, state: Dict[str, Any], runtime_file: str):
+        current = {**get_storage().signature(), 'runtime': file_signature(runtime_file)}
+        changed = {key for key, value in current.items() if state['signatures'].get(key) != value}
+
+        if 'stats' in changed:
+            self.publish('stats', load_trading_stats())
+        if 'runtime' in changed:
+            self.publish('runtime', load_runtime_info())
+        if 'decisions' in changed:
+            # 决策只追加：取出上次推送的那条之后的记录（日志压缩重写时也不会重复推送）
+            last_decision = state['last_decision']
+            recent = load_ai_decisions(limit=20).get('decisions', [])
+            if last_decision in recent:
+                position = len(recent) - 1 - recent[::-1].index(last_decision)
+                new_decisions = recent[position + 1:]
+            else:
+                last_time = last_decision.get('time', '') if last_decision else ''
+                new_decisions = [dec for dec in recent if dec.get('time', '') > last_time]
+            if new_decisions:
+                state['last_decision'] = new_decisions[-1]
+                self.publish('decision', new_decisions)
+        # 全部推送成功后才记下新版本，出错的变化下一轮重新推送
+        state['signatures'] = current
+
+        if time.time() >= state['next_account_at']:
+            state['next_account_at'] = time.time() + self.account_interval
+            account = get_binance_account_info()
+            if account is not None and account != state['last_account']:
+                state['last_account'] = account
+                self.publish('account', account)
+
+
+dashboard_events = DashboardEventHub()
+
+@app.route('/api/stream')
+def api_stream():
+    """SSE接口：连接时推送一次完整状态（snapshot），之后只推送变化"""
+    q = dashboard_events.subscribe()
+
+    def generate():
+        try:
+            yield f"event: snapshot\ndata: {get_status_body().decode('utf-8')}\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=15)
+                except queue.Empty:
+                    # 心跳注释，防止代理断开空闲连接
+                    yield ": keepalive\n\n"
+        finally:
+            dashboard_events.unsubscribe(q)
+
+    return app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
 
 if __name__ == '__main__':
@@ -529,6 +784,12 @@ if __name__ == '__main__':
             color: var(--danger-color) !important;
         }
         
+        .equity-curve {
+            width: 100%;
+            height: 80px;
+            margin-top: 15px;
+        }
+        
         /* 币安世纪金额特殊样式 */
         .binance-amount {
             font-size: 1.6rem;
@@ -744,6 +1005,34 @@ if __name__ == '__main__':
                     </div>
                 </div>
             </div>
+            
+            <div class="card">
+                <div class="card-header">
+                    <i class="fas fa-chart-line"></i>
+                    <h2>交易绩效</h2>
+                </div>
+                <div class="stats-grid">
+                    <div class="stat-item">
+                        <div class="stat-label">最大回撤</div>
+                        <div class="stat-value" id="max_drawdown">-</div>
+                        <div class="stat-label" id="max_drawdown_pct">USDT</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="stat-label">夏普 / 索提诺</div>
+                        <div class="stat-value" id="sharpe_sortino">-</div>
+                        <div class="stat-label">每笔</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="stat-label">盈亏比</div>
+                        <div class="stat-value" id="profit_factor">-</div>
+                    </div>
+                    <div class="stat-item">
+                        <div class="stat-label">平均持仓</div>
+                        <div class="stat-value" id="avg_hold">-</div>
+                    </div>
+                </div>
+                <svg class="equity-curve" id="equity_curve" viewBox="0 0 300 80" preserveAspectRatio="none"></svg>
+            </div>
         </div>
         
         <div class="card">
@@ -837,114 +1126,167 @@ if __name__ == '__main__':
             return translations[confidence] || confidence;
         }
         
+        // 显示账户信息
+        function renderAccount(accountData) {
+            document.getElementById('account_balance').textContent = formatBinanceAmount(accountData.total);
+            document.getElementById('available_balance').textContent = formatBinanceAmount(accountData.available);
+            document.getElementById('unrealized_pnl').textContent = formatBinanceAmount(accountData.unrealized_pnl);
+            
+            // 根据盈亏设置颜色
+            const pnlElement = document.getElementById('unrealized_pnl');
+            if (accountData.unrealized_pnl > 0) {
+                pnlElement.className = 'stat-value binance-amount profit-positive';
+            } else if (accountData.unrealized_pnl < 0) {
+                pnlElement.className = 'stat-value binance-amount profit-negative';
+            } else {
+                pnlElement.className = 'stat-value binance-amount';
+            }
+        }
+        
         // 更新财务信息
         function updateFinancialData(data) {
             fetch('/api/account')
                 .then(response => response.json())
                 .then(accountData => {
                     console.log("获取到账户数据:", accountData);
-                    document.getElementById('account_balance').textContent = formatBinanceAmount(accountData.total);
-                    document.getElementById('available_balance').textContent = formatBinanceAmount(accountData.available);
-                    document.getElementById('unrealized_pnl').textContent = formatBinanceAmount(accountData.unrealized_pnl);
-                    
-                    // 根据盈亏设置颜色
-                    const pnlElement = document.getElementById('unrealized_pnl');
-                    if (accountData.unrealized_pnl > 0) {
-                        pnlElement.className = 'stat-value binance-amount profit-positive';
-                    } else if (accountData.unrealized_pnl < 0) {
-                        pnlElement.className = 'stat-value binance-amount profit-negative';
-                    } else {
-                        pnlElement.className = 'stat-value binance-amount';
-                    }
+                    renderAccount(accountData);
                 })
                 .catch(error => {
                     console.error('获取账户信息失败:', error);
                 });
         }
         
-        // 更新数据
-        function updateData(data) {
-            // 更新财务信息
-            updateFinancialData(data);
-            
-            // 更新运行时信息
-            if (data.runtime) {
-                document.getElementById('invocation_count').textContent = data.runtime.invocation_count || '-';
-                if (data.runtime.program_start_time) {
-                    document.getElementById('uptime').textContent = formatDuration(data.runtime.program_start_time);
-                }
-                document.getElementById('runtime_status').textContent = '运行中';
-                document.getElementById('runtime_status').className = 'stat-value positive';
+        // 显示运行时信息
+        function renderRuntime(runtime) {
+            document.getElementById('invocation_count').textContent = runtime.invocation_count || '-';
+            if (runtime.program_start_time) {
+                document.getElementById('uptime').textContent = formatDuration(runtime.program_start_time);
             }
+            document.getElementById('runtime_status').textContent = '运行中';
+            document.getElementById('runtime_status').className = 'stat-value positive';
+        }
+        
+        // 显示交易统计
+        function renderStats(stats) {
+            document.getElementById('total_trades').textContent = stats.total_trades || 0;
+            document.getElementById('win_rate').textContent = stats.win_rate ? (stats.win_rate * 100).toFixed(2) + '%' : '-';
+            document.getElementById('total_pnl').textContent = stats.total_pnl ? formatBinanceAmount(stats.total_pnl) : '-';
             
-            // 更新交易统计
-            if (data.stats) {
-                document.getElementById('total_trades').textContent = data.stats.total_trades || 0;
-                document.getElementById('win_rate').textContent = data.stats.win_rate ? (data.stats.win_rate * 100).toFixed(2) + '%' : '-';
-                document.getElementById('total_pnl').textContent = data.stats.total_pnl ? formatBinanceAmount(data.stats.total_pnl) : '-';
-                
-                // 根据盈亏设置颜色
-                const pnlElement = document.getElementById('total_pnl');
-                if (data.stats.total_pnl > 0) {
-                    pnlElement.className = 'stat-value profit-positive';
-                } else if (data.stats.total_pnl < 0) {
-                    pnlElement.className = 'stat-value profit-negative';
-                } else {
-                    pnlElement.className = 'stat-value';
-                }
+            // 根据盈亏设置颜色
+            const pnlElement = document.getElementById('total_pnl');
+            if (stats.total_pnl > 0) {
+                pnlElement.className = 'stat-value profit-positive';
+            } else if (stats.total_pnl < 0) {
+                pnlElement.className = 'stat-value profit-negative';
+            } else {
+                pnlElement.className = 'stat-value';
             }
             
-            // 更新最新决策
-            if (data.latest_decision) {
-                const action = getActionDisplay(data.latest_decision.action);
-                const confidence = translateConfidenceLevel(data.latest_decision.confidence);
+            renderPerformance(stats.performance || {});
+        }
+        
+        // 显示交易绩效（由后端增量计算）
+        function renderPerformance(perf) {
+            const fixed = (value, digits) => (value === null || value === undefined) ? '-' : value.toFixed(digits);
+            document.getElementById('max_drawdown').textContent = perf.trades ? formatBinanceAmount(perf.max_drawdown) : '-';
+            document.getElementById('max_drawdown_pct').textContent = perf.max_drawdown_pct ? `USDT (${perf.max_drawdown_pct.toFixed(1)}%)` : 'USDT';
+            document.getElementById('sharpe_sortino').textContent = `${fixed(perf.sharpe, 2)} / ${fixed(perf.sortino, 2)}`;
+            document.getElementById('profit_factor').textContent = fixed(perf.profit_factor, 2);
+            document.getElementById('avg_hold').textContent = (perf.avg_hold_minutes === null || perf.avg_hold_minutes === undefined)
+                ? '-' : `${Math.round(perf.avg_hold_minutes)}分钟`;
+            renderEquityCurve(perf.equity_curve || []);
+        }
+        
+        // 资金曲线（SVG折线）
+        function renderEquityCurve(points) {
+            const svg = document.getElementById('equity_curve');
+            if (points.length < 2) {
+                svg.innerHTML = '';
+                return;
+            }
+            const values = points.map(p => p[1]);
+            const min = Math.min(...values);
+            const range = (Math.max(...values) - min) || 1;
+            const coords = values.map((v, i) =>
+                `${(i / (values.length - 1) * 300).toFixed(1)},${(76 - (v - min) / range * 72).toFixed(1)}`
+            ).join(' ');
+            const color = values[values.length - 1] >= values[0] ? '#2ecc71' : '#e74c3c';
+            svg.innerHTML = `<polyline points="${coords}" fill="none" stroke="${color}" stroke-width="2" vector-effect="non-scaling-stroke"/>`;
+        }
+        
+        // 当前显示的决策（从旧→新）
+        let decisionHistory = [];
+        
+        // 显示最新决策和决策列表
+        function renderDecisions(decisions) {
+            const latest = decisions.length ? decisions[decisions.length - 1] : null;
+            if (latest) {
+                const action = getActionDisplay(latest.action);
+                const confidence = translateConfidenceLevel(latest.confidence);
                 document.getElementById('latest_decision').innerHTML = `
-                    <div class="decision-time"><i class="far fa-clock"></i> ${formatTime(data.latest_decision.time)}</div>
+                    <div class="decision-time"><i class="far fa-clock"></i> ${formatTime(latest.time)}</div>
                     <div class="decision-action ${action.class}">${action.text}</div>
-                    <div class="decision-reason"><i class="fas fa-comment"></i> ${data.latest_decision.reason}</div>
+                    <div class="decision-reason"><i class="fas fa-comment"></i> ${latest.reason}</div>
                     <div style="margin-top: 8px;"><i class="fas fa-shield-alt"></i> 信心: ${confidence}</div>
                 `;
             } else {
                 document.getElementById('latest_decision').innerHTML = '<p style="text-align: center; padding: 20px; color: #777;">暂无决策数据</p>';
             }
             
-            // 更新决策列表
-            if (data.decisions && data.decisions.decisions) {
-                const listElement = document.getElementById('decision_list');
-                if (data.decisions.decisions.length === 0) {
-                    listElement.innerHTML = '<li style="text-align: center; padding: 20px; color: #777;">暂无决策数据</li>';
-                } else {
-                    let html = '';
-                    // 反向遍历以显示最新的在前面
-                    for (let i = data.decisions.decisions.length - 1; i >= 0; i--) {
-                        const decision = data.decisions.decisions[i];
-                        const action = getActionDisplay(decision.action);
-                        const confidence = translateConfidenceLevel(decision.confidence);
-                        
-                        // 处理可能的编码问题
-                        let reason = decision.reason || '';
-                        
-                        html += `
-                            <li class="decision-item">
-                                <div class="decision-time"><i class="far fa-clock"></i> ${formatTime(decision.time)}</div>
-                                <div class="decision-action ${action.class}">${action.text}</div>
-                                <div class="decision-reason"><i class="fas fa-comment"></i> ${reason}</div>
-                                <div style="margin-top: 6px;"><i class="fas fa-shield-alt"></i> 信心: ${confidence}</div>
-                            </li>
-                        `;
-                    }
-                    listElement.innerHTML = html;
-                }
-            } else {
-                // 如果没有决策数据，显示默认消息
-                const listElement = document.getElementById('decision_list');
+            const listElement = document.getElementById('decision_list');
+            if (decisions.length === 0) {
                 listElement.innerHTML = '<li style="text-align: center; padding: 20px; color: #777;">暂无决策数据</li>';
+                return;
             }
-            
-            // 更新最后更新时间
+            let html = '';
+            // 反向遍历以显示最新的在前面
+            for (let i = decisions.length - 1; i >= 0; i--) {
+                const decision = decisions[i];
+                const action = getActionDisplay(decision.action);
+                const confidence = translateConfidenceLevel(decision.confidence);
+                
+                // 处理可能的编码问题
+                let reason = decision.reason || '';
+                
+                html += `
+                    <li class="decision-item">
+                        <div class="decision-time"><i class="far fa-clock"></i> ${formatTime(decision.time)}</div>
+                        <div class="decision-action ${action.class}">${action.text}</div>
+                        <div class="decision-reason"><i class="fas fa-comment"></i> ${reason}</div>
+                        <div style="margin-top: 6px;"><i class="fas fa-shield-alt"></i> 信心: ${confidence}</div>
+                    </li>
+                `;
+            }
+            listElement.innerHTML = html;
+        }
+        
+        // 更新最后更新时间
+        function touchUpdated() {
             document.getElementById('last_updated').textContent = new Date().toLocaleString('zh-CN');
         }
         
+        // 更新数据（完整状态）
+        function updateData(data) {
+            // 更新财务信息
+            updateFinancialData(data);
+            
+            // 更新运行时信息
+            if (data.runtime) {
+                renderRuntime(data.runtime);
+            }
+            
+            // 更新交易统计
+            if (data.stats) {
+                renderStats(data.stats);
+            }
+            
+            // 更新决策
+            decisionHistory = (data.decisions && data.decisions.decisions) ? data.decisions.decisions : [];
+            renderDecisions(decisionHistory);
+            
+            touchUpdated();
+        }
+        
         // 刷新数据
         function refreshData() {
             // 显示加载状态
@@ -971,11 +1313,40 @@ if __name__ == '__main__':
                 });
         }
         
-        // 页面加载完成后自动获取数据
+        // 实时推送：连接后先收到完整状态，之后只接收变化（断线后浏览器自动重连）
+        function connectStream() {
+            if (!window.EventSource) {
+                // 浏览器不支持SSE时退回定时刷新
+                refreshData();
+                setInterval(refreshData, 30000);
+                return;
+            }
+            const source = new EventSource('/api/stream');
+            source.addEventListener('snapshot', event => updateData(JSON.parse(event.data)));
+            source.addEventListener('stats', event => {
+                renderStats(JSON.parse(event.data));
+                touchUpdated();
+            });
+            source.addEventListener('runtime', event => {
+                renderRuntime(JSON.parse(event.data));
+                touchUpdated();
+            });
+            source.addEventListener('account', event => {
+                renderAccount(JSON.parse(event.data));
+                touchUpdated();
+            });
+            source.addEventListener('decision', event => {
+                const lastTime = decisionHistory.length ? decisionHistory[decisionHistory.length - 1].time : '';
+                const fresh = JSON.parse(event.data).filter(decision => decision.time > lastTime);
+                decisionHistory = decisionHistory.concat(fresh).slice(-100);
+                renderDecisions(decisionHistory);
+                touchUpdated();
+            });
+        }
+        
+        // 页面加载完成后建立实时推送连接
         document.addEventListener('DOMContentLoaded', function() {
-            refreshData();
-            // 每30秒自动刷新一次
-            setInterval(refreshData, 30000);
+            connectStream();
         });
     </script>
 </body>